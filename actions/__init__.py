@@ -7,6 +7,8 @@ from .authentication.auth_actions import ActionAskSelectedAccountId
 from .authentication.auth_actions import ActionTrackSelectedAccount
 from .authentication.auth_actions import ActionClearSelectedAccount
 from .policy_cancel.policy_cancel import CancelPolicy
+from .api.metrics import start_metrics_server_from_env
+from .api.turn_log import start_turn_log_from_env
 __all__ = [
     'AuthenticateUserAction',
     'AuthSuccessful',
@@ -26,3 +28,9 @@ def get_default_actions() -> List[Type[Action]]:
         ActionClearSelectedAccount,
         CancelPolicy
     ]
+
+# Expose action and storage metrics when ACTION_METRICS_PORT is set
+start_metrics_server_from_env()
+
+# Log per-turn action timings and backend traffic when ACTION_TURN_LOG is set
+start_turn_log_from_env()
@@ -1,3 +1,25 @@
-from .connection_manager import ConnectionManager
+from .connection_manager import ConnectionManager, get_connection_manager
+from .async_connection_manager import AsyncConnectionManager, get_async_connection_manager
+from .metrics import (
+    MetricsSink,
+    REGISTRY,
+    add_action_observer,
+    add_sink,
+    remove_action_observer,
+    remove_sink,
+    start_metrics_server,
+)
 
-__all__ = ['ConnectionManager'] 
\ No newline at end of file
+__all__ = [
+    'ConnectionManager',
+    'get_connection_manager',
+    'AsyncConnectionManager',
+    'get_async_connection_manager',
+    'MetricsSink',
+    'REGISTRY',
+    'add_sink',
+    'remove_sink',
+    'add_action_observer',
+    'remove_action_observer',
+    'start_metrics_server'
+]
\ No newline at end of file
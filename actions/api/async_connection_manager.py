@@ -0,0 +1,297 @@
+from typing import Dict, List, Optional, Any, Sequence
+import logging
+
+from .backends import StorageBackend, get_backend
+from .metrics import STORE_CALL_ERRORS, instrument_call
+from .records import (
+    SUMMARY_FIELDS,
+    ordered_summaries,
+    parse_child_ids,
+    build_household,
+)
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# The single AsyncConnectionManager shared by all actions in this process
+_shared_async_manager: Optional["AsyncConnectionManager"] = None
+
+
+def get_async_connection_manager() -> "AsyncConnectionManager":
+    """
+    Returns the AsyncConnectionManager shared by every action in this process.
+
+    The action server runs all async actions on one event loop, so a plain
+    module-level instance is enough - no thread lock is needed here.
+    """
+    global _shared_async_manager
+    if _shared_async_manager is None:
+        _shared_async_manager = AsyncConnectionManager()
+    return _shared_async_manager
+
+
+class AsyncConnectionManager:
+    """
+    Non-blocking version of ConnectionManager for async actions.
+
+    Offers the same operations as ConnectionManager:
+    - Retrieving member information
+    - Fetching account details
+    - Updating member data
+
+    but every storage call is awaited, so the action server's event loop keeps
+    serving other conversations while we wait on the database. It uses the same
+    process-wide storage backend (and caches) as ConnectionManager.
+    """
+
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        # Storage engine holding our member records (None = the process-wide backend)
+        self._backend = backend
+
+    @property
+    def backend(self) -> StorageBackend:
+        """The storage backend in use (resolved on each call, so set_backend() takes effect)."""
+        return self._backend if self._backend is not None else get_backend()
+
+    async def close(self) -> None:
+        """Closes the backend's pooled connections (e.g. on action-server shutdown)."""
+        await self.backend.aclose()
+
+    @instrument_call("get_member_data")
+    async def get_member_data(self, member_id: str,
+                              fields: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves complete member data from the database using member ID.
+
+        Same behaviour as ConnectionManager.get_member_data, without blocking.
+
+        Args:
+            member_id: The member's unique identifier (e.g., "M12345")
+            fields: Only return these fields (None = the complete record)
+
+        Returns:
+            Dictionary containing complete member data if found,
+            None if member cannot be found or if API call fails
+        """
+        try:
+            if fields is not None:
+                return (await self.backend.aselect_members([member_id], fields)).get(member_id)
+            return await self.backend.aget_member(member_id)
+
+        except Exception as e:
+            # Handle any exceptions during the API call
+            # This includes network errors, timeout issues, etc.
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_member_data")
+            return None
+
+    @instrument_call("get_child_account_details")
+    async def get_child_account_details(self, child_ids_str: str) -> List[Dict[str, Any]]:
+        """
+        Retrieves detailed information for all dependent (child) accounts.
+
+        Same behaviour as ConnectionManager.get_child_account_details, without blocking.
+
+        Args:
+            child_ids_str: Comma-separated string of child member IDs (e.g., "C12345,C12346")
+
+        Returns:
+            List of dictionaries with memberID, name, dob and policyEndDate,
+            or an empty list if no children found or if API call fails
+        """
+        try:
+            # Resolve all children in one batch lookup, keeping the listed order
+            child_ids = parse_child_ids(child_ids_str)
+            children_by_id = await self.backend.aselect_members(child_ids, SUMMARY_FIELDS)
+            child_details = ordered_summaries(children_by_id, child_ids)
+
+            return child_details
+
+        except Exception as e:
+            # Handle any exceptions that might occur
+            logger.error(f"Error retrieving child account details: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_child_account_details")
+            return []
+
+    @instrument_call("get_members")
+    async def get_members(self, member_ids: List[str],
+                          fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieves several complete member records with a single batch lookup.
+
+        Args:
+            member_ids: The member IDs to look up (the record filter)
+            fields: Only return these fields (None = complete records)
+
+        Returns:
+            Dictionary of memberID -> member record for every ID found.
+            Returns an empty dictionary if the API call fails
+        """
+        try:
+            if fields is not None:
+                return await self.backend.aselect_members(member_ids, fields)
+            return await self.backend.aget_members(member_ids)
+
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_members")
+            return {}
+
+    @instrument_call("get_household")
+    async def get_household(self, member_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves a primary member and all of its child accounts at once.
+
+        Same behaviour as ConnectionManager.get_household, without blocking.
+
+        Args:
+            member_id: The primary member's unique identifier (e.g., "M12345")
+
+        Returns:
+            Dictionary with:
+            - primary: The complete primary member record
+            - child_accounts: List of child summaries (memberID, name, dob, policyEndDate)
+
+            Returns None if member cannot be found or if API call fails
+        """
+        try:
+            household_records = await self.backend.aget_household_records(member_id)
+            if household_records is None:
+                return None
+
+            primary_record, children_by_id = household_records
+            return build_household(primary_record, children_by_id)
+
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_household")
+            return None
+
+    @instrument_call("peek_household")
+    async def peek_household(self, member_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves a household only if the backend can answer without a network call.
+
+        Same behaviour as ConnectionManager.peek_household. Backends holding
+        the data in memory answer inline; file-backed ones (SQLite, snapshot)
+        read in a worker thread, so the event loop never waits for the disk.
+
+        Args:
+            member_id: The primary member's unique identifier (e.g., "M12345")
+
+        Returns:
+            The same dictionary as get_household(), or None if the backend
+            has no current local copy of the household (or the lookup fails)
+        """
+        try:
+            household_records = await self.backend.apeek_household_records(member_id)
+            if household_records is None:
+                return None
+
+            primary_record, children_by_id = household_records
+            return build_household(primary_record, children_by_id)
+
+        except Exception as e:
+            logger.error(f"Error reading local member data: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="peek_household")
+            return None
+
+    @instrument_call("get_expiring_members")
+    async def get_expiring_members(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """
+        Lists the members whose policy ends between two dates (both included).
+
+        Same behaviour as ConnectionManager.get_expiring_members.
+
+        Args:
+            start_date: First end date to include (YYYY-MM-DD)
+            end_date: Last end date to include (YYYY-MM-DD)
+
+        Returns:
+            List of member summaries, earliest end date first, or an empty
+            list if the API call fails
+        """
+        try:
+            expiring = await self.backend.aexpiring_between(start_date, end_date)
+            members_by_id = await self.backend.aselect_members([member_id for member_id, _ in expiring],
+                                                               SUMMARY_FIELDS)
+            return ordered_summaries(members_by_id, [member_id for member_id, _ in expiring])
+
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_expiring_members")
+            return []
+
+    @instrument_call("get_policy_status")
+    async def get_policy_status(self, member_ids: List[str], as_of: str) -> Dict[str, bool]:
+        """
+        Checks which members' policies are active on a date.
+
+        Same behaviour as ConnectionManager.get_policy_status.
+
+        Returns:
+            Dictionary of memberID -> True if active, for every ID found,
+            or an empty dictionary if the API call fails
+        """
+        try:
+            members = await self.backend.aselect_members(member_ids, ('policyEndDate',))
+            return {member_id: bool(record.get('policyEndDate')) and as_of < record['policyEndDate']
+                    for member_id, record in members.items()}
+
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_policy_status")
+            return {}
+
+    @instrument_call("update_member_data")
+    async def update_member_data(self, member_id: str, data: Dict[str, Any],
+                                 idempotency_key: Optional[str] = None) -> bool:
+        """
+        Updates member data in the database.
+
+        A single-member shortcut for bulk_update_members().
+
+        Args:
+            member_id: The member's unique identifier
+            data: Dictionary containing data fields to update
+            idempotency_key: Optional key identifying this update (see bulk_update_members)
+
+        Returns:
+            Boolean indicating success (True) or failure (False)
+        """
+        results = await self.bulk_update_members({member_id: data}, idempotency_key)
+        return results.get(member_id, False)
+
+    @instrument_call("bulk_update_members")
+    async def bulk_update_members(self, updates: Dict[str, Dict[str, Any]],
+                                  idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Updates several members in the database in one operation.
+
+        Same behaviour as ConnectionManager.bulk_update_members, without blocking.
+
+        Args:
+            updates: Dictionary of memberID -> data fields to update
+            idempotency_key: Optional key identifying this update; sending it again is a no-op
+
+        Returns:
+            Dictionary of memberID -> success (True) or failure (False)
+        """
+        if not updates:
+            return {}
+
+        try:
+            logger.debug("Updating member data for IDs: %s", list(updates))
+            results = await self.backend.aupdate_members(updates, idempotency_key)
+
+            for member_id, found in results.items():
+                if not found:
+                    logger.error(f"Member ID not found in database: {member_id}")
+            logger.debug("Member update results: %s", results)
+            return results
+
+        except Exception as e:
+            # Handle any exceptions during the update process
+            logger.error(f"Error updating member data: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="bulk_update_members")
+            return {member_id: False for member_id in updates}
@@ -0,0 +1,24 @@
+from .base import StorageBackend, StorageError, WriteConflictError
+from .jsonbin import JSONBinBackend
+from .sqlite import SQLiteBackend
+from .sharded import ShardedBackend, reshard
+from .snapshot import SnapshotBackend, refresh_snapshot
+from .journaled import JournaledBackend
+from .factory import create_backend, get_backend, set_backend, load_member_store_config
+
+__all__ = [
+    'StorageBackend',
+    'StorageError',
+    'WriteConflictError',
+    'JSONBinBackend',
+    'SQLiteBackend',
+    'ShardedBackend',
+    'reshard',
+    'SnapshotBackend',
+    'refresh_snapshot',
+    'JournaledBackend',
+    'create_backend',
+    'get_backend',
+    'set_backend',
+    'load_member_store_config'
+]
@@ -0,0 +1,200 @@
+import asyncio
+from typing import Dict, Iterable, List, Optional, Any, Sequence, Tuple
+
+from ..expiry_index import PolicyExpiryIndex
+from ..records import household_member_ids, project_members
+
+
+class StorageError(Exception):
+    """Raised by a storage backend when the underlying store cannot be reached or written."""
+
+
+class WriteConflictError(StorageError):
+    """Raised when a write was rejected because the data changed since it was read."""
+
+
+class StorageBackend:
+    """
+    Interface every member storage engine implements.
+
+    The connection managers only talk to this interface, so the place our
+    member records live (JSONbin, a local SQLite file, ...) can be swapped
+    through configuration without touching any action.
+
+    Backends must implement:
+    - get_members: batch lookup of complete member records
+    - update_members: apply field updates to several members at once
+
+    Everything else has a default built on those two. Backends that can
+    filter or trim records at the source (select_members) override the
+    defaults to do so. Async callers use the
+    a-prefixed variants, which run the synchronous version in a worker
+    thread unless a backend provides a native non-blocking implementation.
+
+    Failures to reach or write the store are raised as StorageError.
+    """
+
+    # Short name used in configuration and log messages
+    name = "base"
+
+    def get_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Looks up several members at once.
+
+        Args:
+            member_ids: The member IDs to resolve
+
+        Returns:
+            Dictionary of memberID -> complete member record, for the IDs that exist
+        """
+        raise NotImplementedError
+
+    def update_members(self, updates: Dict[str, Dict[str, Any]],
+                       idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Applies field updates to several members in one operation.
+
+        Args:
+            updates: Dictionary of memberID -> data fields to update
+            idempotency_key: Identifies this batch of updates; a member that
+                already received an update with the same key is left as it is
+                (and reported as updated), so sending a batch again is a no-op
+
+        Returns:
+            Dictionary of memberID -> True if the member existed and was updated
+        """
+        raise NotImplementedError
+
+    def select_members(self, member_ids: Iterable[str],
+                       fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Looks up several members, returning only some of their fields.
+
+        By default the complete records are read and trimmed here; backends
+        that can select records and fields at the source push the member ID
+        filter and the field projection down to it.
+
+        Args:
+            member_ids: The member IDs to resolve
+            fields: The fields wanted (None = complete records); memberID is always included
+
+        Returns:
+            Dictionary of memberID -> (projected) member record, for the IDs that exist
+        """
+        return project_members(self.get_members(member_ids), fields)
+
+    def get_member(self, member_id: str) -> Optional[Dict[str, Any]]:
+        """Looks up a single member; returns None if it does not exist."""
+        return self.get_members([member_id]).get(member_id)
+
+    def get_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        """
+        Looks up a primary member and the records of all its child accounts.
+
+        Args:
+            member_id: The primary member's unique identifier
+
+        Returns:
+            Tuple of (primary record, memberID -> child record),
+            or None if the primary member does not exist
+        """
+        primary_record = self.get_member(member_id)
+        if primary_record is None:
+            return None
+        return primary_record, self.get_members(household_member_ids(primary_record)[1:])
+
+    def peek_members(self, member_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Looks up several members only if it can be done without contacting the store.
+
+        Backends holding a local copy they know to be current (a fresh cache,
+        a snapshot, a local database file) answer from it; the others return None.
+
+        Returns:
+            Dictionary of memberID -> complete member record for the IDs found,
+            or None if answering would need a network call
+        """
+        return None
+
+    def peek_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        """
+        Like get_household_records(), but only from data available locally.
+
+        Returns:
+            Tuple of (primary record, memberID -> child record), or None if the
+            household cannot be read without a network call (or does not exist)
+        """
+        found = self.peek_members([member_id])
+        if not found or member_id not in found:
+            return None
+        primary_record = found[member_id]
+        children_by_id = self.peek_members(household_member_ids(primary_record)[1:])
+        if children_by_id is None:
+            return None
+        return primary_record, children_by_id
+
+    def expiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        """
+        Lists the members whose policy ends in a date range (both ends included).
+
+        By default this reads every record and sorts them; backends keeping
+        an index on policyEndDate answer from it instead.
+
+        Returns:
+            (memberID, policyEndDate) pairs, earliest end date first
+        """
+        return PolicyExpiryIndex(self.export_records()).expiring_between(start_date, end_date)
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        """
+        Reads every member record in the store.
+
+        Used by maintenance tools such as resharding, never by the actions.
+        """
+        raise NotImplementedError(f"The {self.name} backend cannot export its records")
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Replaces the whole content of the store with these records.
+
+        Used by maintenance tools such as resharding, never by the actions.
+
+        Returns:
+            Number of records written
+        """
+        raise NotImplementedError(f"The {self.name} backend cannot import records")
+
+    def close(self) -> None:
+        """Releases any connections held by the backend."""
+
+    # Async variants - run the blocking version in a worker thread by default
+
+    async def aget_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return await asyncio.to_thread(self.get_members, list(member_ids))
+
+    async def aupdate_members(self, updates: Dict[str, Dict[str, Any]],
+                              idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        return await asyncio.to_thread(self.update_members, updates, idempotency_key)
+
+    async def aselect_members(self, member_ids: Iterable[str],
+                              fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        return project_members(await self.aget_members(member_ids), fields)
+
+    async def aexpiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        return await asyncio.to_thread(self.expiring_between, start_date, end_date)
+
+    async def aget_member(self, member_id: str) -> Optional[Dict[str, Any]]:
+        return (await self.aget_members([member_id])).get(member_id)
+
+    async def aget_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        primary_record = await self.aget_member(member_id)
+        if primary_record is None:
+            return None
+        return primary_record, await self.aget_members(household_member_ids(primary_record)[1:])
+
+    async def apeek_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        # Local data can still mean file or database reads; backends holding it in memory answer inline
+        return await asyncio.to_thread(self.peek_household_records, member_id)
+
+    async def aclose(self) -> None:
+        self.close()
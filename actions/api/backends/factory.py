@@ -0,0 +1,123 @@
+import os
+import threading
+from typing import Dict, Optional, Any
+import logging
+
+import yaml
+
+from .base import StorageBackend
+from .journaled import JournaledBackend
+from .jsonbin import JSONBinBackend
+from .sharded import ShardedBackend
+from .snapshot import SnapshotBackend
+from .sqlite import SQLiteBackend
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Available storage engines, by the name used in configuration
+BACKENDS = {
+    JSONBinBackend.name: JSONBinBackend,
+    SQLiteBackend.name: SQLiteBackend,
+    ShardedBackend.name: ShardedBackend,
+    SnapshotBackend.name: SnapshotBackend,
+    JournaledBackend.name: JournaledBackend,
+}
+
+# Engine used when nothing is configured
+DEFAULT_BACKEND = JSONBinBackend.name
+
+# The single backend shared by all connection managers in this process
+_shared_backend: Optional[StorageBackend] = None
+_shared_backend_lock = threading.Lock()
+
+
+def load_member_store_config(endpoints_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Reads the member_store section of endpoints.yml.
+
+    Examples:
+        member_store:
+          type: sqlite
+          path: members.db
+
+        member_store:
+          type: sharded
+          shards:
+            - https://api.jsonbin.io/v3/b/<bin id 0>
+            - https://api.jsonbin.io/v3/b/<bin id 1>
+
+        member_store:
+          type: snapshot
+          path: /var/lib/rasa/members.snap
+          source:
+            type: jsonbin
+
+        member_store:
+          type: journaled
+          path: /var/lib/rasa/member_updates.journal
+          source:
+            type: jsonbin
+
+    The MEMBER_STORE_TYPE environment variable overrides the configured type.
+    The file location can be changed with the ENDPOINTS_FILE variable.
+
+    Returns:
+        The member_store settings (empty if the file or section is missing)
+    """
+    endpoints_path = endpoints_path or os.environ.get("ENDPOINTS_FILE", "endpoints.yml")
+    config: Dict[str, Any] = {}
+    if os.path.exists(endpoints_path):
+        with open(endpoints_path) as f:
+            config = dict((yaml.safe_load(f) or {}).get("member_store") or {})
+
+    if os.environ.get("MEMBER_STORE_TYPE"):
+        config["type"] = os.environ["MEMBER_STORE_TYPE"]
+    return config
+
+
+def create_backend(config: Optional[Dict[str, Any]] = None) -> StorageBackend:
+    """
+    Builds a storage backend from configuration.
+
+    Args:
+        config: member_store settings; read from endpoints.yml when omitted.
+                "type" selects the engine, every other key is passed to it
+
+    Returns:
+        A new StorageBackend instance
+    """
+    config = dict(config if config is not None else load_member_store_config())
+    backend_type = config.pop("type", DEFAULT_BACKEND)
+    if backend_type not in BACKENDS:
+        raise ValueError(f"Unknown member_store type '{backend_type}', expected one of: {', '.join(BACKENDS)}")
+
+    logger.info(f"Using '{backend_type}' member storage backend")
+    return BACKENDS[backend_type](**config)
+
+
+def get_backend() -> StorageBackend:
+    """
+    Returns the storage backend shared by every connection manager in this process.
+
+    Created from configuration on first use. Safe to call from multiple threads.
+    """
+    global _shared_backend
+    if _shared_backend is None:
+        with _shared_backend_lock:
+            # Check again inside the lock - another thread may have won the race
+            if _shared_backend is None:
+                _shared_backend = create_backend()
+    return _shared_backend
+
+
+def set_backend(backend: StorageBackend) -> None:
+    """
+    Replaces the process-wide storage backend.
+
+    Used by benchmarks and tools that point the actions at a different store.
+    Connection managers created without an explicit backend pick it up immediately.
+    """
+    global _shared_backend
+    with _shared_backend_lock:
+        _shared_backend = backend
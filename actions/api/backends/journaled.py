@@ -0,0 +1,580 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Any, Sequence, Tuple, Union
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows - the journal is then not protected against a second process
+    fcntl = None
+
+from .base import StorageBackend, StorageError
+from ..expiry_index import PolicyExpiryIndex
+from ..metrics import Counter, Histogram
+from ..records import UPDATE_KEYS_FIELD
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Journal file of this action-server process, tunable with MEMBER_JOURNAL_PATH
+# (every process needs its own file - a second process can't open one in use)
+JOURNAL_PATH = os.environ.get("MEMBER_JOURNAL_PATH", "member_updates.journal")
+
+# How long (seconds) updates may wait in the journal before they are written to the store
+FLUSH_INTERVAL = float(os.environ.get("MEMBER_JOURNAL_FLUSH_SECONDS", 0.5))
+
+# Most journaled updates combined into one write to the store
+MAX_BATCH = int(os.environ.get("MEMBER_JOURNAL_MAX_BATCH", 500))
+
+# Force every journal entry to disk before the update is acknowledged.
+# Without it an update survives a crash of the process, not of the machine
+FSYNC = os.environ.get("MEMBER_JOURNAL_FSYNC", "true").lower() != "false"
+
+# Longest pause between flush attempts while the store keeps failing
+MAX_RETRY_SECONDS = 30.0
+
+# Journal size (bytes) above which it is rewritten with only the pending updates
+COMPACT_BYTES = 1024 * 1024
+
+# Idempotency keys of recent updates remembered to answer repeats without journaling them again
+KEYS_REMEMBERED = 1000
+
+JOURNAL_APPENDS = Counter("member_journal_appends_total", "Member updates written to the local journal")
+JOURNAL_FLUSHES = Counter("member_journal_flushes_total", "Batches of journaled updates written to the store (result=ok|failed)")
+JOURNAL_FLUSH_SECONDS = Histogram("member_journal_flush_seconds", "Time taken to write a batch of journaled updates to the store")
+JOURNAL_DROPPED = Counter("member_journal_dropped_total", "Journaled updates for members the store no longer has")
+
+
+class JournalEntry:
+    """One journaled batch of member updates."""
+
+    __slots__ = ("seq", "updates", "key", "results")
+
+    def __init__(self, seq: int, updates: Dict[str, Dict[str, Any]], key: Optional[str],
+                 results: Dict[str, bool]):
+        self.seq = seq
+        self.updates = updates
+        self.key = key
+        self.results = results
+
+
+def coalesce(entries: Sequence[JournalEntry], with_keys: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Combines journaled updates into one update per member.
+
+    Later entries win field by field, so the result is what applying the
+    entries one after the other would have done.
+
+    Args:
+        entries: Journaled updates, oldest first
+        with_keys: Also carry the idempotency keys of the entries, under
+            UPDATE_KEYS_FIELD, so the store keeps them on every member they
+            updated (update_record adds them to the member's keys)
+    """
+    combined: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        for member_id, data in entry.updates.items():
+            member = combined.setdefault(member_id, {})
+            member.update(data)
+            if with_keys and entry.key is not None:
+                member.setdefault(UPDATE_KEYS_FIELD, []).append(entry.key)
+    return combined
+
+
+class JournaledBackend(StorageBackend):
+    """
+    Acknowledges member updates once they are journaled locally, and writes them to the store in the background.
+
+    A JSONbin update rewrites the whole bin, which takes the user's turn
+    hundreds of milliseconds. With this backend in front of the store:
+    - An update is appended to a local journal file (and forced to disk)
+      and acknowledged straight away - the turn no longer waits for the store
+    - A background flusher picks up everything journaled in the last
+      flush_interval seconds, combines it into one update per member and
+      writes it to the store in a single call
+    - Until then, reads overlay the pending updates on what the store
+      returns, so a conversation sees its own cancellation at once
+    - After a crash or restart the journal is read back and the updates
+      the store never received are written again. A batch interrupted
+      half-way is sent again with the same idempotency key, so the store
+      applies it only once
+    - The idempotency keys of the journaled updates are written to the
+      store with them, so an update sent again long after it was flushed
+      (after a restart, or once the journal was compacted) is recognised
+      from the store's record and not applied twice - when journaling if
+      the store has the record locally, otherwise by the flusher
+
+    Journaling never waits for the store: members are checked against what
+    the store can answer locally (peek_members). Members it knows not to
+    have are reported as not updated, like the other backends; when it has
+    nothing local, updates are journaled as they are and the flusher drops
+    those for unknown members. If the store fails, the flusher keeps the
+    updates and tries again with a growing pause.
+
+    Each action-server process needs its own journal file; the file is
+    locked while in use.
+    """
+
+    name = "journaled"
+
+    def __init__(self,
+                 path: str = JOURNAL_PATH,
+                 source: Optional[Union[Dict[str, Any], StorageBackend]] = None,
+                 flush_interval: float = FLUSH_INTERVAL,
+                 max_batch: int = MAX_BATCH,
+                 fsync: bool = FSYNC):
+        """
+        Args:
+            path: The journal file of this process
+            source: The store the updates end up in, and reads come from -
+                a member_store style config dictionary or a backend.
+                Defaults to JSONbin
+            flush_interval: Seconds updates may wait before being written to the store
+            max_batch: Most journaled updates combined into one write
+            fsync: Force every journal entry to disk before acknowledging it
+        """
+        self.path = path
+        self.source = self._build_source(source)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+
+        # Journaled updates not yet written to the store, oldest first
+        self._pending: List[JournalEntry] = []
+        # memberID -> pending update fields, in journal order; rebuilt on every change
+        self._overlay: Dict[str, Dict[str, Any]] = {}
+        # Idempotency key -> results, for updates journaled recently
+        self._recent_keys: "OrderedDict[str, Dict[str, bool]]" = OrderedDict()
+        self._next_seq = 1
+        # Names this journal in the idempotency keys of its batches (kept across restarts)
+        self._journal_id = uuid.uuid4().hex[:12]
+        # (last update number, idempotency key) of a batch sent to the store but not confirmed
+        self._inflight: Optional[Tuple[int, str]] = None
+
+        # Guards the journal file and the pending list; held only for file appends, never during store calls
+        self._lock = threading.Lock()
+        # One flush at a time (the flusher thread, or close())
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+
+        self._file = self._open_journal()
+        self._replay()
+        if self._pending:
+            # Updates left over from the last run go out first
+            self._wake.set()
+        self._flusher = threading.Thread(target=self._run_flusher, name="member-journal-flusher", daemon=True)
+        self._flusher.start()
+
+    @staticmethod
+    def _build_source(source: Optional[Union[Dict[str, Any], StorageBackend]]) -> StorageBackend:
+        if isinstance(source, StorageBackend):
+            return source
+        # Imported here because the factory itself imports this module
+        from .factory import create_backend
+        return create_backend(dict(source or {"type": "jsonbin"}))
+
+    # The journal file
+
+    def _open_journal(self):
+        journal = open(self.path, "a+b")
+        if fcntl is not None:
+            try:
+                fcntl.flock(journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                journal.close()
+                raise StorageError(f"The member journal {self.path} is in use by another process")
+        return journal
+
+    @staticmethod
+    def _encode(lines: Iterable[Dict[str, Any]]) -> bytes:
+        return b"".join(json.dumps(line, separators=(",", ":")).encode() + b"\n" for line in lines)
+
+    def _append(self, *lines: Dict[str, Any]) -> None:
+        """Writes journal lines and makes them durable (lock held)."""
+        self._file.write(self._encode(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _replay(self) -> None:
+        """
+        Reads the journal back after a restart.
+
+        How it works:
+        1. The "journal" line names the journal
+        2. "update" lines are journaled updates, numbered in order
+        3. "flushed" lines mark every update up to a number as written to the store
+        4. A "flushing" line without its "flushed" line is a batch the store
+           may or may not have received when the process stopped; the flusher
+           sends it again first, with the same idempotency key
+
+        A last line cut short by a crash is ignored.
+        """
+        self._file.seek(0)
+        entries: List[JournalEntry] = []
+        flushed_seq = 0
+        interrupted: Optional[Dict[str, Any]] = None
+        for line in self._file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            op = record.get("op")
+            if op == "journal":
+                self._journal_id = record["id"]
+            elif op == "update":
+                entries.append(JournalEntry(record["seq"], record["updates"], record.get("key"), record["results"]))
+                self._next_seq = max(self._next_seq, record["seq"] + 1)
+            elif op == "flushing":
+                interrupted = record
+            elif op == "flushed":
+                flushed_seq = max(flushed_seq, record["seq"])
+                self._next_seq = max(self._next_seq, record["seq"] + 1)
+                interrupted = None
+
+        self._pending = [entry for entry in entries if entry.seq > flushed_seq]
+        for entry in entries:
+            if entry.key is not None:
+                self._remember_key(entry.key, entry.results)
+        self._rebuild_overlay()
+        if interrupted is not None and interrupted["seq"] > flushed_seq:
+            self._inflight = (interrupted["seq"], interrupted["key"])
+        if self._pending:
+            logger.info(f"Member journal {self.path}: {len(self._pending)} updates not yet in the "
+                        f"{self.source.name} store - writing them now")
+        if self._file.tell() == 0:
+            with self._lock:
+                self._append({"op": "journal", "id": self._journal_id})
+
+    def _compact(self) -> None:
+        """Rewrites the journal with only the pending updates, once it has grown large (flush lock held)."""
+        with self._lock:
+            if self._file.tell() < COMPACT_BYTES:
+                return
+            lines = [{"op": "journal", "id": self._journal_id}, {"op": "flushed", "seq": self._next_seq - 1}]
+            if self._pending:
+                # Start over just before the first pending update
+                lines[1]["seq"] = self._pending[0].seq - 1
+            lines.extend({"op": "update", "seq": entry.seq, "key": entry.key, "updates": entry.updates,
+                          "results": entry.results} for entry in self._pending)
+            if self._inflight is not None:
+                lines.append({"op": "flushing", "seq": self._inflight[0], "key": self._inflight[1]})
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "wb") as f:
+                f.write(self._encode(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            # Keep the lock across the swap: lock the new file before releasing the old one
+            replacement = open(temporary_path, "a+b")
+            if fcntl is not None:
+                fcntl.flock(replacement.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            os.replace(temporary_path, self.path)
+            self._file.close()
+            self._file = replacement
+
+    # Pending updates
+
+    def _rebuild_overlay(self) -> None:
+        """Recomputes the memberID -> pending fields view used by reads (lock held, or during start-up)."""
+        self._overlay = coalesce(self._pending)
+
+    def _remember_key(self, key: str, results: Dict[str, bool]) -> None:
+        self._recent_keys[key] = results
+        self._recent_keys.move_to_end(key)
+        while len(self._recent_keys) > KEYS_REMEMBERED:
+            self._recent_keys.popitem(last=False)
+
+    def _journal(self, updates: Dict[str, Dict[str, Any]], idempotency_key: Optional[str]) -> Dict[str, bool]:
+        """
+        Journals member updates; returns memberID -> journaled.
+
+        Only the store's local data is consulted (no network call): members
+        it knows not to have are left out, and so are members whose record
+        already carries the idempotency key (updated before). Without local
+        data everything is journaled and the flusher sorts it out.
+
+        Args:
+            updates: Dictionary of memberID -> data fields to update
+            idempotency_key: Identifies the update
+        """
+        known = self.source.peek_members(list(updates))
+        if known is None:
+            results = {member_id: True for member_id in updates}
+            journaled = {member_id: dict(data) for member_id, data in updates.items()}
+        else:
+            results = {member_id: member_id in known for member_id in updates}
+            journaled = {member_id: dict(data) for member_id, data in updates.items()
+                         if member_id in known
+                         and idempotency_key not in (known[member_id].get(UPDATE_KEYS_FIELD) or ())}
+        if not journaled:
+            return results
+        with self._lock:
+            if idempotency_key is not None and idempotency_key in self._recent_keys:
+                # The same update sent again (e.g. a retried turn) - already journaled
+                return dict(self._recent_keys[idempotency_key])
+            entry = JournalEntry(self._next_seq, journaled, idempotency_key, results)
+            self._append({"op": "update", "seq": entry.seq, "key": idempotency_key,
+                          "updates": journaled, "results": results})
+            self._next_seq += 1
+            self._pending.append(entry)
+            self._rebuild_overlay()
+            if idempotency_key is not None:
+                self._remember_key(idempotency_key, results)
+        JOURNAL_APPENDS.inc(backend=self.source.name)
+        logger.debug("Journaled update %d for %s", entry.seq, list(journaled))
+        return results
+
+    def _with_overlay(self, members: Dict[str, Dict[str, Any]],
+                      fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Applies pending updates to records read from the store."""
+        overlay = self._overlay
+        if not overlay:
+            return members
+        for member_id, record in members.items():
+            data = overlay.get(member_id)
+            if data is not None:
+                if fields is not None:
+                    data = {field: value for field, value in data.items() if field in fields}
+                members[member_id] = {**record, **data}
+        return members
+
+    def pending_count(self) -> int:
+        """Number of journaled updates not yet written to the store."""
+        return len(self._pending)
+
+    # Flushing
+
+    def _run_flusher(self) -> None:
+        """Background thread writing journaled updates to the store."""
+        pause = self.flush_interval
+        while not self._stopped:
+            self._wake.wait(pause)
+            self._wake.clear()
+            if self._stopped:
+                return
+            try:
+                self.flush()
+                pause = self.flush_interval
+            except Exception as e:
+                pause = min(MAX_RETRY_SECONDS, max(pause, 0.5) * 2)
+                logger.error(f"Could not write journaled member updates to the {self.source.name} store, "
+                             f"retrying in {pause:.1f}s: {e}")
+
+    def flush(self) -> int:
+        """
+        Writes every pending update to the store.
+
+        Runs in the background flusher; call it directly to drain the journal
+        (e.g. before shutting down).
+
+        Returns:
+            Number of journaled updates written
+
+        Raises:
+            StorageError (or the store's own errors): If the store could not be
+                written; the updates stay pending
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                written += self._flush_batch()
+                if not self._pending:
+                    break
+            self._compact()
+        return written
+
+    def _unapplied_updates(self, batch: Sequence[JournalEntry]) -> Dict[str, Dict[str, Any]]:
+        """
+        Combines a batch into one update per member, leaving out updates the store already has (flush lock held).
+
+        An update journaled without the store's local data (or sent again
+        after the journal forgot it) may already be in the store; its key
+        on the member's record shows it. The records are read locally if
+        the store can, otherwise from the store - in the flusher, not in a
+        user's turn.
+        """
+        keyed = list({member_id for entry in batch if entry.key is not None for member_id in entry.updates})
+        stored_keys: Dict[str, Any] = {}
+        if keyed:
+            stored = self.source.peek_members(keyed)
+            if stored is None:
+                stored = self.source.select_members(keyed, ("memberID", UPDATE_KEYS_FIELD))
+            stored_keys = {member_id: record.get(UPDATE_KEYS_FIELD) or () for member_id, record in stored.items()}
+        entries = [JournalEntry(entry.seq,
+                                {member_id: data for member_id, data in entry.updates.items()
+                                 if entry.key is None or entry.key not in stored_keys.get(member_id, ())},
+                                entry.key, entry.results)
+                   for entry in batch]
+        return coalesce(entries, with_keys=True)
+
+    def _flush_batch(self) -> int:
+        """
+        Writes one batch of journaled updates to the store with a single call (flush lock held).
+
+        The batch is announced in the journal ("flushing") before the call.
+        A batch that failed, or was cut short by a restart, may have reached
+        the store anyway, so it is sent again exactly as it was, with the
+        same idempotency key.
+
+        Returns:
+            Number of journaled updates written
+        """
+        if self._inflight is None:
+            batch = self._pending[:self.max_batch]
+            if not batch:
+                return 0
+            inflight = (batch[-1].seq, f"journal:{self._journal_id}:{batch[0].seq}-{batch[-1].seq}")
+            with self._lock:
+                self._append({"op": "flushing", "seq": inflight[0], "key": inflight[1]})
+                self._inflight = inflight
+        last_seq, batch_key = self._inflight
+        batch = [entry for entry in self._pending if entry.seq <= last_seq]
+        started = time.monotonic()
+        try:
+            updates = self._unapplied_updates(batch)
+            results = self.source.update_members(updates, batch_key) if updates else {}
+        except Exception:
+            JOURNAL_FLUSHES.inc(backend=self.source.name, result="failed")
+            raise
+        JOURNAL_FLUSH_SECONDS.observe(time.monotonic() - started, backend=self.source.name)
+        JOURNAL_FLUSHES.inc(backend=self.source.name, result="ok")
+
+        missing = [member_id for member_id, found in results.items() if not found]
+        if missing:
+            JOURNAL_DROPPED.inc(len(missing), backend=self.source.name)
+            logger.warning(f"Dropped journaled updates for members no longer in the store: {missing}")
+        with self._lock:
+            self._append({"op": "flushed", "seq": last_seq})
+            self._inflight = None
+            self._pending = [entry for entry in self._pending if entry.seq > last_seq]
+            self._rebuild_overlay()
+        logger.debug("Wrote journaled updates up to %d (%d members) to the store", last_seq, len(results))
+        return len(batch)
+
+    # StorageBackend
+
+    def get_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return self._with_overlay(self.source.get_members(member_ids))
+
+    def select_members(self, member_ids: Iterable[str],
+                       fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        return self._with_overlay(self.source.select_members(member_ids, fields), fields)
+
+    def peek_members(self, member_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        members = self.source.peek_members(member_ids)
+        return None if members is None else self._with_overlay(members)
+
+    def expiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        expiring = self.source.expiring_between(start_date, end_date)
+        pending_end_dates = {member_id: data['policyEndDate'] for member_id, data in self._overlay.items()
+                             if 'policyEndDate' in data}
+        if not pending_end_dates:
+            return expiring
+        # Pending updates override the store's end dates
+        expiring = [pair for pair in expiring if pair[0] not in pending_end_dates]
+        expiring.extend(PolicyExpiryIndex({'memberID': member_id, 'policyEndDate': end}
+                                          for member_id, end in pending_end_dates.items())
+                        .expiring_between(start_date, end_date))
+        return sorted(expiring, key=lambda pair: (pair[1], pair[0]))
+
+    def update_members(self, updates: Dict[str, Dict[str, Any]],
+                       idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        results = self._journal(updates, idempotency_key)
+        self._wake_flusher()
+        return results
+
+    def _wake_flusher(self) -> None:
+        # A full batch is written straight away instead of after the interval
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        self.flush()
+        return self.source.export_records()
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        # Pending updates were made against the data being replaced
+        self.flush()
+        return self.source.import_records(records)
+
+    def _stop_flusher(self) -> None:
+        self._stopped = True
+        self._wake.set()
+        self._flusher.join()
+
+    def close(self) -> None:
+        """Stops the flusher, writes what is still pending and releases the journal."""
+        self._stop_flusher()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"{len(self._pending)} member updates stay in {self.path} until the next start: {e}")
+        with self._lock:
+            self._file.close()
+        self.source.close()
+
+    # Async variants - reads await the store natively, journal appends run in a worker thread
+
+    async def aget_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        return self._with_overlay(await self.source.aget_members(member_ids))
+
+    async def aselect_members(self, member_ids: Iterable[str],
+                              fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        return self._with_overlay(await self.source.aselect_members(member_ids, fields), fields)
+
+    async def aexpiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        return await asyncio.to_thread(self.expiring_between, start_date, end_date)
+
+    async def aupdate_members(self, updates: Dict[str, Dict[str, Any]],
+                              idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        # The local lookup and the fsync can take milliseconds - keep them off the event loop
+        results = await asyncio.to_thread(self._journal, updates, idempotency_key)
+        self._wake_flusher()
+        return results
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self._stop_flusher)
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            logger.error(f"{len(self._pending)} member updates stay in {self.path} until the next start: {e}")
+        with self._lock:
+            self._file.close()
+        await self.source.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect or drain a member update journal")
+    parser.add_argument("path", nargs="?", default=JOURNAL_PATH, help="journal file of a stopped action server")
+    parser.add_argument("--flush", action="store_true", help="write the pending updates to the store and exit")
+    args = parser.parse_args()
+
+    # The journal writes to the member_store's source, like the action server would
+    from .factory import create_backend, load_member_store_config
+    config = load_member_store_config()
+    source_config = config.get("source") if config.get("type") == JournaledBackend.name else config
+    # Nothing is written to the store without --flush
+    backend = JournaledBackend(args.path, dict(source_config or {"type": "jsonbin"}),
+                               flush_interval=threading.TIMEOUT_MAX)
+    backend._stop_flusher()
+    for entry in backend._pending:
+        print(json.dumps({"seq": entry.seq, "key": entry.key, "updates": entry.updates}))
+    print(f"{backend.pending_count()} updates pending in {args.path}", file=sys.stderr)
+    if args.flush:
+        print(f"Wrote {backend.flush()} updates to the {backend.source.name} store", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        main()
+    except Exception as e:
+        sys.exit(f"Journal maintenance failed: {e}")
@@ -0,0 +1,966 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterable, List, Optional, Any, Sequence, Tuple
+import logging
+
+from .base import StorageBackend, StorageError, WriteConflictError
+from ..member_cache import MemberCache, DEFAULT_TTL_SECONDS
+from ..metrics import (BACKEND_BYTES, BACKEND_REQUESTS, CACHE_LOOKUPS, CACHE_REFRESHES, RECORDS_SCANNED, WRITE_CONFLICTS,
+                       start_in_context)
+from ..record_stream import RecordPicker, RecordStream, STREAM_CHUNK_SIZE, aiter_records, iter_records
+from ..records import apply_member_updates, household_member_ids, STALE_FLAG
+from ..resilience import CircuitBreaker, CircuitOpenError
+from ..scheduler import READ, WRITE, RateLimitedError, RequestScheduler
+from ..singleflight import SingleFlight
+from ..snapshot import MemberSnapshot, write_snapshot
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Base URL for our JSONbin database
+# This is where all our member records are stored
+JSONBIN_BASE_URL = "https://api.jsonbin.io/v3/b/67aa6b3aacd3cb34a8dd1abb"
+
+# Authentication headers required by JSONbin
+# The master key allows read access to our data
+JSONBIN_HEADERS = {
+    'X-Master-Key': '$2a$10$j9N2X2cOS686Gk5IRXITw.8JhMMn9o/66t2N9h2twDPIkLse3uVHW'
+}
+
+# How long a downloaded dataset is trusted, tunable with MEMBER_CACHE_TTL_SECONDS
+CACHE_TTL_SECONDS = float(os.environ.get("MEMBER_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+
+# HTTP connection pool settings, tunable per deployment through environment variables
+# - POOL_SIZE: maximum number of kept-alive connections to the database API
+# - KEEP_ALIVE: set to "false" to close the connection after every request
+# - CONNECT/READ_TIMEOUT: seconds to wait for the connection / for the response
+HTTP_POOL_SIZE = int(os.environ.get("JSONBIN_POOL_SIZE", 10))
+HTTP_KEEP_ALIVE = os.environ.get("JSONBIN_KEEP_ALIVE", "true").lower() != "false"
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("JSONBIN_CONNECT_TIMEOUT", 3.05))
+HTTP_READ_TIMEOUT = float(os.environ.get("JSONBIN_READ_TIMEOUT", 10.0))
+
+# Check the bin's version count before re-downloading the whole record array.
+# Only safe when every writer keeps JSONbin versioning on (the default for PUT),
+# so it is opt-in with JSONBIN_VERSION_CHECK=true
+VERSION_CHECK = os.environ.get("JSONBIN_VERSION_CHECK", "false").lower() == "true"
+
+# Latency bounds, tunable per deployment through environment variables
+# - READ/WRITE_DEADLINE: maximum seconds for a whole refresh / read-modify-write
+# - BREAKER_FAILURES: consecutive failures before calls are rejected immediately
+# - BREAKER_RESET_SECONDS: how long to fail fast before trying the backend again
+READ_DEADLINE = float(os.environ.get("JSONBIN_READ_DEADLINE", 5.0))
+WRITE_DEADLINE = float(os.environ.get("JSONBIN_WRITE_DEADLINE", 15.0))
+BREAKER_FAILURES = int(os.environ.get("JSONBIN_BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = float(os.environ.get("JSONBIN_BREAKER_RESET_SECONDS", 30.0))
+
+# Stale-while-revalidate: once the TTL expires, keep answering from the old data
+# (flagged as stale) while a background refresh runs, for at most MAX_STALE seconds
+SERVE_STALE = os.environ.get("MEMBER_CACHE_SERVE_STALE", "true").lower() != "false"
+MAX_STALE_SECONDS = float(os.environ.get("MEMBER_CACHE_MAX_STALE_SECONDS", 3600.0))
+
+# How lookups are answered, set with JSONBIN_LOOKUP_MODE
+# - "index" (default): download the whole bin into the in-memory member index
+# - "stream": parse the bin's record array as it arrives on every lookup and
+#   stop as soon as the requested members are found; memory per lookup stays
+#   flat however big the dataset grows, at the cost of a request per lookup
+LOOKUP_MODES = ("index", "stream")
+LOOKUP_MODE = os.environ.get("JSONBIN_LOOKUP_MODE", "index").lower()
+
+# In stream mode, ask JSONbin to filter the bin server-side (X-JSON-Path read
+# header) so a lookup downloads only the requested records instead of
+# streaming through the population. Opt-in with JSONBIN_JSON_PATH=true;
+# switched off automatically if the bin rejects the header
+JSON_PATH = os.environ.get("JSONBIN_JSON_PATH", "false").lower() == "true"
+JSON_PATH_REJECTED = (400, 422)
+
+# Request pacing, matched to the JSONbin plan's quota
+# - RATE_LIMIT: requests per second allowed (0 = no client-side limit;
+#   HTTP 429 answers and their Retry-After are honoured either way)
+# - RATE_BURST: requests that may go out at once after a quiet period
+# - MAX_QUEUE_SECONDS: how long a request may wait for its turn before failing
+RATE_LIMIT = float(os.environ.get("JSONBIN_RATE_LIMIT", 0.0))
+RATE_BURST = float(os.environ.get("JSONBIN_RATE_BURST", 0.0)) or None
+MAX_QUEUE_SECONDS = float(os.environ.get("JSONBIN_MAX_QUEUE_SECONDS", 2.0))
+
+# Optimistic concurrency for updates (opt-in with JSONBIN_WRITE_CAS=true):
+# the PUT carries the ETag of the data it was built from (If-Match), and a
+# write rejected with HTTP 412 because someone else wrote in between is
+# rebuilt from fresh data and sent again, up to CAS_RETRIES times. Writers
+# then no longer queue behind a lock. Only turn it on for a store known to
+# honour If-Match; by default (and whenever the store sends no ETag) writes
+# are unconditional and serialized by a per-process lock
+WRITE_CAS = os.environ.get("JSONBIN_WRITE_CAS", "false").lower() == "true"
+CAS_RETRIES = int(os.environ.get("JSONBIN_CAS_RETRIES", 8))
+WRITE_CONFLICT = 412
+
+# JSONbin counts the quota per account, so every backend using the same
+# master key in this process shares one scheduler (e.g. all shards)
+_schedulers: Dict[Optional[str], RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def shared_scheduler(master_key: Optional[str], rate: float = RATE_LIMIT, burst: Optional[float] = RATE_BURST,
+                     max_wait: float = MAX_QUEUE_SECONDS) -> RequestScheduler:
+    """Returns the request scheduler for a JSONbin account, creating it on first use."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(master_key)
+        if scheduler is None:
+            scheduler = _schedulers[master_key] = RequestScheduler("jsonbin", rate, burst, max_wait)
+        return scheduler
+
+
+# Warm start: keep the last good dataset in this local snapshot file and
+# answer from it right after a restart while JSONbin is revalidated in the
+# background. Unset (the default) turns it off
+WARM_START_PATH = os.environ.get("MEMBER_CACHE_SNAPSHOT_PATH") or None
+
+
+class JSONBinBackend(StorageBackend):
+    """
+    Stores all member records as one JSON document in a JSONbin.io bin.
+
+    JSONbin has no per-record access, so this backend:
+    - Downloads the whole record array and keeps it in an in-memory index
+      (MemberCache) that is refreshed after a TTL
+    - Answers lookups from that index without a network call
+    - When the TTL expires, first checks whether the bin changed at all
+      (version count and/or conditional HTTP headers) and only re-downloads
+      and re-indexes the records if it did
+    - Writes by reading the whole document, changing it and writing it back,
+      one writer at a time; with write_cas the write instead only succeeds if
+      the bin is still at the version it was built from (If-Match), and is
+      rebuilt on fresh data otherwise
+
+    With lookup_mode="stream" lookups skip the index entirely: the record
+    array is parsed incrementally from the response body and the download
+    is abandoned as soon as every requested member has been seen. With
+    json_path on as well, the member ID filter is sent to JSONbin, which
+    then returns only the requested records.
+
+    With warm_start_path set, every downloaded dataset is also saved to a
+    local snapshot file; after a restart lookups are answered from it
+    within milliseconds while the data is revalidated in the background.
+
+    Latency is bounded: every operation has a deadline, a circuit breaker
+    fails fast while JSONbin is degraded, and expired data keeps being
+    served (flagged with STALE_FLAG) while it is refreshed in the background.
+
+    Every request goes through a RequestScheduler that keeps us within the
+    account's quota: bursts queue briefly (lookups ahead of writes) and
+    HTTP 429 answers pause and retry instead of failing the call.
+
+    It keeps two pooled HTTP clients: a requests session for synchronous
+    callers and an aiohttp session for the async actions.
+    """
+
+    name = "jsonbin"
+
+    def __init__(self,
+                 base_url: str = JSONBIN_BASE_URL,
+                 master_key: Optional[str] = None,
+                 member_cache: Optional[MemberCache] = None,
+                 cache_ttl_seconds: float = CACHE_TTL_SECONDS,
+                 pool_size: int = HTTP_POOL_SIZE,
+                 keep_alive: bool = HTTP_KEEP_ALIVE,
+                 connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = HTTP_READ_TIMEOUT,
+                 version_check: bool = VERSION_CHECK,
+                 read_deadline: float = READ_DEADLINE,
+                 write_deadline: float = WRITE_DEADLINE,
+                 breaker_failures: int = BREAKER_FAILURES,
+                 breaker_reset_seconds: float = BREAKER_RESET_SECONDS,
+                 serve_stale: bool = SERVE_STALE,
+                 max_stale_seconds: float = MAX_STALE_SECONDS,
+                 lookup_mode: str = LOOKUP_MODE,
+                 json_path: bool = JSON_PATH,
+                 warm_start_path: Optional[str] = WARM_START_PATH,
+                 rate_limit: float = RATE_LIMIT,
+                 rate_burst: Optional[float] = RATE_BURST,
+                 max_queue_seconds: float = MAX_QUEUE_SECONDS,
+                 scheduler: Optional[RequestScheduler] = None,
+                 write_cas: bool = WRITE_CAS,
+                 cas_retries: int = CAS_RETRIES):
+        # Where our member records are stored and how we authenticate
+        self.base_url = base_url
+        self.headers = dict(JSONBIN_HEADERS)
+        if master_key:
+            self.headers['X-Master-Key'] = master_key
+
+        # Member index used to answer lookups without a network call
+        self.member_cache = member_cache if member_cache is not None else MemberCache(cache_ttl_seconds)
+
+        # Pool settings, kept for the lazily created aiohttp session
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+
+        # Whole-operation deadlines; async calls enforce them exactly, synchronous
+        # calls cap each HTTP request's read timeout at the deadline
+        self.read_deadline = read_deadline
+        self.write_deadline = write_deadline
+
+        # (connect, read) timeout pairs passed to every synchronous HTTP call
+        self.timeout = (connect_timeout, min(read_timeout, read_deadline))
+        self.write_timeout = (connect_timeout, min(read_timeout, write_deadline))
+        self.async_timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+
+        # Fails fast once JSONbin keeps failing, instead of making every turn wait.
+        # Our own scheduler giving up on a queued request is back-pressure, and
+        # losing a write race is contention - neither is a JSONbin failure
+        self.breaker = CircuitBreaker(self.name, breaker_failures, breaker_reset_seconds,
+                                      ignore=(RateLimitedError, WriteConflictError))
+
+        # Paces requests to the account's quota (shared with other bins of the same account)
+        self.scheduler = scheduler or shared_scheduler(self.headers.get('X-Master-Key'), rate_limit,
+                                                       rate_burst, max_queue_seconds)
+        self.max_queue_seconds = max_queue_seconds
+
+        # Stale-while-revalidate settings
+        self.serve_stale = serve_stale
+        self.max_stale_seconds = max_stale_seconds
+
+        # Whole-bin index or streaming lookups
+        if lookup_mode not in LOOKUP_MODES:
+            raise ValueError(f"Unknown lookup mode '{lookup_mode}' - expected one of {', '.join(LOOKUP_MODES)}")
+        self.lookup_mode = lookup_mode
+        self.json_path = json_path
+
+        # Keeps background refresh tasks alive until they finish
+        self._background_tasks = set()
+
+        # Pooled HTTP session - connections are kept alive and reused across calls
+        # requests sessions are safe to share between threads for simple calls like ours
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(self.headers)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+        # aiohttp sessions must be created inside a running event loop,
+        # so the async one is created lazily on first use
+        self._async_session: Optional[aiohttp.ClientSession] = None
+
+        # Coalesces concurrent refreshes - threads and coroutines alike - into one download
+        self._refresh_flight = SingleFlight()
+
+        # Whether to ask for the bin's version count before a full download
+        self.version_check = version_check
+
+        # How many refreshes downloaded the records vs. were skipped as unchanged
+        self.fetch_count = 0
+        self.fetch_skip_count = 0
+
+        # Conditional writes, or read-modify-write cycles serialized by a lock
+        # so concurrent writers in this process don't lose updates
+        self.write_cas = write_cas
+        self.cas_retries = cas_retries
+        # Set once the bin answers without an ETag - there is nothing to make writes conditional on
+        self._etags_missing = False
+        # One lock for threads and coroutines alike - async locked writes run in a worker thread
+        self._write_lock = threading.Lock()
+
+        # Local snapshot of the last good dataset, for fast restarts
+        self.warm_start_path = warm_start_path
+        self._snapshot_lock = threading.Lock()
+        if warm_start_path and self.lookup_mode == "index":
+            self._warm_start()
+
+    def _get_async_session(self) -> aiohttp.ClientSession:
+        """Returns the pooled aiohttp session, creating it on first use."""
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, force_close=not self.keep_alive)
+            self._async_session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=self.async_timeout
+            )
+        return self._async_session
+
+    def _send(self, method: str, url: str, priority: int = READ, **kwargs: Any) -> requests.Response:
+        """
+        Sends one HTTP request when the scheduler allows it.
+
+        An HTTP 429 answer pauses the scheduler and the request is sent again,
+        until it gets another answer or its wait budget is used up.
+
+        Raises:
+            RateLimitedError: If the request could not be sent in time
+        """
+        started = time.monotonic()
+        while True:
+            self.scheduler.acquire(priority, self.max_queue_seconds - (time.monotonic() - started))
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code != 429:
+                self.scheduler.record_success()
+                return response
+            self._count_exchange(response.content)
+            self.scheduler.throttled(response.headers.get('Retry-After'))
+            response.close()
+
+    async def _asend(self, method: str, url: str, priority: int = READ, **kwargs: Any) -> aiohttp.ClientResponse:
+        """Non-blocking version of _send(); use the response with "async with"."""
+        started = time.monotonic()
+        while True:
+            await self.scheduler.aacquire(priority, self.max_queue_seconds - (time.monotonic() - started))
+            response = await self._get_async_session().request(method, url, **kwargs)
+            if response.status != 429:
+                self.scheduler.record_success()
+                return response
+            self._count_exchange(await response.read())
+            self.scheduler.throttled(response.headers.get('Retry-After'))
+            response.release()
+
+    # Synchronous API
+
+    def fetch_records(self, priority: int = READ) -> List[Dict[str, Any]]:
+        """
+        Downloads the complete list of member records.
+
+        Args:
+            priority: Scheduler priority (WRITE when the read is part of an update)
+
+        Raises:
+            StorageError: If JSONbin does not answer with HTTP 200
+        """
+        return self.fetch_versioned_records(priority)[0]
+
+    def fetch_versioned_records(self, priority: int = READ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Downloads the complete list of member records with their version.
+
+        Returns:
+            (records, ETag of this version of the bin, or None if JSONbin sent none)
+        """
+        response = self._send('GET', self.base_url, priority, timeout=self.timeout)
+        self._count_exchange(response.content)
+        if response.status_code != 200:
+            raise StorageError(f"Failed to retrieve data: HTTP {response.status_code}")
+        return response.json()['record'], response.headers.get('ETag')
+
+    def write_records(self, records: List[Dict[str, Any]], if_match: Optional[str] = None) -> None:
+        """
+        Replaces the complete list of member records.
+
+        Args:
+            records: The complete list of member records
+            if_match: Only write if the bin is still at this version (its ETag)
+
+        Raises:
+            WriteConflictError: If the bin changed since the if_match version
+            StorageError: If JSONbin does not answer with HTTP 200
+        """
+        # The json argument also sets the Content-Type header write operations need
+        # JSONbin expects the data directly, not wrapped
+        headers = {'If-Match': if_match} if if_match else None
+        response = self._send('PUT', self.base_url, WRITE, json=records, headers=headers, timeout=self.write_timeout)
+        self._count_exchange(response.content, response.request.body)
+        if response.status_code == WRITE_CONFLICT:
+            raise WriteConflictError("The bin changed since it was read")
+        if response.status_code != 200:
+            raise StorageError(f"Failed to update database: HTTP {response.status_code} - {response.text}")
+
+    def fetch_version(self) -> Optional[str]:
+        """
+        Asks JSONbin for the bin's current version count (a tiny response).
+
+        Returns:
+            The version count as a string, or None if version checks are off
+            or the bin does not report one (checks are then switched off)
+        """
+        if not self.version_check:
+            return None
+        response = self._send('GET', f"{self.base_url}/versions/count", timeout=self.timeout)
+        self._count_exchange(response.content)
+        return self._parse_version(response.status_code, response.json() if response.status_code == 200 else None)
+
+    def _parse_version(self, status: int, data: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Extracts the version count, disabling version checks if it is unavailable."""
+        version_count = (data or {}).get('metadata', {}).get('versionCount')
+        if status != 200 or version_count is None:
+            logger.warning(f"Bin version count unavailable (HTTP {status}) - disabling version checks")
+            self.version_check = False
+            return None
+        return str(version_count)
+
+    def _count_exchange(self, received: Optional[bytes], sent: Optional[bytes] = None) -> None:
+        """Counts one request to JSONbin and the bytes moved in each direction."""
+        BACKEND_REQUESTS.inc(backend=self.name)
+        BACKEND_BYTES.inc(len(received or b''), backend=self.name, direction="in")
+        if sent:
+            BACKEND_BYTES.inc(len(sent), backend=self.name, direction="out")
+
+    def _conditional_headers(self) -> Dict[str, str]:
+        """Builds If-None-Match / If-Modified-Since headers from the loaded data's validators."""
+        if not self.member_cache.has_data():
+            return {}
+        validators = self.member_cache.validators
+        headers = {}
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last_modified' in validators:
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    @staticmethod
+    def _response_validators(response_headers: Any, version: Optional[str]) -> Dict[str, str]:
+        """Collects the version markers of a freshly downloaded dataset."""
+        validators = {}
+        if response_headers.get('ETag'):
+            validators['etag'] = response_headers['ETag']
+        if response_headers.get('Last-Modified'):
+            validators['last_modified'] = response_headers['Last-Modified']
+        if version is not None:
+            validators['version'] = version
+        return validators
+
+    def _is_unchanged(self, version: Optional[str]) -> bool:
+        """Checks whether the bin's version matches the data already loaded."""
+        return (version is not None
+                and self.member_cache.has_data()
+                and self.member_cache.validators.get('version') == version)
+
+    def _skip_refresh(self) -> None:
+        """Keeps the loaded data for another TTL because the bin has not changed."""
+        self.member_cache.touch()
+        self.fetch_skip_count += 1
+        CACHE_REFRESHES.inc(backend=self.name, result="unchanged")
+        logger.debug("Member data unchanged - skipped re-download")
+
+    def _load_member_cache(self) -> None:
+        """
+        Brings the member index up to date, downloading only if the bin changed.
+
+        How it works:
+        1. If version checks are on, compares the bin's version count with ours
+        2. Otherwise (or if it changed) sends a conditional GET; an HTTP 304
+           answer means nothing changed
+        3. Only a real change re-downloads, re-parses and re-indexes the records
+        """
+        version = self.fetch_version()
+        if self._is_unchanged(version):
+            self._skip_refresh()
+            return
+
+        response = self._send('GET', self.base_url, headers=self._conditional_headers(), timeout=self.timeout)
+        self._count_exchange(response.content)
+        if response.status_code == 304 and self.member_cache.has_data():
+            self._skip_refresh()
+            return
+        if response.status_code == 304:
+            # A write invalidated the data while the request was in flight - download it in full
+            response = self._send('GET', self.base_url, timeout=self.timeout)
+            self._count_exchange(response.content)
+        if response.status_code != 200:
+            raise StorageError(f"Failed to retrieve data: HTTP {response.status_code}")
+
+        self._index_records(response.json()['record'], self._response_validators(response.headers, version))
+
+    def _index_records(self, records: List[Dict[str, Any]], validators: Dict[str, str]) -> None:
+        """Loads a freshly downloaded dataset into the member index."""
+        self.member_cache.load(records, validators)
+        self.fetch_count += 1
+        if self.warm_start_path:
+            start_in_context(self._save_snapshot, records, validators, time.time())
+        CACHE_REFRESHES.inc(backend=self.name, result="downloaded")
+        RECORDS_SCANNED.inc(len(records), backend=self.name, operation="index")
+
+    def _warm_start(self) -> None:
+        """
+        Loads the snapshot left by a previous run, then revalidates it in the background.
+
+        How it works:
+        1. Maps the snapshot file (no parsing, so this takes milliseconds)
+           if it was saved from this same bin
+        2. Lookups are answered from it right away
+        3. A background refresh asks JSONbin whether the data changed, using
+           the version markers saved with the snapshot (usually a tiny 304)
+        """
+        try:
+            snapshot = MemberSnapshot(self.warm_start_path)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable member snapshot {self.warm_start_path}: {e}")
+            return
+        if snapshot.meta.get('base_url') != self.base_url:
+            logger.warning(f"Ignoring member snapshot {self.warm_start_path} saved from another bin")
+            return
+
+        self.member_cache.load_snapshot(snapshot, snapshot.meta.get('validators'))
+        logger.info(f"Warm start: {len(snapshot)} members from {self.warm_start_path} "
+                    f"({snapshot.age():.0f}s old), revalidating in the background")
+        start_in_context(self._background_refresh)
+
+    def _save_snapshot(self, records: List[Dict[str, Any]], validators: Dict[str, str], loaded_at: float) -> None:
+        """Writes a downloaded dataset to the warm-start snapshot (runs in a background thread)."""
+        # A newer dataset may already be waiting; writing one at a time is enough
+        if not self._snapshot_lock.acquire(blocking=False):
+            return
+        try:
+            write_snapshot(self.warm_start_path, records,
+                           {'base_url': self.base_url, 'validators': validators}, created_at=loaded_at)
+        except Exception as e:
+            logger.warning(f"Could not save member snapshot {self.warm_start_path}: {e}")
+        finally:
+            self._snapshot_lock.release()
+
+    def _can_serve_stale(self) -> bool:
+        """Checks whether expired data may be answered while a refresh runs."""
+        age = self.member_cache.age()
+        return self.serve_stale and age is not None and age < self.max_stale_seconds
+
+    def _guarded_load(self) -> None:
+        """Runs a refresh through the circuit breaker."""
+        self.breaker.call(self._load_member_cache)
+
+    def _background_refresh(self) -> None:
+        try:
+            self._refresh_flight.do("records", self._guarded_load)
+        except CircuitOpenError:
+            # Expected while the backend is degraded - keep serving stale data quietly
+            pass
+        except Exception as e:
+            logger.warning(f"Background refresh of member data failed: {e}")
+
+    def _refresh_member_cache(self) -> bool:
+        """
+        Makes the member index usable for a read.
+
+        How it works:
+        1. Fresh data: nothing to do
+        2. Expired but recent enough data: answer from it right away and
+           refresh in a background thread (stale-while-revalidate)
+        3. No usable data: refresh now; every caller arriving while a reload
+           is already in flight waits for that reload instead of starting its own
+
+        Returns:
+            True if the data about to be served is stale
+        """
+        if self.member_cache.is_fresh():
+            CACHE_LOOKUPS.inc(backend=self.name, result="hit")
+            return False
+        if self._can_serve_stale():
+            CACHE_LOOKUPS.inc(backend=self.name, result="stale")
+            if not self._refresh_flight.in_flight("records"):
+                # Started in the caller's context, so the refresh counts towards the action that set it off
+                start_in_context(self._background_refresh)
+            return True
+        CACHE_LOOKUPS.inc(backend=self.name, result="miss")
+        self._refresh_flight.do("records", self._guarded_load)
+        return False
+
+    @staticmethod
+    def _flag_stale(members: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        for record in members.values():
+            record[STALE_FLAG] = True
+        return members
+
+    def _count_stream(self, stream: RecordStream) -> None:
+        """Counts one streamed lookup: the bytes actually read and the records parsed."""
+        self._count_exchange(None)
+        BACKEND_BYTES.inc(stream.bytes_seen, backend=self.name, direction="in")
+        RECORDS_SCANNED.inc(stream.records_seen, backend=self.name, operation="stream")
+
+    def _json_path_headers(self, member_ids: Iterable[str]) -> Dict[str, str]:
+        """Builds the X-JSON-Path header selecting these members, if server-side filtering is on."""
+        if not self.json_path:
+            return {}
+        quoted = (member_id.replace('\\', '\\\\').replace("'", "\\'") for member_id in sorted(member_ids))
+        conditions = ' || '.join(f"@.memberID == '{member_id}'" for member_id in quoted)
+        return {'X-JSON-Path': f"$[?({conditions})]"}
+
+    def _json_path_rejected(self, status: int) -> None:
+        logger.warning(f"Bin rejected the X-JSON-Path filter (HTTP {status}) - streaming the whole bin instead")
+        self.json_path = False
+
+    def _stream_pick(self, picker: RecordPicker) -> Dict[str, Dict[str, Any]]:
+        """
+        Streams the bin until the picker has every record it wants (or the bin ends).
+
+        How it works:
+        1. Opens the bin without reading the body up front (asking JSONbin
+           for the wanted records only, if json_path is on)
+        2. Parses the record array chunk by chunk, offering each record to the picker
+        3. Closes the connection as soon as the picker is complete, so the
+           rest of the body is never downloaded or parsed
+        """
+        stream = RecordStream()
+        headers = self._json_path_headers(picker.wanted)
+        rejected = False
+        with self._send('GET', self.base_url, stream=True, headers=headers, timeout=self.timeout) as response:
+            try:
+                if headers and response.status_code in JSON_PATH_REJECTED:
+                    self._json_path_rejected(response.status_code)
+                    rejected = True
+                elif response.status_code != 200:
+                    raise StorageError(f"Failed to retrieve data: HTTP {response.status_code}")
+                elif not picker.complete:
+                    for record in iter_records(response.iter_content(STREAM_CHUNK_SIZE), stream):
+                        if picker.offer(record):
+                            break
+            except ValueError as e:
+                raise StorageError(str(e)) from e
+            finally:
+                self._count_stream(stream)
+        return self._stream_pick(picker) if rejected else picker.found
+
+    def stream_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Streaming lookup of several members, stopping once all of them were seen."""
+        member_ids = list(member_ids)
+        if not member_ids:
+            return {}
+        return self.breaker.call(lambda: self._stream_pick(RecordPicker(member_ids)))
+
+    def stream_household(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        """
+        Streaming lookup of a primary member and its child accounts.
+
+        Child accounts listed after the primary (the usual layout) are picked
+        up in the same pass; any that appeared before it cost one more pass.
+        """
+        def children_of(record: Dict[str, Any]) -> List[str]:
+            return household_member_ids(record)[1:] if record.get('memberID') == member_id else []
+
+        found = self.breaker.call(lambda: self._stream_pick(RecordPicker([member_id], children_of)))
+        primary_record = found.pop(member_id, None)
+        if primary_record is None:
+            return None
+        missing = [child_id for child_id in children_of(primary_record) if child_id not in found]
+        if missing:
+            found.update(self.stream_members(missing))
+        return primary_record, found
+
+    def get_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        if self.lookup_mode == "stream":
+            return self.stream_household(member_id)
+        return super().get_household_records(member_id)
+
+    def get_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        if self.lookup_mode == "stream":
+            return self.stream_members(member_ids)
+        stale = self._refresh_member_cache()
+        members = self.member_cache.get_many(member_ids)
+        return self._flag_stale(members) if stale else members
+
+    def select_members(self, member_ids: Iterable[str],
+                       fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        if self.lookup_mode == "stream" or fields is None:
+            return super().select_members(member_ids, fields)
+        # Projected straight from the compact index, without building the complete records
+        stale = self._refresh_member_cache()
+        members = self.member_cache.get_many(member_ids, fields)
+        return self._flag_stale(members) if stale else members
+
+    def peek_members(self, member_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        # Only fresh data is known to match the bin; anything else needs a check
+        if self.lookup_mode == "stream" or not self.member_cache.is_fresh():
+            return None
+        return self.member_cache.get_many(member_ids)
+
+    async def apeek_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        # Answered from the in-memory index (or not at all) - no need for a worker thread
+        return self.peek_household_records(member_id)
+
+    def expiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        if self.lookup_mode == "stream":
+            return super().expiring_between(start_date, end_date)
+        self._refresh_member_cache()
+        return self.member_cache.expiry_index().expiring_between(start_date, end_date)
+
+    def _conflict_pause(self, attempt: int) -> float:
+        """Counts a write conflict; returns a random pause so colliding writers spread out."""
+        WRITE_CONFLICTS.inc(backend=self.name)
+        logger.debug("Write conflict on attempt %d - rebasing the update on fresh data", attempt + 1)
+        return random.uniform(0, min(1.0, 0.02 * 2 ** attempt))
+
+    def _conditional_writes(self) -> bool:
+        """Whether updates are sent with If-Match instead of being serialized by the write lock."""
+        return self.write_cas and not self._etags_missing
+
+    def _no_etag(self) -> None:
+        """Switches to locked writes after the bin answered without an ETag."""
+        if not self._etags_missing:
+            self._etags_missing = True
+            logger.warning(f"'{self.name}' sends no ETag - updates are serialized by a lock instead of conditional")
+
+    def _apply_and_write(self, records: List[Dict[str, Any]], updates: Dict[str, Dict[str, Any]],
+                         idempotency_key: Optional[str], if_match: Optional[str]) -> Dict[str, bool]:
+        """
+        Updates every member in one pass and writes the document back if anything changed.
+
+        Members already carrying the idempotency key are left alone.
+
+        Raises:
+            WriteConflictError: If if_match is set and the bin changed since it was read
+        """
+        applied, changed = apply_member_updates(records, updates, idempotency_key)
+        RECORDS_SCANNED.inc(len(records), backend=self.name, operation="update")
+        if changed:
+            self.write_records(records, if_match)
+            # Cached records are now out of date - force a refresh on next read
+            self.member_cache.invalidate()
+        return applied
+
+    def _locked_read_modify_write(self, updates: Dict[str, Dict[str, Any]],
+                                  idempotency_key: Optional[str]) -> Dict[str, bool]:
+        """Reads, updates and writes back the whole bin under the write lock, with an unconditional write."""
+        with self._write_lock:
+            return self._apply_and_write(self.fetch_records(WRITE), updates, idempotency_key, None)
+
+    def _read_modify_write(self, updates: Dict[str, Dict[str, Any]],
+                           idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Applies updates with a read-modify-write cycle of the whole bin.
+
+        How it works:
+        - Locked (the default): the whole cycle runs under the write lock, so
+          writers in this process never overwrite each other's changes
+        - Conditional (write_cas): reads the document with its version (ETag)
+          and writes it back only if the bin is still at that version; if
+          someone else wrote in between, starts over on their data (the
+          rebase) after a short random pause. If the bin sends no ETag, the
+          write could not be conditional, so it falls back to the lock
+        """
+        if not self._conditional_writes():
+            return self._locked_read_modify_write(updates, idempotency_key)
+        for attempt in range(self.cas_retries + 1):
+            records, etag = self.fetch_versioned_records(WRITE)
+            if etag is None:
+                self._no_etag()
+                return self._locked_read_modify_write(updates, idempotency_key)
+            try:
+                return self._apply_and_write(records, updates, idempotency_key, etag)
+            except WriteConflictError:
+                time.sleep(self._conflict_pause(attempt))
+        raise WriteConflictError(f"Update gave up after {self.cas_retries + 1} conflicting writes")
+
+    def update_members(self, updates: Dict[str, Dict[str, Any]],
+                       idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        return self.breaker.call(lambda: self._read_modify_write(updates, idempotency_key))
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        return self.breaker.call(self.fetch_records)
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        with self._write_lock:
+            self.breaker.call(lambda: self.write_records(records))
+            self.member_cache.invalidate()
+        return len(records)
+
+    def close(self) -> None:
+        self.session.close()
+
+    # Native async API
+
+    async def afetch_records(self, priority: int = READ) -> List[Dict[str, Any]]:
+        """Non-blocking version of fetch_records()."""
+        return (await self.afetch_versioned_records(priority))[0]
+
+    async def afetch_versioned_records(self, priority: int = READ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Non-blocking version of fetch_versioned_records()."""
+        async with await self._asend('GET', self.base_url, priority) as response:
+            body = await response.read()
+            self._count_exchange(body)
+            if response.status != 200:
+                raise StorageError(f"Failed to retrieve data: HTTP {response.status}")
+            return json.loads(body)['record'], response.headers.get('ETag')
+
+    async def awrite_records(self, records: List[Dict[str, Any]], if_match: Optional[str] = None) -> None:
+        """Non-blocking version of write_records()."""
+        # Serialized here (instead of json=) so the bytes sent can be counted
+        payload = json.dumps(records).encode()
+        headers = {'Content-Type': 'application/json'}
+        if if_match:
+            headers['If-Match'] = if_match
+        async with await self._asend('PUT', self.base_url, WRITE, data=payload, headers=headers) as response:
+            body = await response.read()
+            self._count_exchange(body, payload)
+            if response.status == WRITE_CONFLICT:
+                raise WriteConflictError("The bin changed since it was read")
+            if response.status != 200:
+                raise StorageError(f"Failed to update database: HTTP {response.status} - {body.decode(errors='replace')}")
+
+    async def afetch_version(self) -> Optional[str]:
+        """Non-blocking version of fetch_version()."""
+        if not self.version_check:
+            return None
+        async with await self._asend('GET', f"{self.base_url}/versions/count") as response:
+            body = await response.read()
+            self._count_exchange(body)
+            return self._parse_version(response.status, json.loads(body) if response.status == 200 else None)
+
+    async def _aload_member_cache(self) -> None:
+        """Non-blocking version of _load_member_cache()."""
+        version = await self.afetch_version()
+        if self._is_unchanged(version):
+            self._skip_refresh()
+            return
+
+        async with await self._asend('GET', self.base_url, headers=self._conditional_headers()) as response:
+            body = await response.read()
+            status, response_headers = response.status, response.headers
+        self._count_exchange(body)
+        if status == 304 and self.member_cache.has_data():
+            self._skip_refresh()
+            return
+        if status == 304:
+            # A write invalidated the data while the request was in flight - download it in full
+            async with await self._asend('GET', self.base_url) as response:
+                body = await response.read()
+                status, response_headers = response.status, response.headers
+            self._count_exchange(body)
+        if status != 200:
+            raise StorageError(f"Failed to retrieve data: HTTP {status}")
+
+        self._index_records(json.loads(body)['record'], self._response_validators(response_headers, version))
+
+    async def _aguarded_load(self) -> None:
+        """Runs a refresh through the circuit breaker, bounded by the read deadline."""
+        await self.breaker.acall(self._aload_member_cache, self.read_deadline)
+
+    def _on_background_refresh_done(self, task: asyncio.Task) -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), CircuitOpenError):
+            logger.warning(f"Background refresh of member data failed: {task.exception()}")
+
+    async def _arefresh_member_cache(self) -> bool:
+        """Non-blocking version of _refresh_member_cache()."""
+        if self.member_cache.is_fresh():
+            CACHE_LOOKUPS.inc(backend=self.name, result="hit")
+            return False
+        if self._can_serve_stale():
+            CACHE_LOOKUPS.inc(backend=self.name, result="stale")
+            if not self._refresh_flight.in_flight("records"):
+                task = asyncio.create_task(self._refresh_flight.ado("records", self._aguarded_load))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._on_background_refresh_done)
+            return True
+        CACHE_LOOKUPS.inc(backend=self.name, result="miss")
+        await self._refresh_flight.ado("records", self._aguarded_load)
+        return False
+
+    async def _astream_pick(self, picker: RecordPicker) -> Dict[str, Dict[str, Any]]:
+        """Non-blocking version of _stream_pick()."""
+        stream = RecordStream()
+        headers = self._json_path_headers(picker.wanted)
+        rejected = False
+        async with await self._asend('GET', self.base_url, headers=headers) as response:
+            try:
+                if headers and response.status in JSON_PATH_REJECTED:
+                    self._json_path_rejected(response.status)
+                    rejected = True
+                elif response.status != 200:
+                    raise StorageError(f"Failed to retrieve data: HTTP {response.status}")
+                elif not picker.complete:
+                    async for record in aiter_records(response.content.iter_chunked(STREAM_CHUNK_SIZE), stream):
+                        if picker.offer(record):
+                            break
+            except ValueError as e:
+                raise StorageError(str(e)) from e
+            finally:
+                self._count_stream(stream)
+                # Don't drain the rest of the body - drop the connection instead
+                if not stream.done:
+                    response.close()
+        return await self._astream_pick(picker) if rejected else picker.found
+
+    async def astream_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Non-blocking version of stream_members()."""
+        member_ids = list(member_ids)
+        if not member_ids:
+            return {}
+        return await self.breaker.acall(lambda: self._astream_pick(RecordPicker(member_ids)), self.read_deadline)
+
+    async def astream_household(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        """Non-blocking version of stream_household()."""
+        def children_of(record: Dict[str, Any]) -> List[str]:
+            return household_member_ids(record)[1:] if record.get('memberID') == member_id else []
+
+        found = await self.breaker.acall(
+            lambda: self._astream_pick(RecordPicker([member_id], children_of)), self.read_deadline
+        )
+        primary_record = found.pop(member_id, None)
+        if primary_record is None:
+            return None
+        missing = [child_id for child_id in children_of(primary_record) if child_id not in found]
+        if missing:
+            found.update(await self.astream_members(missing))
+        return primary_record, found
+
+    async def aget_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        if self.lookup_mode == "stream":
+            return await self.astream_household(member_id)
+        return await super().aget_household_records(member_id)
+
+    async def aget_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        if self.lookup_mode == "stream":
+            return await self.astream_members(member_ids)
+        stale = await self._arefresh_member_cache()
+        members = self.member_cache.get_many(member_ids)
+        return self._flag_stale(members) if stale else members
+
+    async def aselect_members(self, member_ids: Iterable[str],
+                              fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        if self.lookup_mode == "stream" or fields is None:
+            return await super().aselect_members(member_ids, fields)
+        stale = await self._arefresh_member_cache()
+        members = self.member_cache.get_many(member_ids, fields)
+        return self._flag_stale(members) if stale else members
+
+    async def aexpiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        if self.lookup_mode == "stream":
+            return await super().aexpiring_between(start_date, end_date)
+        await self._arefresh_member_cache()
+        return self.member_cache.expiry_index().expiring_between(start_date, end_date)
+
+    async def _aapply_and_write(self, records: List[Dict[str, Any]], updates: Dict[str, Dict[str, Any]],
+                                idempotency_key: Optional[str], if_match: Optional[str]) -> Dict[str, bool]:
+        """Non-blocking version of _apply_and_write()."""
+        applied, changed = apply_member_updates(records, updates, idempotency_key)
+        RECORDS_SCANNED.inc(len(records), backend=self.name, operation="update")
+        if changed:
+            await self.awrite_records(records, if_match)
+            self.member_cache.invalidate()
+        return applied
+
+    async def _aread_modify_write(self, updates: Dict[str, Dict[str, Any]],
+                                  idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Non-blocking version of _read_modify_write().
+
+        Locked writes run in a worker thread under the same write lock as
+        synchronous writers (CLI tools, the journal flusher), so the two
+        kinds of writers never overwrite each other's changes.
+        """
+        if not self._conditional_writes():
+            return await asyncio.to_thread(self._locked_read_modify_write, updates, idempotency_key)
+        for attempt in range(self.cas_retries + 1):
+            records, etag = await self.afetch_versioned_records(WRITE)
+            if etag is None:
+                self._no_etag()
+                return await asyncio.to_thread(self._locked_read_modify_write, updates, idempotency_key)
+            try:
+                return await self._aapply_and_write(records, updates, idempotency_key, etag)
+            except WriteConflictError:
+                await asyncio.sleep(self._conflict_pause(attempt))
+        raise WriteConflictError(f"Update gave up after {self.cas_retries + 1} conflicting writes")
+
+    async def aupdate_members(self, updates: Dict[str, Dict[str, Any]],
+                              idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        return await self.breaker.acall(lambda: self._aread_modify_write(updates, idempotency_key),
+                                        self.write_deadline)
+
+    async def aclose(self) -> None:
+        for task in list(self._background_tasks):
+            task.cancel()
+        self.close()
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
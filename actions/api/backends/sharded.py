@@ -0,0 +1,470 @@
+import argparse
+import asyncio
+import heapq
+import os
+import sys
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
+import logging
+
+import requests
+
+from .base import StorageBackend
+from .jsonbin import JSONBinBackend, JSONBIN_HEADERS
+from ..metrics import Counter
+from ..records import household_member_ids
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Bins holding one shard each, as a comma-separated list of bin URLs
+# (used when the member_store section does not list any shards)
+SHARD_URLS = [url.strip() for url in os.environ.get("MEMBER_STORE_SHARDS", "").split(",") if url.strip()]
+
+SHARD_FALLBACKS = Counter(
+    "member_store_shard_fallbacks_total",
+    "Members not found on their routed shard and looked up on the others"
+)
+
+
+def shard_index(household_id: str, shard_count: int) -> int:
+    """
+    Returns the shard number of a household.
+
+    Uses CRC-32 of the primary member ID, which (unlike Python's hash())
+    gives the same answer in every process, on every machine and release.
+    """
+    return zlib.crc32(household_id.encode('utf-8')) % shard_count
+
+
+def partition_records(records: List[Dict[str, Any]], shard_count: int) -> List[List[Dict[str, Any]]]:
+    """
+    Splits member records into shards, keeping every household together.
+
+    How it works:
+    1. Finds each child account's primary member from the primaries' child_accounts lists
+    2. Places every record on the shard of its household's primary member ID
+       (a member outside any household is its own household)
+
+    Args:
+        records: The complete list of member records
+        shard_count: Number of shards to split into
+
+    Returns:
+        One list of records per shard
+    """
+    parents: Dict[str, str] = {}
+    for record in records:
+        for child_id in household_member_ids(record)[1:]:
+            parents[child_id] = record['memberID']
+
+    shards: List[List[Dict[str, Any]]] = [[] for _ in range(shard_count)]
+    for record in records:
+        household_id = parents.get(record['memberID'], record['memberID'])
+        shards[shard_index(household_id, shard_count)].append(record)
+    return shards
+
+
+class ShardedBackend(StorageBackend):
+    """
+    Spreads member records over several stores (shards), one household per shard.
+
+    Every household lives on the shard picked by a stable hash of its primary
+    member ID, so:
+    - a household lookup, an authentication or a cancellation touches one
+      shard only, and moves roughly 1/N of the data a single bin would
+    - writers to different shards never wait for each other
+
+    Routing:
+    - A primary member (or a member outside any household) is found on the
+      shard of its own ID
+    - A child account is found on its primary's shard; the router learns
+      child -> primary links from every household it reads
+    - A member that is not on its routed shard (a child whose household was
+      not read yet, or a wrong ID) is looked up on the other shards
+
+    Each shard is a complete backend of its own (JSONbin by default), so it
+    keeps its own cache, connection pool and circuit breaker.
+    Use reshard() / "python -m actions.api.backends.sharded" to (re)distribute records.
+    """
+
+    name = "sharded"
+
+    def __init__(self, shards: Optional[List[Union[str, Dict[str, Any], StorageBackend]]] = None, **shard_options: Any):
+        """
+        Args:
+            shards: One entry per shard - a JSONbin bin URL, a backend config
+                dictionary (with "type", like the member_store section) or a
+                ready-made backend. Defaults to MEMBER_STORE_SHARDS
+            **shard_options: Settings passed to every shard (e.g. cache_ttl_seconds)
+        """
+        shards = shards or SHARD_URLS
+        if not shards:
+            raise ValueError("The sharded member store needs at least one shard (member_store.shards or MEMBER_STORE_SHARDS)")
+        self.shards: List[StorageBackend] = [self._build_shard(shard, shard_options) for shard in shards]
+
+        # child memberID -> primary memberID, learned from the households read so far
+        self._parents: Dict[str, str] = {}
+        self._parents_lock = threading.Lock()
+
+    @staticmethod
+    def _build_shard(shard: Union[str, Dict[str, Any], StorageBackend], shard_options: Dict[str, Any]) -> StorageBackend:
+        if isinstance(shard, StorageBackend):
+            return shard
+        if isinstance(shard, str):
+            return JSONBinBackend(base_url=shard, **shard_options)
+        # Imported here because the factory itself imports this module
+        from .factory import create_backend
+        return create_backend({**shard_options, **shard})
+
+    # Routing
+
+    def shard_number(self, member_id: str) -> int:
+        """Returns the shard a member is expected on."""
+        with self._parents_lock:
+            household_id = self._parents.get(member_id, member_id)
+        return shard_index(household_id, len(self.shards))
+
+    def _group(self, member_ids: Iterable[str]) -> Dict[int, List[str]]:
+        """Groups member IDs by the shard they are expected on."""
+        groups: Dict[int, List[str]] = {}
+        for member_id in member_ids:
+            groups.setdefault(self.shard_number(member_id), []).append(member_id)
+        return groups
+
+    def _fallback_plan(self, member_ids: Iterable[str]) -> Dict[int, List[str]]:
+        """For members missing from their routed shard: every other shard to ask."""
+        plan: Dict[int, List[str]] = {}
+        for member_id in member_ids:
+            routed = self.shard_number(member_id)
+            for index in range(len(self.shards)):
+                if index != routed:
+                    plan.setdefault(index, []).append(member_id)
+        SHARD_FALLBACKS.inc(len(set(member_id for ids in plan.values() for member_id in ids)))
+        return plan
+
+    def _needs_routing_read(self, updates: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        Checks whether a batch write should look its members up first.
+
+        A batch usually is one household (a primary and its children). If
+        more than one of its members has no learned link, the children's
+        shard is unknown; one lookup (normally served from the shard's cache)
+        reveals it and saves a read-modify-write on the wrong shard.
+        """
+        with self._parents_lock:
+            return sum(member_id not in self._parents for member_id in updates) > 1
+
+    def _rerouted(self, missing: Iterable[str], groups: Dict[int, List[str]]) -> Dict[int, List[str]]:
+        """Groups missing members whose route changed after learning new households."""
+        rerouted: Dict[int, List[str]] = {}
+        for index, ids in self._group(missing).items():
+            ids = [member_id for member_id in ids if member_id not in groups.get(index, [])]
+            if ids:
+                rerouted[index] = ids
+        return rerouted
+
+    def _learn(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Remembers which primary each child account belongs to."""
+        links = {}
+        for record in records:
+            for child_id in household_member_ids(record)[1:]:
+                links[child_id] = record['memberID']
+        if links:
+            with self._parents_lock:
+                self._parents.update(links)
+
+    # Synchronous API
+
+    def _find_elsewhere(self, member_ids: Iterable[str]) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+        """Looks members up on the shards they were not routed to; returns memberID -> (shard, record)."""
+        found: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for index, ids in self._fallback_plan(member_ids).items():
+            ids = [member_id for member_id in ids if member_id not in found]
+            if ids:
+                for member_id, record in self.shards[index].get_members(ids).items():
+                    found[member_id] = (index, record)
+        return found
+
+    def get_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        member_ids = set(member_ids)
+        found: Dict[str, Dict[str, Any]] = {}
+        groups = self._group(member_ids)
+        for index, ids in groups.items():
+            found.update(self.shards[index].get_members(ids))
+        self._learn(found.values())
+
+        # Children of a primary found just now live on that primary's shard
+        missing = member_ids - found.keys()
+        for index, ids in self._rerouted(missing, groups).items():
+            found.update(self.shards[index].get_members(ids))
+
+        missing = member_ids - found.keys()
+        if missing:
+            found.update({member_id: record for member_id, (_, record) in self._find_elsewhere(missing).items()})
+        self._learn(found.values())
+        return found
+
+    def get_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        # The whole household is co-located, so its shard answers the complete lookup
+        routed = self.shard_number(member_id)
+        household_records = self.shards[routed].get_household_records(member_id)
+        if household_records is None:
+            owner = self._find_elsewhere([member_id]).get(member_id)
+            if owner is None:
+                return None
+            household_records = self.shards[owner[0]].get_household_records(member_id)
+        if household_records is not None:
+            self._learn([household_records[0]])
+        return household_records
+
+    def peek_members(self, member_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        member_ids = set(member_ids)
+        found: Dict[str, Dict[str, Any]] = {}
+        groups = self._group(member_ids)
+        for index, ids in groups.items():
+            shard_found = self.shards[index].peek_members(ids)
+            if shard_found is None:
+                return None
+            found.update(shard_found)
+
+        # A member missing from its routed shard may live on another one
+        missing = member_ids - found.keys()
+        if missing:
+            for index, shard in enumerate(self.shards):
+                if index in groups:
+                    continue
+                shard_found = shard.peek_members(missing)
+                if shard_found is None:
+                    return None
+                found.update(shard_found)
+        self._learn(found.values())
+        return found
+
+    def peek_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        household_records = self.shards[self.shard_number(member_id)].peek_household_records(member_id)
+        if household_records is not None:
+            self._learn([household_records[0]])
+        return household_records
+
+    def update_members(self, updates: Dict[str, Dict[str, Any]],
+                       idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        if self._needs_routing_read(updates):
+            self.get_members(updates)
+        results: Dict[str, bool] = {}
+        for index, ids in self._group(updates).items():
+            results.update(self.shards[index].update_members({member_id: updates[member_id] for member_id in ids},
+                                                             idempotency_key))
+
+        missing = [member_id for member_id, applied in results.items() if not applied]
+        if missing:
+            # Write each member that lives elsewhere on the shard that actually holds it
+            owners: Dict[int, List[str]] = {}
+            for member_id, (index, _) in self._find_elsewhere(missing).items():
+                owners.setdefault(index, []).append(member_id)
+            for index, ids in owners.items():
+                results.update(self.shards[index].update_members({member_id: updates[member_id] for member_id in ids},
+                                                                 idempotency_key))
+        return results
+
+    @staticmethod
+    def _merge_by_date(answers: Iterable[List[Tuple[str, str]]]) -> List[Tuple[str, str]]:
+        """Merges the shards' sorted answers into one list, earliest end date first."""
+        return list(heapq.merge(*answers, key=lambda pair: (pair[1], pair[0])))
+
+    def expiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        return self._merge_by_date(shard.expiring_between(start_date, end_date) for shard in self.shards)
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        for shard in self.shards:
+            records.extend(shard.export_records())
+        return records
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        return sum(reshard_records(records, self.shards))
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.close()
+
+    # Native async API - shards are queried concurrently
+
+    async def _afind_elsewhere(self, member_ids: Iterable[str]) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+        """Non-blocking version of _find_elsewhere()."""
+        plan = self._fallback_plan(member_ids)
+        answers = await asyncio.gather(*(self.shards[index].aget_members(ids) for index, ids in plan.items()))
+        found: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for index, members in zip(plan, answers):
+            for member_id, record in members.items():
+                found.setdefault(member_id, (index, record))
+        return found
+
+    async def aget_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        member_ids = set(member_ids)
+        groups = self._group(member_ids)
+        found: Dict[str, Dict[str, Any]] = {}
+        for members in await asyncio.gather(*(self.shards[index].aget_members(ids) for index, ids in groups.items())):
+            found.update(members)
+        self._learn(found.values())
+
+        missing = member_ids - found.keys()
+        rerouted = self._rerouted(missing, groups)
+        for members in await asyncio.gather(*(self.shards[index].aget_members(ids) for index, ids in rerouted.items())):
+            found.update(members)
+
+        missing = member_ids - found.keys()
+        if missing:
+            found.update({member_id: record for member_id, (_, record) in (await self._afind_elsewhere(missing)).items()})
+        self._learn(found.values())
+        return found
+
+    async def aget_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        routed = self.shard_number(member_id)
+        household_records = await self.shards[routed].aget_household_records(member_id)
+        if household_records is None:
+            owner = (await self._afind_elsewhere([member_id])).get(member_id)
+            if owner is None:
+                return None
+            household_records = await self.shards[owner[0]].aget_household_records(member_id)
+        if household_records is not None:
+            self._learn([household_records[0]])
+        return household_records
+
+    async def apeek_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        household_records = await self.shards[self.shard_number(member_id)].apeek_household_records(member_id)
+        if household_records is not None:
+            self._learn([household_records[0]])
+        return household_records
+
+    async def aexpiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        return self._merge_by_date(await asyncio.gather(
+            *(shard.aexpiring_between(start_date, end_date) for shard in self.shards)
+        ))
+
+    async def aupdate_members(self, updates: Dict[str, Dict[str, Any]],
+                              idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        if self._needs_routing_read(updates):
+            await self.aget_members(updates)
+        groups = self._group(updates)
+        results: Dict[str, bool] = {}
+        for applied in await asyncio.gather(*(
+            self.shards[index].aupdate_members({member_id: updates[member_id] for member_id in ids}, idempotency_key)
+            for index, ids in groups.items()
+        )):
+            results.update(applied)
+
+        missing = [member_id for member_id, applied in results.items() if not applied]
+        if missing:
+            owners: Dict[int, List[str]] = {}
+            for member_id, (index, _) in (await self._afind_elsewhere(missing)).items():
+                owners.setdefault(index, []).append(member_id)
+            for applied in await asyncio.gather(*(
+                self.shards[index].aupdate_members({member_id: updates[member_id] for member_id in ids},
+                                                   idempotency_key)
+                for index, ids in owners.items()
+            )):
+                results.update(applied)
+        return results
+
+    async def aclose(self) -> None:
+        for shard in self.shards:
+            await shard.aclose()
+
+
+def reshard_records(records: List[Dict[str, Any]], targets: List[StorageBackend]) -> List[int]:
+    """
+    Writes member records onto a set of shards, one household per shard.
+
+    Args:
+        records: Every member record (duplicates by memberID are collapsed)
+        targets: The shard backends, in shard order
+
+    Returns:
+        Number of records written to each shard
+    """
+    unique = list({record['memberID']: record for record in records}.values())
+    partitions = partition_records(unique, len(targets))
+    return [target.import_records(partition) for target, partition in zip(targets, partitions)]
+
+
+def reshard(sources: List[StorageBackend], targets: List[StorageBackend]) -> List[int]:
+    """
+    Moves every member from the source stores onto the target shards.
+
+    All sources are read before anything is written, so the targets may
+    include the sources themselves (e.g. growing from 2 to 4 bins).
+
+    Returns:
+        Number of records written to each target shard
+    """
+    records: List[Dict[str, Any]] = []
+    for source in sources:
+        records.extend(source.export_records())
+    counts = reshard_records(records, targets)
+    logger.info(f"Resharded {sum(counts)} members onto {len(targets)} shards: {counts}")
+    return counts
+
+
+def create_jsonbin_bins(api_root: str, partitions: List[List[Dict[str, Any]]],
+                        master_key: Optional[str] = None, name_prefix: str = "members-shard") -> List[str]:
+    """
+    Creates one new JSONbin bin per partition and returns the bins' URLs.
+
+    Args:
+        api_root: The bin collection URL (e.g. https://api.jsonbin.io/v3/b)
+        partitions: The records of each new bin
+        master_key: JSONbin master key (defaults to the configured one)
+        name_prefix: Bins are named <prefix>-<shard number>
+    """
+    headers = dict(JSONBIN_HEADERS)
+    if master_key:
+        headers['X-Master-Key'] = master_key
+    urls = []
+    with requests.Session() as session:
+        for number, records in enumerate(partitions):
+            response = session.post(api_root, json=records, timeout=60, headers={
+                **headers, 'X-Bin-Name': f"{name_prefix}-{number}", 'X-Bin-Private': 'true'
+            })
+            response.raise_for_status()
+            urls.append(f"{api_root.rstrip('/')}/{response.json()['metadata']['id']}")
+    return urls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Redistribute member records over JSONbin shards (one household per shard)"
+    )
+    parser.add_argument("--from", dest="sources", nargs="+", required=True,
+                        help="bin URL(s) currently holding the members")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--to", dest="targets", nargs="+", help="existing bin URLs to use as shards, in shard order")
+    target.add_argument("--create", type=int, metavar="N", help="create N new bins as shards")
+    parser.add_argument("--api-root", default="https://api.jsonbin.io/v3/b", help="bin collection URL used with --create")
+    parser.add_argument("--master-key", help="JSONbin master key (defaults to the configured one)")
+    args = parser.parse_args()
+
+    options = {"master_key": args.master_key} if args.master_key else {}
+    sources = [JSONBinBackend(base_url=url, **options) for url in args.sources]
+    if args.targets:
+        reshard(sources, [JSONBinBackend(base_url=url, **options) for url in args.targets])
+        urls = args.targets
+    else:
+        records: List[Dict[str, Any]] = []
+        for source in sources:
+            records.extend(source.export_records())
+        unique = list({record['memberID']: record for record in records}.values())
+        urls = create_jsonbin_bins(args.api_root, partition_records(unique, args.create), args.master_key)
+
+    print("Shards (keep this order in member_store.shards / MEMBER_STORE_SHARDS):")
+    for url in urls:
+        print(f"  - {url}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        main()
+    except Exception as e:
+        sys.exit(f"Resharding failed: {e}")
@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
+import logging
+
+from .base import StorageBackend
+from ..expiry_index import PolicyExpiryIndex
+from ..metrics import CACHE_LOOKUPS, Counter
+from ..snapshot import MemberSnapshot, write_snapshot
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Snapshot file shared by every worker on the host, tunable with MEMBER_SNAPSHOT_PATH
+SNAPSHOT_PATH = os.environ.get("MEMBER_SNAPSHOT_PATH", "members.snap")
+
+# How often (seconds) a worker checks whether the refresher swapped in a new snapshot
+SNAPSHOT_CHECK_SECONDS = float(os.environ.get("MEMBER_SNAPSHOT_CHECK_SECONDS", 1.0))
+
+# How often (seconds) the refresher rebuilds the snapshot from the source
+SNAPSHOT_REFRESH_SECONDS = float(os.environ.get("MEMBER_SNAPSHOT_REFRESH_SECONDS", 60.0))
+
+SNAPSHOT_RELOADS = Counter("member_snapshot_reloads_total", "Snapshot files mapped by this worker")
+
+
+class SnapshotBackend(StorageBackend):
+    """
+    Answers lookups from a memory-mapped snapshot file shared by all workers on a host.
+
+    How it works:
+    - A single refresher process ("python -m actions.api.backends.snapshot")
+      reads the whole dataset from the real store and atomically swaps a new
+      snapshot file into place on a schedule
+    - Every worker maps that file read-only; lookups are a binary search in
+      shared memory, with no network call and no per-worker copy of the data,
+      so adding workers adds neither memory nor backend load
+    - Workers notice a swapped-in file within check_interval seconds and
+      map the new one
+    - Writes go straight to the source store. Until the next snapshot
+      includes them, the writing worker overlays its own updates on the
+      snapshot so its conversations read what they just wrote
+
+    If the snapshot file does not exist yet, lookups fall back to the source store.
+    """
+
+    name = "snapshot"
+
+    def __init__(self,
+                 path: str = SNAPSHOT_PATH,
+                 source: Optional[Union[Dict[str, Any], StorageBackend]] = None,
+                 check_interval: float = SNAPSHOT_CHECK_SECONDS):
+        """
+        Args:
+            path: The snapshot file written by the refresher
+            source: The store holding the real data, used for writes (and for
+                reads while there is no snapshot) - a member_store style config
+                dictionary or a backend. Defaults to JSONbin
+            check_interval: Seconds between checks for a new snapshot file
+        """
+        self.path = path
+        self.source = self._build_source(source)
+        self.check_interval = check_interval
+
+        self._snapshot: Optional[MemberSnapshot] = None
+        self._checked_at = 0.0
+        self._warned_missing = False
+        self._lock = threading.Lock()
+
+        # memberID -> (time written, record) for this worker's own recent writes
+        self._overlay: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+        # Policy end dates of the mapped snapshot, built on the first range query
+        self._expiry_index: Optional[Tuple[MemberSnapshot, PolicyExpiryIndex]] = None
+
+        self._reload_if_changed(force=True)
+
+    @staticmethod
+    def _build_source(source: Optional[Union[Dict[str, Any], StorageBackend]]) -> StorageBackend:
+        if isinstance(source, StorageBackend):
+            return source
+        # Imported here because the factory itself imports this module
+        from .factory import create_backend
+        return create_backend(dict(source or {"type": "jsonbin"}))
+
+    def _reload_if_changed(self, force: bool = False) -> Optional[MemberSnapshot]:
+        """Maps the snapshot file again if the refresher replaced it; returns the current snapshot."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if not force and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self._snapshot is None and not self._warned_missing:
+                    self._warned_missing = True
+                    logger.warning(f"No member snapshot at {self.path} yet - reading from the {self.source.name} store")
+                return self._snapshot
+            current = self._snapshot
+            if current is None or current.file_id != (stat.st_ino, stat.st_mtime_ns):
+                try:
+                    # The old mapping is released once no lookup uses it any more
+                    self._snapshot = MemberSnapshot(self.path)
+                    SNAPSHOT_RELOADS.inc()
+                    self._drop_included_writes(self._snapshot.created_at)
+                    logger.info(f"Mapped member snapshot {self.path} ({len(self._snapshot)} members)")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not map member snapshot {self.path}: {e}")
+            return self._snapshot
+
+    def _drop_included_writes(self, created_at: float) -> None:
+        """Forgets overlaid writes that the new snapshot already contains."""
+        self._overlay = {member_id: entry for member_id, entry in self._overlay.items() if entry[0] >= created_at}
+
+    def _with_overlay(self, snapshot: MemberSnapshot, members: Dict[str, Dict[str, Any]],
+                      member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        overlay = self._overlay
+        if overlay:
+            for member_id in member_ids:
+                entry = overlay.get(member_id)
+                if entry is not None and entry[0] >= snapshot.created_at:
+                    members[member_id] = dict(entry[1])
+        return members
+
+    def _remember_writes(self, updates: Dict[str, Dict[str, Any]], results: Dict[str, bool]) -> None:
+        """Overlays this worker's successful updates on the snapshot until it includes them."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        written_at = time.time()
+        applied = [member_id for member_id, ok in results.items() if ok]
+        current = self._with_overlay(snapshot, snapshot.get_many(applied), applied)
+        overlay = dict(self._overlay)
+        for member_id in applied:
+            if member_id in current:
+                overlay[member_id] = (written_at, {**current[member_id], **updates[member_id]})
+        self._overlay = overlay
+
+    def get_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        snapshot = self._reload_if_changed()
+        if snapshot is None:
+            CACHE_LOOKUPS.inc(backend=self.name, result="miss")
+            return self.source.get_members(member_ids)
+        CACHE_LOOKUPS.inc(backend=self.name, result="hit")
+        member_ids = set(member_ids)
+        return self._with_overlay(snapshot, snapshot.get_many(member_ids), member_ids)
+
+    def peek_members(self, member_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        snapshot = self._reload_if_changed()
+        if snapshot is None:
+            return self.source.peek_members(member_ids)
+        member_ids = set(member_ids)
+        return self._with_overlay(snapshot, snapshot.get_many(member_ids), member_ids)
+
+    def expiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        snapshot = self._reload_if_changed()
+        if snapshot is None:
+            return self.source.expiring_between(start_date, end_date)
+        cached = self._expiry_index
+        if cached is None or cached[0] is not snapshot:
+            # One pass over the mapped records per snapshot file
+            cached = (snapshot, PolicyExpiryIndex(snapshot.records()))
+            self._expiry_index = cached
+        expiring = cached[1].expiring_between(start_date, end_date)
+        overlay = {member_id: entry[1] for member_id, entry in self._overlay.items()
+                   if entry[0] >= snapshot.created_at}
+        if not overlay:
+            return expiring
+        # This worker's own writes override the snapshot's end dates
+        expiring = [pair for pair in expiring if pair[0] not in overlay]
+        expiring.extend(PolicyExpiryIndex(overlay.values()).expiring_between(start_date, end_date))
+        return sorted(expiring, key=lambda pair: (pair[1], pair[0]))
+
+    def update_members(self, updates: Dict[str, Dict[str, Any]],
+                       idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        results = self.source.update_members(updates, idempotency_key)
+        self._remember_writes(updates, results)
+        return results
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        return self.source.export_records()
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        return self.source.import_records(records)
+
+    def close(self) -> None:
+        self.source.close()
+
+    # Snapshot lookups never block on I/O worth a thread hop, so they run inline
+
+    async def aget_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        if self._reload_if_changed() is None:
+            CACHE_LOOKUPS.inc(backend=self.name, result="miss")
+            return await self.source.aget_members(member_ids)
+        return self.get_members(member_ids)
+
+    async def aupdate_members(self, updates: Dict[str, Dict[str, Any]],
+                              idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        results = await self.source.aupdate_members(updates, idempotency_key)
+        self._remember_writes(updates, results)
+        return results
+
+    async def aclose(self) -> None:
+        await self.source.aclose()
+
+
+def refresh_snapshot(path: str, source: StorageBackend, previous_digest: Optional[str] = None) -> Optional[str]:
+    """
+    Rebuilds the snapshot file from the source store, if the data changed.
+
+    Args:
+        path: Snapshot file to (re)write
+        source: The store holding the real data
+        previous_digest: Digest returned by the previous call; the file is
+            left untouched if the data still has the same digest
+
+    Returns:
+        Digest of the data now in the snapshot
+    """
+    started_at = time.time()
+    records = source.export_records()
+    digest = hashlib.sha256(json.dumps(records, sort_keys=True).encode('utf-8')).hexdigest()
+    if digest == previous_digest and os.path.exists(path):
+        logger.debug("Member data unchanged - snapshot kept")
+        return digest
+    # Stamped with the time the export started, so writes made while it ran
+    # stay overlaid in the workers until the next snapshot
+    count = write_snapshot(path, records, {"source": source.name, "digest": digest}, created_at=started_at)
+    logger.info(f"Wrote member snapshot {path} with {count} members")
+    return digest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep the shared member snapshot up to date (run one per host)")
+    parser.add_argument("path", nargs="?", default=SNAPSHOT_PATH, help="snapshot file used by the workers")
+    parser.add_argument("--interval", type=float, default=SNAPSHOT_REFRESH_SECONDS, help="seconds between rebuilds")
+    parser.add_argument("--once", action="store_true", help="build the snapshot once and exit")
+    args = parser.parse_args()
+
+    # The workers' member_store points at the snapshot; the refresher reads its source
+    from .factory import create_backend, load_member_store_config
+    config = load_member_store_config()
+    if config.get("type") == SnapshotBackend.name:
+        config = dict(config.get("source") or {"type": "jsonbin"})
+    source = create_backend(config)
+
+    digest = None
+    while True:
+        try:
+            digest = refresh_snapshot(args.path, source, digest)
+        except Exception as e:
+            if args.once:
+                raise
+            logger.error(f"Snapshot refresh failed, keeping the previous snapshot: {e}")
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        sys.exit(f"Snapshot refresh failed: {e}")
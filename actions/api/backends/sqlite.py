@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Any, Sequence, Tuple
+import logging
+
+from .base import StorageBackend, StorageError
+from ..metrics import RECORDS_SCANNED
+from ..records import household_member_ids, update_record
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Default database file, tunable with MEMBER_STORE_PATH
+SQLITE_PATH = os.environ.get("MEMBER_STORE_PATH", "members.db")
+
+# SQLite limits the number of ? placeholders per statement, so large
+# batch lookups are split into chunks of this size
+MAX_IDS_PER_QUERY = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    memberID TEXT PRIMARY KEY,
+    record   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS child_accounts (
+    child_id  TEXT PRIMARY KEY,
+    parent_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_child_accounts_parent ON child_accounts (parent_id);
+CREATE INDEX IF NOT EXISTS idx_members_policy_end ON members (json_extract(record, '$.policyEndDate'));
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Stores member records in a local SQLite database file.
+
+    Unlike JSONbin, every operation touches only the rows it needs:
+    - members: one row per member, primary-key indexed on memberID
+    - child_accounts: maps each child account to its primary (parent) member,
+      indexed on the parent so a whole household is one indexed query
+    - an expression index on each record's policyEndDate, so expiry range
+      queries only visit the members in the range
+
+    Each thread gets its own connection; the database runs in WAL mode so
+    readers never wait on a writer.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        # Create the tables up front so the first lookup doesn't have to
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _select_members(self, conn: sqlite3.Connection, member_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetches complete records for the given IDs using the primary-key index."""
+        found = {}
+        for start in range(0, len(member_ids), MAX_IDS_PER_QUERY):
+            chunk = member_ids[start:start + MAX_IDS_PER_QUERY]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(
+                f"SELECT memberID, record FROM members WHERE memberID IN ({placeholders})", chunk
+            )
+            for member_id, record in rows:
+                found[member_id] = json.loads(record)
+        RECORDS_SCANNED.inc(len(found), backend=self.name, operation="read")
+        return found
+
+    @staticmethod
+    def _replace_child_links(conn: sqlite3.Connection, record: Dict[str, Any]) -> None:
+        """Rewrites the child -> parent rows for one primary member."""
+        conn.execute("DELETE FROM child_accounts WHERE parent_id = ?", (record['memberID'],))
+        conn.executemany(
+            "INSERT OR REPLACE INTO child_accounts (child_id, parent_id) VALUES (?, ?)",
+            [(child_id, record['memberID']) for child_id in household_member_ids(record)[1:]]
+        )
+
+    def get_members(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        try:
+            return self._select_members(self._connection(), list(set(member_ids)))
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite lookup failed: {e}") from e
+
+    def select_members(self, member_ids: Iterable[str],
+                       fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        if fields is None:
+            return super().select_members(member_ids, fields)
+        # Build the trimmed record inside SQLite, so only the wanted fields are read back.
+        # Walking the record's own keys leaves out fields it does not have, like project_record().
+        # json_each() hands JSON booleans over as 1/0, so they are turned back into true/false
+        fields = ['memberID'] + [field for field in fields if field != 'memberID']
+        projection = (f"(SELECT json_group_object(key, CASE type WHEN 'true' THEN json('true') "
+                      f"WHEN 'false' THEN json('false') ELSE value END) FROM json_each(record) "
+                      f"WHERE key IN ({','.join('?' * len(fields))}))")
+        member_ids = list(set(member_ids))
+        found = {}
+        try:
+            conn = self._connection()
+            for start in range(0, len(member_ids), MAX_IDS_PER_QUERY):
+                chunk = member_ids[start:start + MAX_IDS_PER_QUERY]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT memberID, {projection} FROM members WHERE memberID IN ({placeholders})",
+                    fields + chunk
+                )
+                for member_id, record in rows:
+                    found[member_id] = json.loads(record)
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite lookup failed: {e}") from e
+        RECORDS_SCANNED.inc(len(found), backend=self.name, operation="read")
+        return found
+
+    def get_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        try:
+            conn = self._connection()
+            primary_record = self._select_members(conn, [member_id]).get(member_id)
+            if primary_record is None:
+                return None
+            # All children of this primary in one indexed join
+            rows = conn.execute(
+                "SELECT m.memberID, m.record FROM child_accounts c "
+                "JOIN members m ON m.memberID = c.child_id WHERE c.parent_id = ?",
+                (member_id,)
+            )
+            children_by_id = {child_id: json.loads(record) for child_id, record in rows}
+            RECORDS_SCANNED.inc(len(children_by_id), backend=self.name, operation="read")
+            return primary_record, children_by_id
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite lookup failed: {e}") from e
+
+    def expiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        try:
+            # Written with the indexed expression so SQLite can use idx_members_policy_end
+            rows = self._connection().execute(
+                "SELECT memberID, json_extract(record, '$.policyEndDate') FROM members "
+                "WHERE json_extract(record, '$.policyEndDate') BETWEEN ? AND ? "
+                "ORDER BY json_extract(record, '$.policyEndDate'), memberID",
+                (start_date, end_date)
+            ).fetchall()
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite lookup failed: {e}") from e
+        RECORDS_SCANNED.inc(len(rows), backend=self.name, operation="read")
+        return rows
+
+    # The database is a local file, so every lookup can be answered without a network call
+
+    def peek_members(self, member_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        return self.get_members(member_ids)
+
+    def peek_household_records(self, member_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]]:
+        return self.get_household_records(member_id)
+
+    def update_members(self, updates: Dict[str, Dict[str, Any]],
+                       idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        applied = {member_id: False for member_id in updates}
+        try:
+            conn = self._connection()
+            # One transaction for the whole batch - all updates land or none do
+            with conn:
+                for member_id, record in self._select_members(conn, list(updates)).items():
+                    applied[member_id] = True
+                    if not update_record(record, updates[member_id], idempotency_key):
+                        continue
+                    conn.execute(
+                        "UPDATE members SET record = ? WHERE memberID = ?",
+                        (json.dumps(record), member_id)
+                    )
+                    if 'child_accounts' in updates[member_id] or 'has_child_accounts' in updates[member_id]:
+                        self._replace_child_links(conn, record)
+            return applied
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite update failed: {e}") from e
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        try:
+            return [json.loads(record) for (record,) in self._connection().execute("SELECT record FROM members")]
+        except sqlite3.Error as e:
+            raise StorageError(f"SQLite export failed: {e}") from e
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Replaces the whole database with the given member records.
+
+        Used to seed the database, e.g. from a JSONbin export.
+
+        Args:
+            records: The complete list of member records
+
+        Returns:
+            Number of records imported
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM members")
+            conn.execute("DELETE FROM child_accounts")
+            conn.executemany(
+                "INSERT INTO members (memberID, record) VALUES (?, ?)",
+                [(record['memberID'], json.dumps(record)) for record in records]
+            )
+            for record in records:
+                self._replace_child_links(conn, record)
+        logger.info("Imported %d member records into %s", len(records), self.path)
+        return len(records)
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Runs the projected query in a worker thread, like the other default async variants
+
+    async def aselect_members(self, member_ids: Iterable[str],
+                              fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        return await asyncio.to_thread(self.select_members, list(member_ids), fields)
+
+
+if __name__ == "__main__":
+    # Seed a database from a JSON export:
+    #   python -m actions.api.backends.sqlite members.db export.json
+    # The export may be a plain record array or a JSONbin response ({"record": [...]})
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m actions.api.backends.sqlite <database> <records.json>")
+    with open(sys.argv[2]) as f:
+        data = json.load(f)
+    records = data['record'] if isinstance(data, dict) else data
+    print(f"Imported {SQLiteBackend(sys.argv[1]).import_records(records)} records into {sys.argv[1]}")
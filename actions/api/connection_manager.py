@@ -1,45 +1,82 @@
-import requests
-from typing import Dict, List, Optional, Any
+import threading
+from typing import Dict, List, Optional, Any, Sequence
 import logging
 
+from .backends import StorageBackend, get_backend
+from .metrics import STORE_CALL_ERRORS, instrument_call
+from .records import (
+    SUMMARY_FIELDS,
+    ordered_summaries,
+    parse_child_ids,
+    build_household,
+)
+
 # Set up logging for this module
 logger = logging.getLogger(__name__)
 
+# The single ConnectionManager shared by all actions in this process
+_shared_manager: Optional["ConnectionManager"] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_connection_manager() -> "ConnectionManager":
+    """
+    Returns the ConnectionManager shared by every action in this process.
+    
+    The manager is created on first use and then reused, so all actions
+    share one storage backend (and its pooled connections and caches)
+    instead of paying a new TCP+TLS handshake on every run.
+    Safe to call from multiple threads.
+    """
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_manager_lock:
+            # Check again inside the lock - another thread may have won the race
+            if _shared_manager is None:
+                _shared_manager = ConnectionManager()
+    return _shared_manager
+
+
 class ConnectionManager:
     """
-    Manages all connections to the external database API.
+    Manages all connections to the member database.
     
     This class handles all external data operations:
     - Retrieving member information
     - Fetching account details 
-    - Managing API authentication
-    - Error handling for network/API issues
+    - Updating member records
+    - Error handling for network/storage issues
     
-    Currently uses JSONbin.io as the backend database service.
+    Where the records actually live is decided by a pluggable StorageBackend
+    (JSONbin.io by default, or a local SQLite database), selected through the
+    member_store section of endpoints.yml or the MEMBER_STORE_TYPE variable.
+    Actions should use get_connection_manager() rather than creating their own.
     """
     
-    def __init__(self):
-        # Base URL for our JSONbin database
-        # This is where all our member records are stored
-        self.base_url = "https://api.jsonbin.io/v3/b/67aa6b3aacd3cb34a8dd1abb"
-        
-        # Authentication headers required by JSONbin
-        # The master key allows read access to our data
-        self.headers = {
-            'X-Master-Key': '$2a$10$j9N2X2cOS686Gk5IRXITw.8JhMMn9o/66t2N9h2twDPIkLse3uVHW'
-        }
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        # Storage engine holding our member records
+        # None means the process-wide backend, so all managers share its connections and caches
+        self._backend = backend
+    
+    @property
+    def backend(self) -> StorageBackend:
+        """The storage backend in use (resolved on each call, so set_backend() takes effect)."""
+        return self._backend if self._backend is not None else get_backend()
     
-    def get_member_data(self, member_id: str) -> Optional[Dict[str, Any]]:
+    @instrument_call("get_member_data")
+    def get_member_data(self, member_id: str, fields: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
         """
         Retrieves complete member data from the database using member ID.
         
         How it works:
-        1. Makes an API call to JSONbin
-        2. Searches through all records for the matching member ID
-        3. Returns the full member record if found, None otherwise
+        1. Asks the storage backend for this member ID
+           (an in-memory index lookup for JSONbin, a primary-key lookup for SQLite)
+        2. Returns the full member record if found, None otherwise
         
         Args:
             member_id: The member's unique identifier (e.g., "M12345")
+            fields: Only return these fields (None = the complete record).
+                Backends that can, read only these fields from the store
             
         Returns:
             Dictionary containing complete member data if found, including:
@@ -53,44 +90,26 @@ class ConnectionManager:
             Returns None if member cannot be found or if API call fails
         """
         try:
-            # Make API request to get all records from JSONbin
-            response = requests.get(self.base_url, headers=self.headers)
-            
-            # Process successful responses only (HTTP 200)
-            if response.status_code == 200:
-                # Parse JSON response into Python dictionary
-                data = response.json()
-                # Extract the array of member records
-                records = data['record']
-                
-                # Search for the specific member by ID
-                # Using next() with a generator to efficiently find the first match
-                member_record = next(
-                    (record for record in records if record['memberID'] == member_id),
-                    None  # Default value if no match is found
-                )
-                
-                return member_record
-            
-            # Log any non-successful API responses
-            logger.error(f"Failed to retrieve data: HTTP {response.status_code}")
-            return None
+            if fields is not None:
+                return self.backend.select_members([member_id], fields).get(member_id)
+            return self.backend.get_member(member_id)
             
         except Exception as e:
             # Handle any exceptions during the API call
             # This includes network errors, timeout issues, etc.
             logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_member_data")
             return None
     
+    @instrument_call("get_child_account_details")
     def get_child_account_details(self, child_ids_str: str) -> List[Dict[str, Any]]:
         """
         Retrieves detailed information for all dependent (child) accounts.
         
         How it works:
         1. Takes a comma-separated string of child account IDs
-        2. Makes an API call to get all member records
-        3. Filters out just the records matching the child IDs
-        4. Returns a list of simplified child account information
+        2. Resolves all of them with one batch lookup on the storage backend
+        3. Returns a list of simplified child account information
         
         Args:
             child_ids_str: Comma-separated string of child member IDs (e.g., "C12345,C12346")
@@ -105,147 +124,222 @@ class ConnectionManager:
             Returns empty list if no children found or if API call fails
         """
         try:
-            # Make API request to get all records
-            response = requests.get(self.base_url, headers=self.headers)
-            
-            # Process successful responses only
-            if response.status_code == 200:
-                # Parse JSON response 
-                data = response.json()
-                records = data['record']
-                
-                # Split comma-separated IDs into a list and clean up any whitespace
-                child_ids = [id.strip() for id in child_ids_str.split(',')]
-                child_details = []
-                
-                # For each child ID, find its complete record and extract relevant details
-                for child_id in child_ids:
-                    child_record = next(
-                        (record for record in records if record['memberID'] == child_id),
-                        None
-                    )
-                    # If child record found, extract only the needed fields
-                    if child_record:
-                        child_details.append({
-                            'memberID': child_record['memberID'],
-                            'name': child_record['name'],
-                            'dob': child_record['dob'],
-                            'policyEndDate': child_record['policyEndDate']
-                        })
-                
-                return child_details
+            # Split comma-separated IDs into a list and clean up any whitespace
+            child_ids = parse_child_ids(child_ids_str)
             
-            # Return empty list for any API failures
-            return []
+            # Resolve all children in one batch lookup, reading only the summary
+            # fields, then list them in the order the IDs were listed
+            children_by_id = self.backend.select_members(child_ids, SUMMARY_FIELDS)
+            child_details = ordered_summaries(children_by_id, child_ids)
+            
+            return child_details
             
         except Exception as e:
             # Handle any exceptions that might occur
             logger.error(f"Error retrieving child account details: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_child_account_details")
             return []
     
-    # def get_all_members(self) -> List[Dict[str, Any]]:
-    #     """
-    #     Retrieves ALL member records from the database.
-        
-    #     How it works:
-    #     1. Makes a single API call to get the complete dataset
-    #     2. Returns the entire list of member records
-        
-    #     Use cases:
-    #     - For data recovery when specific member ID is unknown
-    #     - For searching across all members
-    #     - For retrieving primary accounts (accounts with dependents)
-        
-    #     Returns:
-    #         Complete list of all member records in the database
-    #         Returns empty list if API call fails
-    #     """
-    #     try:
-    #         # Make API request to get all records
-    #         response = requests.get(self.base_url, headers=self.headers)
-            
-    #         # Process successful responses only
-    #         if response.status_code == 200:
-    #             data = response.json()
-    #             # Return the full array of member records
-    #             records = data['record']
-    #             return records
-            
-    #         # Log any API failures
-    #         logger.error(f"Failed to retrieve all members: HTTP {response.status_code}")
-    #         return []
-            
-    #     except Exception as e:
-    #         # Handle any exceptions during the API call
-    #         logger.error(f"Error accessing database API: {str(e)}")
-    #         return []
+    @instrument_call("get_members")
+    def get_members(self, member_ids: List[str],
+                    fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieves several complete member records with a single batch lookup.
+        
+        Args:
+            member_ids: The member IDs to look up (the record filter)
+            fields: Only return these fields (None = complete records)
+            
+        Returns:
+            Dictionary of memberID -> member record for every ID found.
+            Returns an empty dictionary if the API call fails
+        """
+        try:
+            if fields is not None:
+                return self.backend.select_members(member_ids, fields)
+            return self.backend.get_members(member_ids)
+            
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_members")
+            return {}
+    
+    @instrument_call("get_household")
+    def get_household(self, member_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves a primary member and all of its child accounts at once.
+        
+        How it works:
+        1. Asks the storage backend for the primary member and its children
+           (one dataset read at most for JSONbin, one indexed join for SQLite)
+        2. Builds child summaries in the order listed on the primary record
+        
+        Args:
+            member_id: The primary member's unique identifier (e.g., "M12345")
+            
+        Returns:
+            Dictionary with:
+            - primary: The complete primary member record
+            - child_accounts: List of child summaries (memberID, name, dob, policyEndDate)
+            
+            Returns None if member cannot be found or if API call fails
+        """
+        try:
+            household_records = self.backend.get_household_records(member_id)
+            if household_records is None:
+                return None
+            
+            primary_record, children_by_id = household_records
+            return build_household(primary_record, children_by_id)
+            
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_household")
+            return None
     
-    def update_member_data(self, member_id: str, data: Dict[str, Any]) -> bool:
+    @instrument_call("peek_household")
+    def peek_household(self, member_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves a household only if the backend can answer without a network call.
+        
+        Used to check whether data already held by a conversation is still
+        current: a None answer means "unknown", not "does not exist".
+        
+        Args:
+            member_id: The primary member's unique identifier (e.g., "M12345")
+            
+        Returns:
+            The same dictionary as get_household(), or None if the backend
+            has no current local copy of the household (or the lookup fails)
+        """
+        try:
+            household_records = self.backend.peek_household_records(member_id)
+            if household_records is None:
+                return None
+            
+            primary_record, children_by_id = household_records
+            return build_household(primary_record, children_by_id)
+            
+        except Exception as e:
+            logger.error(f"Error reading local member data: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="peek_household")
+            return None
+    
+    @instrument_call("get_expiring_members")
+    def get_expiring_members(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """
+        Lists the members whose policy ends between two dates (both included).
+        
+        How it works:
+        1. Asks the storage backend for the members in the date range, using
+           its policyEndDate index (a sorted in-memory index for JSONbin, an
+           expression index for SQLite)
+        2. Reads only the summary fields of those members in one batch lookup
+        
+        Args:
+            start_date: First end date to include (YYYY-MM-DD)
+            end_date: Last end date to include (YYYY-MM-DD)
+            
+        Returns:
+            List of member summaries (memberID, name, dob, policyEndDate),
+            earliest end date first.
+            Returns empty list if the API call fails
+        """
+        try:
+            expiring = self.backend.expiring_between(start_date, end_date)
+            members_by_id = self.backend.select_members([member_id for member_id, _ in expiring], SUMMARY_FIELDS)
+            return ordered_summaries(members_by_id, [member_id for member_id, _ in expiring])
+            
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_expiring_members")
+            return []
+    
+    @instrument_call("get_policy_status")
+    def get_policy_status(self, member_ids: List[str], as_of: str) -> Dict[str, bool]:
+        """
+        Checks which members' policies are active on a date.
+        
+        A policy is active while the date is before its policyEndDate. Only
+        the end dates are read from the backend.
+        
+        Args:
+            member_ids: The member IDs to check
+            as_of: The date to check (YYYY-MM-DD)
+            
+        Returns:
+            Dictionary of memberID -> True if active, for every ID found.
+            Returns an empty dictionary if the API call fails
+        """
+        try:
+            members = self.backend.select_members(member_ids, ('policyEndDate',))
+            return {member_id: bool(record.get('policyEndDate')) and as_of < record['policyEndDate']
+                    for member_id, record in members.items()}
+            
+        except Exception as e:
+            logger.error(f"Error accessing database API: {str(e)}")
+            STORE_CALL_ERRORS.inc(call="get_policy_status")
+            return {}
+    
+    @instrument_call("update_member_data")
+    def update_member_data(self, member_id: str, data: Dict[str, Any],
+                           idempotency_key: Optional[str] = None) -> bool:
         """
         Updates member data in the database.
         
-        This implementation:
-        1. Gets the current full database
-        2. Finds the member record by ID
-        3. Updates the specified fields
-        4. Writes the entire updated database back to JSONbin
+        A single-member shortcut for bulk_update_members().
         
         Args:
             member_id: The member's unique identifier
             data: Dictionary containing data fields to update
+            idempotency_key: Optional key identifying this update (see bulk_update_members)
             
         Returns:
             Boolean indicating success (True) or failure (False)
         """
+        return self.bulk_update_members({member_id: data}, idempotency_key).get(member_id, False)
+    
+    @instrument_call("bulk_update_members")
+    def bulk_update_members(self, updates: Dict[str, Dict[str, Any]],
+                            idempotency_key: Optional[str] = None) -> Dict[str, bool]:
+        """
+        Updates several members in the database in one operation.
+        
+        The storage backend applies the whole batch at once:
+        - JSONbin: one read and one write of the whole document
+        - SQLite: one transaction of indexed row updates
+        
+        Two updates running at the same time can't overwrite each other's
+        changes: JSONbin writes are conditional on the version they were built
+        from and are rebuilt on fresh data if someone else wrote first.
+        
+        Args:
+            updates: Dictionary of memberID -> data fields to update
+                     (e.g., {"M12345": {"policyEndDate": "2025-03-01"}})
+            idempotency_key: Optional key identifying this update; the key is
+                     stored with each updated member, and sending the same
+                     key again (a retried turn) leaves the members unchanged
+            
+        Returns:
+            Dictionary of memberID -> success (True) or failure (False).
+            Members missing from the database, or all members if the
+            write fails, are reported as False
+        """
+        if not updates:
+            return {}
+        
         try:
-            logger.info(f"Updating member data for ID: {member_id}")
-            
-            # First, get the current full database content
-            response = requests.get(self.base_url, headers=self.headers)
-            
-            if response.status_code != 200:
-                logger.error(f"Failed to retrieve database: HTTP {response.status_code}")
-                return False
-            
-            # Parse database content
-            db_data = response.json()
-            records = db_data['record']
-            
-            # Find the member record to update
-            found = False
-            for record in records:
-                if record['memberID'] == member_id:
-                    # Update specified fields in the record
-                    for key, value in data.items():
-                        record[key] = value
-                    found = True
-                    break
-            
-            if not found:
-                logger.error(f"Member ID not found in database: {member_id}")
-                return False
-            
-            # Prepare headers for update operation - need Content-Type for write operations
-            update_headers = self.headers.copy()
-            update_headers['Content-Type'] = 'application/json'
-            
-            # Write the entire updated database back to JSONbin
-            update_response = requests.put(
-                self.base_url,
-                json=records,  # JSONbin expects the data directly, not wrapped
-                headers=update_headers
-            )
-            
-            # Check if update was successful
-            if update_response.status_code == 200:
-                logger.info(f"Successfully updated member data for ID: {member_id}")
-                return True
-            else:
-                logger.error(f"Failed to update database: HTTP {update_response.status_code}")
-                logger.error(f"Response: {update_response.text}")
-                return False
+            logger.debug("Updating member data for IDs: %s", list(updates))
+            results = self.backend.update_members(updates, idempotency_key)
+            
+            for member_id, found in results.items():
+                if not found:
+                    logger.error(f"Member ID not found in database: {member_id}")
+            logger.debug("Member update results: %s", results)
+            return results
                 
         except Exception as e:
             # Handle any exceptions during the update process
             logger.error(f"Error updating member data: {str(e)}")
-            return False 
\ No newline at end of file
+            STORE_CALL_ERRORS.inc(call="bulk_update_members")
+            return {member_id: False for member_id in updates}
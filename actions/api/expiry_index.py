@@ -0,0 +1,101 @@
+import argparse
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+
+class PolicyExpiryIndex:
+    """
+    Member policies sorted by policyEndDate.
+
+    Dates are ISO strings (YYYY-MM-DD), which sort the same way as the dates
+    they stand for - the flows compare them as strings too. A policy is
+    active as of a date while that date is before its policyEndDate.
+
+    Answers:
+    - a member's end date or active status in constant time
+    - every policy ending in a date range with a binary search, without
+      looking at the members outside the range
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = ()):
+        """
+        Args:
+            records: Member records; those without a policyEndDate are left out
+        """
+        # memberID -> policyEndDate
+        self._end_dates: Dict[str, str] = {}
+        pairs = []
+        for record in records:
+            end_date = record.get('policyEndDate')
+            if end_date:
+                self._end_dates[record['memberID']] = end_date
+                pairs.append((end_date, record['memberID']))
+        pairs.sort()
+        # Parallel sorted lists, so bisect works on the dates directly
+        self._dates = [end_date for end_date, _ in pairs]
+        self._member_ids = [member_id for _, member_id in pairs]
+
+    def __len__(self) -> int:
+        return len(self._dates)
+
+    def end_date(self, member_id: str) -> Optional[str]:
+        """Returns a member's policyEndDate, or None if the member is not indexed."""
+        return self._end_dates.get(member_id)
+
+    def is_active(self, member_id: str, as_of: str) -> Optional[bool]:
+        """
+        Checks whether a member's policy is active on a date.
+
+        Returns:
+            True or False, or None if the member is not indexed
+        """
+        end_date = self._end_dates.get(member_id)
+        return None if end_date is None else as_of < end_date
+
+    def count_active(self, as_of: str) -> int:
+        """Number of indexed policies still active on a date."""
+        return len(self._dates) - bisect_right(self._dates, as_of)
+
+    def expiring_between(self, start_date: str, end_date: str) -> List[Tuple[str, str]]:
+        """
+        Lists the policies ending in a date range.
+
+        Args:
+            start_date: First end date to include (YYYY-MM-DD)
+            end_date: Last end date to include (YYYY-MM-DD)
+
+        Returns:
+            (memberID, policyEndDate) pairs, earliest end date first
+        """
+        low = bisect_left(self._dates, start_date)
+        high = bisect_right(self._dates, end_date)
+        return list(zip(self._member_ids[low:high], self._dates[low:high]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="List the members whose policy ends in a date range")
+    parser.add_argument("--from", dest="start_date", required=True, help="first end date to include (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", required=True, help="last end date to include (YYYY-MM-DD)")
+    parser.add_argument("--json", action="store_true", help="print the members as JSON")
+    args = parser.parse_args()
+
+    # Imported here so the index itself stays free of backend dependencies
+    from .connection_manager import get_connection_manager
+    members = get_connection_manager().get_expiring_members(args.start_date, args.end_date)
+    if args.json:
+        print(json.dumps(members, indent=2))
+        return
+    for member in members:
+        print(f"{member['policyEndDate']}  {member['memberID']}  {member['name']}")
+    print(f"{len(members)} policies ending between {args.start_date} and {args.end_date}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -0,0 +1,232 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Any, Sequence
+import logging
+
+from .expiry_index import PolicyExpiryIndex
+from .member_record import MemberRecord
+from .records import project_members
+from .snapshot import MemberSnapshot
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# How long (in seconds) a downloaded member dataset is trusted before refreshing
+DEFAULT_TTL_SECONDS = 300.0
+
+
+class MemberCache:
+    """
+    In-memory index of member records keyed by memberID.
+
+    This class lets the action server answer member lookups without a
+    network call:
+    - Builds a dictionary index from one full download of the member records,
+      holding each member as a compact MemberRecord rather than the parsed
+      JSON dictionary, so even a large population fits in every worker
+    - Answers lookups by member ID in constant time
+    - Reports when the data is older than the configured TTL
+    - Remembers the version of the data it holds (ETag, version number, ...)
+      so a refresh can first check whether anything changed at all
+    - Can be invalidated explicitly (e.g. right after a write)
+    - Can start from a memory-mapped snapshot file left by a previous run,
+      answering lookups from it straight away until fresh data is loaded
+    - Keeps a PolicyExpiryIndex of the loaded data for date range queries,
+      built on first use after each load
+
+    One instance is shared by every ConnectionManager in the process, so all
+    actions benefit from the same download.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        # Time-to-live for the loaded data; 0 disables caching entirely
+        self.ttl_seconds = ttl_seconds
+
+        # memberID -> full member record
+        self._index: Dict[str, MemberRecord] = {}
+
+        # Monotonic timestamp of the last successful load (None = never loaded)
+        self._loaded_at: Optional[float] = None
+
+        # Version markers of the loaded data as reported by the backend
+        # (e.g. {"etag": ..., "version": ...}); empty when unknown
+        self.validators: Dict[str, str] = {}
+
+        # Snapshot answering lookups until the first real load (warm start)
+        self._snapshot: Optional[MemberSnapshot] = None
+
+        # Policy end dates of the loaded data, sorted (None = not built yet),
+        # and a counter of loads so an index built from older data is never kept
+        self._expiry_index: Optional[PolicyExpiryIndex] = None
+        self._generation = 0
+
+        # Whether the index holds usable data, fresh or stale
+        # (cleared by invalidate, because our own write made it outdated)
+        self._has_data = False
+
+        # Guards the index so concurrent action threads see a consistent view
+        self._lock = threading.RLock()
+
+    def is_fresh(self) -> bool:
+        """
+        Checks whether the cached data can still be used.
+
+        Returns:
+            True if data has been loaded and is younger than the TTL
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return False
+            return (time.monotonic() - self._loaded_at) < self.ttl_seconds
+
+    def has_data(self) -> bool:
+        """Checks whether the index holds usable data, fresh or not."""
+        with self._lock:
+            return self._has_data
+
+    def age(self) -> Optional[float]:
+        """
+        Returns how many seconds ago the data was loaded (or last revalidated).
+
+        Returns:
+            Age in seconds, or None if there is no usable data
+        """
+        with self._lock:
+            if not self._has_data or self._loaded_at is None:
+                return None
+            return time.monotonic() - self._loaded_at
+
+    def load(self, records: List[Dict[str, Any]], validators: Optional[Dict[str, str]] = None) -> None:
+        """
+        Replaces the cached data with a freshly downloaded record list.
+
+        Args:
+            records: The complete list of member records from the database
+            validators: Version markers of this data, used for later revalidation
+        """
+        # Build the new index outside the lock, then swap it in at once
+        index = {}
+        for record in records:
+            member = MemberRecord.from_dict(record)
+            index[member.memberID] = member
+        with self._lock:
+            self._index = index
+            self._snapshot = None
+            self._expiry_index = None
+            self._generation += 1
+            self._loaded_at = time.monotonic()
+            self.validators = dict(validators or {})
+            self._has_data = True
+        logger.debug("Member cache loaded with %d records", len(index))
+
+    def load_snapshot(self, snapshot: MemberSnapshot, validators: Optional[Dict[str, str]] = None) -> None:
+        """
+        Answers lookups from a snapshot file until the next load().
+
+        The snapshot keeps its real age, so it is only as fresh as it
+        actually is - an old one is revalidated (or replaced) on first use.
+
+        Args:
+            snapshot: The mapped snapshot written by an earlier run
+            validators: Version markers of the snapshot's data
+        """
+        with self._lock:
+            self._index = {}
+            self._snapshot = snapshot
+            self._expiry_index = None
+            self._generation += 1
+            self._loaded_at = time.monotonic() - max(0.0, snapshot.age())
+            self.validators = dict(validators or {})
+            self._has_data = True
+        logger.debug("Member cache warm-started from %s with %d records", snapshot.path, len(snapshot))
+
+    def get(self, member_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a single member by ID.
+
+        Args:
+            member_id: The member's unique identifier (e.g., "M12345")
+
+        Returns:
+            The member record as a new dictionary if found, None otherwise
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            record = self._index.get(member_id)
+        if snapshot is not None:
+            # Snapshot lookups build a new dictionary every time
+            return snapshot.get(member_id)
+        # A new dictionary, so callers can never corrupt the shared index
+        return record.to_dict() if record is not None else None
+
+    def get_many(self, member_ids: Iterable[str],
+                 fields: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Looks up several members at once under a single lock.
+
+        Args:
+            member_ids: The member IDs to resolve (duplicates are ignored)
+            fields: Only return these fields (None = complete records); the
+                smaller dictionaries are built straight from the index
+
+        Returns:
+            Dictionary of memberID -> new record dictionary, for the IDs that exist
+        """
+        wanted = set(member_ids)
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is not None:
+            return project_members(snapshot.get_many(wanted), fields)
+        with self._lock:
+            found = {member_id: self._index[member_id] for member_id in wanted if member_id in self._index}
+        if fields is None:
+            return {member_id: record.to_dict() for member_id, record in found.items()}
+        return {member_id: record.project(fields) for member_id, record in found.items()}
+
+    def expiry_index(self) -> PolicyExpiryIndex:
+        """
+        Returns the policy expiry index of the loaded data.
+
+        Built with one pass over the data the first time it is needed after
+        a load, then reused until the next load or invalidation.
+        """
+        with self._lock:
+            if self._expiry_index is not None:
+                return self._expiry_index
+            generation = self._generation
+            snapshot = self._snapshot
+            records = list(self._index.values())
+        # Built outside the lock so lookups are not held up meanwhile
+        expiry_index = PolicyExpiryIndex(snapshot.records() if snapshot is not None else records)
+        with self._lock:
+            if self._generation == generation:
+                self._expiry_index = expiry_index
+        return expiry_index
+
+    def touch(self) -> None:
+        """
+        Restarts the TTL without reloading.
+
+        Used when the backend confirmed the data has not changed since it was loaded.
+        """
+        with self._lock:
+            if self._has_data:
+                self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """
+        Marks the cached data as stale so the next lookup triggers a full refresh.
+
+        Called after every successful write so readers never see data
+        older than their own updates. The version markers are dropped too,
+        so the refresh cannot be skipped, and the old data may no longer be
+        served as stale.
+        """
+        with self._lock:
+            self._loaded_at = None
+            self.validators = {}
+            self._snapshot = None
+            self._expiry_index = None
+            self._generation += 1
+            self._has_data = False
+        logger.debug("Member cache invalidated")
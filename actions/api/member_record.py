@@ -0,0 +1,121 @@
+import sys
+from typing import Any, Dict, Iterable, Optional
+
+from .records import SUMMARY_FIELDS
+
+# Marks a field the record did not have (None is a real value, e.g. child_accounts: null)
+_MISSING = object()
+
+
+class MemberRecord:
+    """
+    Compact in-memory form of one member record.
+
+    The member index keeps one of these per member instead of the JSON
+    dictionary it was parsed from:
+    - The fields the actions use live in fixed slots (no per-record
+      dictionary or key table), so a record takes a fraction of the memory
+    - memberIDs and dates are interned: members sharing a date of birth or
+      a policy end date share one string, and the index key is the same
+      object as the record's memberID
+    - Any other field (e.g. the idempotency keys of recent updates) is kept
+      in a small dictionary, only on the records that have one
+
+    Records are read with the same syntax as dictionaries (record['name'],
+    record.get('policyEndDate')), and turned into the dictionaries handed
+    to actions and slots with to_dict(), project() or summary(). Treat them
+    as read-only: the member index shares them between all callers.
+    """
+
+    __slots__ = ('memberID', 'name', 'dob', 'policyEndDate', 'has_child_accounts', 'child_accounts', 'extra')
+
+    # The fields stored in slots, in the order records are written back
+    FIELDS = ('memberID', 'name', 'dob', 'policyEndDate', 'has_child_accounts', 'child_accounts')
+
+    def __init__(self, memberID: str, name: Any = _MISSING, dob: Any = _MISSING,
+                 policyEndDate: Any = _MISSING, has_child_accounts: Any = _MISSING,
+                 child_accounts: Any = _MISSING, extra: Optional[Dict[str, Any]] = None):
+        self.memberID = sys.intern(memberID)
+        self.name = name
+        self.dob = sys.intern(dob) if type(dob) is str else dob
+        self.policyEndDate = sys.intern(policyEndDate) if type(policyEndDate) is str else policyEndDate
+        self.has_child_accounts = has_child_accounts
+        self.child_accounts = child_accounts
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> "MemberRecord":
+        """
+        Builds a compact record from a member record dictionary.
+
+        Args:
+            record: A complete member record as stored in the database
+
+        Returns:
+            A MemberRecord holding every field of the dictionary
+        """
+        get = record.get
+        extra = {field: value for field, value in record.items() if field not in _SLOT_FIELDS}
+        return cls(record['memberID'], get('name', _MISSING), get('dob', _MISSING),
+                   get('policyEndDate', _MISSING), get('has_child_accounts', _MISSING),
+                   get('child_accounts', _MISSING), extra)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the complete record as a new dictionary, with the fields in their usual order."""
+        record = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not _MISSING:
+                record[field] = value
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+    def project(self, fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+        """
+        Returns only some fields, as a new dictionary.
+
+        Same rules as records.project_record(): fields the record does not
+        have are left out and memberID is always included.
+        """
+        if fields is None:
+            return self.to_dict()
+        projected = {}
+        for field in fields:
+            value = self.get(field, _MISSING)
+            if value is not _MISSING:
+                projected[field] = value
+        projected['memberID'] = self.memberID
+        return projected
+
+    def summary(self) -> Dict[str, Any]:
+        """The account summary stored in slots and shown on buttons (memberID, name, dob, policyEndDate)."""
+        return {field: self[field] for field in SUMMARY_FIELDS}
+
+    def is_active(self, as_of: str) -> bool:
+        """Checks whether the policy is active on a date (YYYY-MM-DD)."""
+        end_date = self.get('policyEndDate')
+        return bool(end_date) and as_of < end_date
+
+    # Dictionary-style reads, so helpers written for record dictionaries accept these too
+
+    def get(self, field: str, default: Any = None) -> Any:
+        if field in _SLOT_FIELDS:
+            value = getattr(self, field)
+            return default if value is _MISSING else value
+        return self.extra.get(field, default) if self.extra else default
+
+    def __getitem__(self, field: str) -> Any:
+        value = self.get(field, _MISSING)
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
+
+    def __contains__(self, field: str) -> bool:
+        return self.get(field, _MISSING) is not _MISSING
+
+    def __repr__(self) -> str:
+        return f"MemberRecord({self.to_dict()!r})"
+
+
+_SLOT_FIELDS = frozenset(MemberRecord.FIELDS)
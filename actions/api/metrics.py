@@ -0,0 +1,397 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Latency histogram buckets in seconds, from a cache hit to a slow JSONbin round trip
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Port of the metrics endpoint; unset means no endpoint is started
+METRICS_PORT = os.environ.get("ACTION_METRICS_PORT")
+METRICS_HOST = os.environ.get("ACTION_METRICS_HOST", "0.0.0.0")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class MetricsSink:
+    """
+    Receives every metric update.
+
+    The built-in MetricsRegistry aggregates them for the Prometheus endpoint;
+    subclass this to forward them somewhere else (StatsD, a log shipper, ...)
+    and register the sink with add_sink().
+    """
+
+    def inc(self, name: str, amount: float, labels: Dict[str, Any]) -> None:
+        """Adds amount to a counter."""
+
+    def observe(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        """Records one sample of a histogram."""
+
+
+class MetricsRegistry(MetricsSink):
+    """
+    Aggregates counters and histograms in memory and renders them as Prometheus text.
+
+    Safe to share between threads and coroutines.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # name -> (type, help text)
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        # name -> label key -> value
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> label key -> [bucket counts..., sum, count]
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, metric_type: str, help_text: str) -> None:
+        with self._lock:
+            self._descriptions[name] = (metric_type, help_text)
+
+    def inc(self, name: str, amount: float, labels: Dict[str, Any]) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name: str, value: float, labels: Dict[str, Any]) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def value(self, name: str, **labels: Any) -> float:
+        """Current value of a counter (or sample count of a histogram) for these labels."""
+        key = _label_key(labels)
+        with self._lock:
+            if name in self._histograms:
+                state = self._histograms[name].get(key)
+                return state[-1] if state else 0.0
+            return self._counters.get(name, {}).get(key, 0.0)
+
+    def reset(self) -> None:
+        """Forgets every recorded value (descriptions are kept)."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(key) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(set(self._counters) | set(self._histograms)):
+                metric_type, help_text = self._descriptions.get(name, ("untyped", ""))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in sorted(self._counters.get(name, {}).items()):
+                    lines.append(f"{name}{self._format_labels(key)} {_format_value(value)}")
+                for key, state in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0.0
+                    for bound, count in zip(self.buckets, state):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{self._format_labels(key, ('le', f'{bound:g}'))} {_format_value(cumulative)}")
+                    lines.append(f"{name}_bucket{self._format_labels(key, ('le', '+Inf'))} {_format_value(state[-1])}")
+                    lines.append(f"{name}_sum{self._format_labels(key)} {state[-2]:.6f}")
+                    lines.append(f"{name}_count{self._format_labels(key)} {_format_value(state[-1])}")
+        return "\n".join(lines) + "\n"
+
+
+# The registry behind the metrics endpoint, and every sink receiving updates
+REGISTRY = MetricsRegistry()
+_sinks: List[MetricsSink] = [REGISTRY]
+
+
+def add_sink(sink: MetricsSink) -> None:
+    """Sends every future metric update to this sink as well."""
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def remove_sink(sink: MetricsSink) -> None:
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+class ActionUsage:
+    """
+    Backend traffic caused by one action run.
+
+    Filled in while the action runs, and handed to the action observers
+    afterwards. Tasks and asyncio.to_thread() calls started by the action
+    inherit the run's context and count too; plain threads do not, unless
+    they are started with start_in_context() (as the backends' background
+    refreshes are). Traffic of background work that outlives the run is
+    not part of what the observers were handed.
+    """
+
+    __slots__ = ("backend_requests", "bytes_in", "bytes_out")
+
+    def __init__(self):
+        self.backend_requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def add(self, name: str, amount: float, labels: Dict[str, Any]) -> None:
+        if name == "member_store_requests_total":
+            self.backend_requests += int(amount)
+        elif name == "member_store_bytes_total":
+            if labels.get("direction") == "out":
+                self.bytes_out += int(amount)
+            else:
+                self.bytes_in += int(amount)
+
+
+# Usage of the action run in progress in this context (None outside instrumented runs)
+_action_usage: contextvars.ContextVar[Optional[ActionUsage]] = contextvars.ContextVar("action_usage", default=None)
+
+# Called after every instrumented action run as
+# observer(action name, tracker, seconds, usage, ok)
+ActionObserver = Callable[[str, Any, float, ActionUsage, bool], None]
+_action_observers: List[ActionObserver] = []
+
+
+def start_in_context(target: Callable[..., Any], *args: Any) -> threading.Thread:
+    """
+    Runs target(*args) in a daemon thread, in a copy of the caller's context.
+
+    A plain thread starts with an empty context, so the backend traffic of,
+    e.g., a background refresh set off by an action would not be counted
+    towards that action run.
+    """
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(target, *args), daemon=True)
+    thread.start()
+    return thread
+
+
+def add_action_observer(observer: ActionObserver) -> None:
+    """Calls this observer after every action run, with the backend traffic the run caused."""
+    if observer not in _action_observers:
+        _action_observers.append(observer)
+
+
+def remove_action_observer(observer: ActionObserver) -> None:
+    if observer in _action_observers:
+        _action_observers.remove(observer)
+
+
+class Counter:
+    """A value that only goes up (requests, bytes, cache hits...)."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        REGISTRY.describe(name, "counter", help_text)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        for sink in _sinks:
+            sink.inc(self.name, amount, labels)
+        usage = _action_usage.get()
+        if usage is not None:
+            usage.add(self.name, amount, labels)
+
+
+class Histogram:
+    """A distribution of samples, e.g. latencies in seconds."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        REGISTRY.describe(name, "histogram", help_text)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        for sink in _sinks:
+            sink.observe(self.name, value, labels)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observes how long the with-block took."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+# Actions
+ACTION_SECONDS = Histogram("rasa_action_run_seconds", "Time spent in Action.run")
+ACTION_ERRORS = Counter("rasa_action_errors_total", "Action runs that raised an exception")
+
+# ConnectionManager calls
+STORE_CALL_SECONDS = Histogram("member_store_call_seconds", "Time spent in ConnectionManager calls")
+STORE_CALL_ERRORS = Counter("member_store_call_errors_total", "ConnectionManager calls that failed")
+
+# Storage backends
+BACKEND_BYTES = Counter("member_store_bytes_total", "Bytes exchanged with the storage backend (direction=in|out)")
+BACKEND_REQUESTS = Counter("member_store_requests_total", "Requests sent to the storage backend")
+CACHE_LOOKUPS = Counter("member_cache_lookups_total", "Member index lookups (result=hit|stale|miss)")
+CACHE_REFRESHES = Counter("member_cache_refreshes_total", "Member index refreshes (result=downloaded|unchanged)")
+RECORDS_SCANNED = Counter("member_records_scanned_total", "Member records read or walked to answer a call")
+BREAKER_REJECTIONS = Counter("member_store_breaker_rejections_total", "Calls rejected by an open circuit breaker")
+DEADLINES_EXCEEDED = Counter("member_store_deadline_exceeded_total", "Backend operations that ran past their deadline")
+WRITE_CONFLICTS = Counter("member_store_write_conflicts_total", "Writes rejected because the data changed since it was read")
+
+
+def instrument_action(action_cls: type) -> type:
+    """
+    Class decorator timing every run of a Rasa action.
+
+    Records rasa_action_run_seconds and rasa_action_errors_total, labelled
+    with the action's name. Async run() methods stay async, so the action
+    server still awaits them. If action observers are registered, the
+    backend traffic of each run is collected and passed to them.
+    """
+    run = action_cls.run
+
+    def start_run():
+        usage = ActionUsage() if _action_observers else None
+        return usage, (_action_usage.set(usage) if usage is not None else None), time.perf_counter()
+
+    def finish_run(action, args, kwargs, usage, token, start, ok):
+        elapsed = time.perf_counter() - start
+        ACTION_SECONDS.observe(elapsed, action=action.name())
+        if usage is None:
+            return
+        _action_usage.reset(token)
+        # run(dispatcher, tracker, domain)
+        tracker = args[1] if len(args) > 1 else kwargs.get("tracker")
+        for observer in list(_action_observers):
+            try:
+                observer(action.name(), tracker, elapsed, usage, ok)
+            except Exception as e:
+                logger.error(f"Action observer failed: {e}")
+
+    if asyncio.iscoroutinefunction(run):
+        @functools.wraps(run)
+        async def timed_run(self, *args, **kwargs):
+            usage, token, start = start_run()
+            ok = False
+            try:
+                result = await run(self, *args, **kwargs)
+                ok = True
+                return result
+            except Exception:
+                ACTION_ERRORS.inc(action=self.name())
+                raise
+            finally:
+                finish_run(self, args, kwargs, usage, token, start, ok)
+    else:
+        @functools.wraps(run)
+        def timed_run(self, *args, **kwargs):
+            usage, token, start = start_run()
+            ok = False
+            try:
+                result = run(self, *args, **kwargs)
+                ok = True
+                return result
+            except Exception:
+                ACTION_ERRORS.inc(action=self.name())
+                raise
+            finally:
+                finish_run(self, args, kwargs, usage, token, start, ok)
+
+    action_cls.run = timed_run
+    return action_cls
+
+
+def instrument_call(call_name: str) -> Callable[[Callable], Callable]:
+    """Method decorator timing a ConnectionManager call (sync or async) as member_store_call_seconds."""
+    def decorator(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_call(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    STORE_CALL_SECONDS.observe(time.perf_counter() - start, call=call_name)
+        else:
+            @functools.wraps(fn)
+            def timed_call(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    STORE_CALL_SECONDS.observe(time.perf_counter() - start, call=call_name)
+        return timed_call
+    return decorator
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = METRICS_HOST) -> ThreadingHTTPServer:
+    """
+    Serves REGISTRY at http://<host>:<port>/metrics from a background thread.
+
+    Only one endpoint is started per process; later calls return the running one.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = REGISTRY.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-endpoint", daemon=True).start()
+        logger.info(f"Serving action server metrics on http://{host}:{port}/metrics")
+        return _server
+
+
+def start_metrics_server_from_env() -> Optional[ThreadingHTTPServer]:
+    """Starts the metrics endpoint if ACTION_METRICS_PORT is set; never raises."""
+    if not METRICS_PORT:
+        return None
+    try:
+        return start_metrics_server(int(METRICS_PORT))
+    except Exception as e:
+        logger.error(f"Could not start the metrics endpoint on port {METRICS_PORT}: {e}")
+        return None
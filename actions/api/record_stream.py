@@ -0,0 +1,205 @@
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set
+import logging
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Size of the response chunks read from the network while streaming
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Parser states (_NEXT_KEY and _NEXT_ELEMENT follow a comma, so the object or array cannot close there)
+_START, _KEY, _NEXT_KEY, _COLON, _VALUE, _AFTER_VALUE, _ARRAY, _NEXT_ELEMENT, _AFTER_ELEMENT, _DONE = range(10)
+
+
+class RecordStream:
+    """
+    Incrementally extracts member records from a JSONbin response body.
+
+    Instead of parsing the whole body into one big list, bytes are fed in as
+    they arrive and every complete element of the "record" array is handed
+    back as soon as its closing brace is seen. Only the record being parsed
+    and the unread part of the current chunk are ever held in memory.
+
+    Accepts both shapes JSONbin can return:
+    - {"record": [...], "metadata": {...}}  (the default)
+    - [...]                                  (with metadata turned off)
+    """
+
+    def __init__(self, array_key: str = 'record'):
+        self.array_key = array_key
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buf = ''
+        self._pos = 0
+        self._state = _START
+        self._key: Optional[str] = None
+        self._in_records = False
+
+        # How many records and bytes went through the parser so far
+        self.records_seen = 0
+        self.bytes_seen = 0
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def _skip_ws(self) -> bool:
+        """Moves past whitespace; False if the buffer ran out."""
+        buf, pos = self._buf, self._pos
+        while pos < len(buf) and buf[pos] in ' \t\r\n':
+            pos += 1
+        self._pos = pos
+        return pos < len(buf)
+
+    def _decode_value(self, eof: bool) -> Any:
+        """Decodes one JSON value at the cursor; raises IndexError if more input is needed."""
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Malformed member data: truncated or invalid JSON")
+            raise IndexError
+        # A bare number at the very end of the buffer may still be growing
+        if end == len(self._buf) and not eof and not isinstance(value, (dict, list, str)):
+            raise IndexError
+        self._pos = end
+        return value
+
+    def _expect(self, allowed: str) -> str:
+        char = self._buf[self._pos]
+        if char not in allowed:
+            raise ValueError(f"Malformed member data: unexpected {char!r} at offset {self._pos}")
+        self._pos += 1
+        return char
+
+    def _parse(self, eof: bool = False) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        try:
+            while self._state != _DONE and self._skip_ws():
+                if self._state == _START:
+                    if self._expect('{[') == '[':
+                        self._state = _ARRAY
+                    else:
+                        self._state = _KEY
+                elif self._state in (_KEY, _NEXT_KEY):
+                    if self._buf[self._pos] == '}' and self._state == _KEY:
+                        self._pos += 1
+                        self._state = _DONE
+                    else:
+                        self._key = self._decode_value(eof)
+                        self._state = _COLON
+                elif self._state == _COLON:
+                    self._expect(':')
+                    self._state = _VALUE
+                elif self._state == _VALUE:
+                    if self._key == self.array_key:
+                        self._expect('[')
+                        self._state = _ARRAY
+                    else:
+                        # Metadata and other keys are small - decode and drop them
+                        self._decode_value(eof)
+                        self._state = _AFTER_VALUE
+                elif self._state == _AFTER_VALUE:
+                    self._state = _NEXT_KEY if self._expect(',}') == ',' else _DONE
+                elif self._state in (_ARRAY, _NEXT_ELEMENT):
+                    if self._buf[self._pos] == ']' and self._state == _ARRAY:
+                        self._pos += 1
+                        self._state = _AFTER_VALUE if self._key is not None else _DONE
+                    else:
+                        records.append(self._decode_value(eof))
+                        self.records_seen += 1
+                        self._state = _AFTER_ELEMENT
+                elif self._state == _AFTER_ELEMENT:
+                    if self._expect(',]') == ',':
+                        self._state = _NEXT_ELEMENT
+                    else:
+                        self._state = _AFTER_VALUE if self._key is not None else _DONE
+        except IndexError:
+            pass
+        # Drop what has been consumed so the buffer never grows past one record
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        return records
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """
+        Adds the next piece of the response body.
+
+        Returns:
+            The records completed by this chunk (possibly none)
+        """
+        self.bytes_seen += len(chunk)
+        self._buf += self._text.decode(chunk)
+        return self._parse()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Signals the end of the body.
+
+        Raises:
+            ValueError: If the body was not a complete record array
+        """
+        self._buf += self._text.decode(b'', final=True)
+        records = self._parse(eof=True)
+        if self._state != _DONE:
+            raise ValueError("Malformed member data: response ended before the record array was complete")
+        return records
+
+
+def iter_records(chunks: Iterable[bytes], stream: Optional[RecordStream] = None) -> Iterator[Dict[str, Any]]:
+    """Yields member records one by one from an iterable of body chunks."""
+    stream = stream or RecordStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+        if stream.done:
+            return
+    yield from stream.close()
+
+
+async def aiter_records(chunks: AsyncIterable[bytes], stream: Optional[RecordStream] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Async version of iter_records() for aiohttp response bodies."""
+    stream = stream or RecordStream()
+    async for chunk in chunks:
+        for record in stream.feed(chunk):
+            yield record
+        if stream.done:
+            return
+    for record in stream.close():
+        yield record
+
+
+class RecordPicker:
+    """
+    Keeps the records with the requested member IDs and says when all were found.
+
+    Args:
+        member_ids: The member IDs to pick out of the stream
+        expand: Optional callback returning more IDs to pick once a record
+            is picked (e.g. the child accounts of a primary member)
+    """
+
+    def __init__(self, member_ids: Iterable[str],
+                 expand: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None):
+        self.wanted: Set[str] = set(member_ids)
+        self.found: Dict[str, Dict[str, Any]] = {}
+        self.expand = expand
+
+    @property
+    def complete(self) -> bool:
+        return len(self.found) >= len(self.wanted)
+
+    def offer(self, record: Dict[str, Any]) -> bool:
+        """
+        Looks at one streamed record.
+
+        Returns:
+            True once every wanted record has been found, so streaming can stop
+        """
+        member_id = record.get('memberID')
+        if member_id in self.wanted and member_id not in self.found:
+            self.found[member_id] = record
+            if self.expand is not None:
+                self.wanted.update(self.expand(record))
+        return self.complete
@@ -0,0 +1,215 @@
+import json
+import zlib
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+
+# Helper functions for working with raw member records.
+# Shared by the synchronous and asynchronous connection managers so both
+# apply exactly the same rules to the data.
+
+# Key added to a returned record when it was served from a cache that is
+# past its TTL (while a refresh runs or while the backend is unavailable)
+STALE_FLAG = '_stale'
+
+# Key stored on a record listing the idempotency keys of the last updates
+# applied to it, so an update sent again (a retried write, a replayed
+# action) is recognised and not applied twice
+UPDATE_KEYS_FIELD = '_update_keys'
+UPDATE_KEYS_KEPT = 10
+
+# Every field the actions read from a member record
+MEMBER_FIELDS = ('memberID', 'name', 'dob', 'policyEndDate', 'has_child_accounts', 'child_accounts')
+
+# The fields of an account summary (child accounts, selected account)
+SUMMARY_FIELDS = ('memberID', 'name', 'dob', 'policyEndDate')
+
+
+def child_account_summary(child_record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extracts only the fields the actions need for a child account.
+
+    Args:
+        child_record: The complete member record of a dependent
+
+    Returns:
+        Dictionary with memberID, name, dob and policyEndDate
+    """
+    return {field: child_record[field] for field in SUMMARY_FIELDS}
+
+
+def ordered_summaries(summaries_by_id: Dict[str, Dict[str, Any]], member_ids: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Lists account summaries in a given order.
+
+    Args:
+        summaries_by_id: memberID -> record read with SUMMARY_FIELDS; these
+            are new dictionaries made for the caller, so they are handed on
+            as they are (without the stale marker) instead of being copied again
+        member_ids: The order to list them in; IDs without a record are skipped
+
+    Returns:
+        The summaries, in the order of member_ids
+    """
+    summaries = []
+    for member_id in member_ids:
+        summary = summaries_by_id.get(member_id)
+        if summary is not None:
+            summary.pop(STALE_FLAG, None)
+            summaries.append(summary)
+    return summaries
+
+
+def project_record(record: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """
+    Keeps only some fields of a member record.
+
+    Args:
+        record: A complete member record
+        fields: The fields to keep (None keeps the whole record). memberID
+            and the stale marker are always kept
+
+    Returns:
+        A new dictionary with the requested fields that exist in the record
+    """
+    if fields is None:
+        return record
+    projected = {field: record[field] for field in fields if field in record}
+    projected['memberID'] = record['memberID']
+    if STALE_FLAG in record:
+        projected[STALE_FLAG] = record[STALE_FLAG]
+    return projected
+
+
+def project_members(members: Dict[str, Dict[str, Any]],
+                    fields: Optional[Iterable[str]]) -> Dict[str, Dict[str, Any]]:
+    """Applies project_record() to every record of a memberID -> record dictionary."""
+    if fields is None:
+        return members
+    fields = tuple(fields)
+    return {member_id: project_record(record, fields) for member_id, record in members.items()}
+
+
+def parse_child_ids(child_ids_str: str) -> List[str]:
+    """
+    Splits a comma-separated string of child IDs into a clean list.
+
+    Args:
+        child_ids_str: Comma-separated member IDs (e.g., "C12345, C12346")
+
+    Returns:
+        List of IDs with surrounding whitespace removed
+    """
+    return [id.strip() for id in child_ids_str.split(',')]
+
+
+def build_household(primary_record: Dict[str, Any],
+                    members_by_id: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Assembles a primary member and its dependents into one household.
+
+    Args:
+        primary_record: The complete record of the primary member
+        members_by_id: Already-resolved records, keyed by memberID, that
+            include the primary's child accounts
+
+    Returns:
+        Dictionary with:
+        - primary: The complete primary member record
+        - child_accounts: Child account summaries, in the order listed on the primary
+    """
+    child_accounts = []
+    if primary_record.get('has_child_accounts') and primary_record.get('child_accounts'):
+        for child_id in parse_child_ids(primary_record['child_accounts']):
+            child_record = members_by_id.get(child_id)
+            if child_record:
+                child_accounts.append(child_account_summary(child_record))
+    return {'primary': primary_record, 'child_accounts': child_accounts}
+
+
+def household_member_ids(primary_record: Dict[str, Any]) -> List[str]:
+    """
+    Lists the member IDs that make up a primary member's household.
+
+    Args:
+        primary_record: The complete record of the primary member
+
+    Returns:
+        The primary member ID followed by its child account IDs
+    """
+    member_ids = [primary_record['memberID']]
+    if primary_record.get('has_child_accounts') and primary_record.get('child_accounts'):
+        member_ids.extend(parse_child_ids(primary_record['child_accounts']))
+    return member_ids
+
+
+def household_stamp(household: Dict[str, Any]) -> str:
+    """
+    Computes a short version stamp for a household.
+
+    The stamp changes whenever any field the actions use changes, for the
+    primary member or for one of its child accounts.
+
+    Args:
+        household: A household as returned by build_household()
+
+    Returns:
+        8 hexadecimal characters
+    """
+    members = [child_account_summary(household['primary'])] + list(household['child_accounts'])
+    data = json.dumps(members, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return format(zlib.crc32(data), '08x')
+
+
+def update_record(record: Dict[str, Any], data: Dict[str, Any], idempotency_key: Optional[str] = None) -> bool:
+    """
+    Applies a field update to one record, unless it was already applied.
+
+    Idempotency keys carried in the data itself (under UPDATE_KEYS_FIELD,
+    e.g. the keys of the updates a journal combined into one batch) are added
+    to the record's keys instead of replacing them.
+
+    Args:
+        record: The member record (modified in place)
+        data: Data fields to update
+        idempotency_key: Identifies the update; if the record already carries
+            it, the record is left as it is
+
+    Returns:
+        True if the record changed, False if the update had already been applied
+    """
+    keys = record.get(UPDATE_KEYS_FIELD) or []
+    if idempotency_key is not None and idempotency_key in keys:
+        return False
+    added = [key for key in data.get(UPDATE_KEYS_FIELD) or () if key not in keys]
+    if idempotency_key is not None:
+        added.append(idempotency_key)
+    record.update(data)
+    if added or UPDATE_KEYS_FIELD in data:
+        record[UPDATE_KEYS_FIELD] = (keys + added)[-UPDATE_KEYS_KEPT:]
+    return True
+
+
+def apply_member_updates(records: List[Dict[str, Any]], updates: Dict[str, Dict[str, Any]],
+                         idempotency_key: Optional[str] = None) -> Tuple[Dict[str, bool], int]:
+    """
+    Applies field updates for several members inside a full record list.
+
+    The record list is walked only once, whatever the number of updates.
+
+    Args:
+        records: The complete list of member records (modified in place)
+        updates: Dictionary of memberID -> data fields to update
+        idempotency_key: Identifies this batch of updates (see update_record)
+
+    Returns:
+        (memberID -> True if the member was found and updated, now or by an
+        earlier attempt with the same key; number of records changed)
+    """
+    applied = {member_id: False for member_id in updates}
+    changed = 0
+    for record in records:
+        data = updates.get(record['memberID'])
+        if data is not None:
+            # Update specified fields in the record
+            changed += update_record(record, data, idempotency_key)
+            applied[record['memberID']] = True
+    return applied, changed
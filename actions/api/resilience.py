@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional, Tuple, Type
+import logging
+
+from .backends.base import StorageError
+from .metrics import BREAKER_REJECTIONS, DEADLINES_EXCEEDED
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(StorageError):
+    """Raised instead of calling the backend while the circuit breaker is open."""
+
+
+class DeadlineExceededError(StorageError):
+    """Raised when a backend operation does not finish within its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a backend that keeps failing, so callers fail fast.
+
+    States:
+    - closed: calls go through; consecutive failures are counted
+    - open: after failure_threshold consecutive failures every call is
+      rejected immediately with CircuitOpenError for reset_timeout seconds
+    - half_open: after that pause a single trial call is let through;
+      success closes the circuit again, failure re-opens it
+
+    Errors listed in `ignore` say nothing about the backend's health (e.g.
+    our own rate limiter giving up on a queued request) - they are passed
+    on to the caller without counting as a failure or a success.
+
+    Safe to share between threads and coroutines.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 ignore: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.ignore = ignore
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _before_call(self) -> None:
+        """Raises CircuitOpenError if the call must not reach the backend."""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    BREAKER_REJECTIONS.inc(breaker=self.name)
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open - backend marked as degraded")
+                # Pause is over - let one trial call through
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    BREAKER_REJECTIONS.inc(breaker=self.name)
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open - trial call in progress")
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed - backend recovered")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def _release_trial(self) -> None:
+        """Ends a call without a verdict on the backend (ignored error or cancellation)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn() through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            Whatever fn() raises (which also counts as a failure, unless it is in `ignore`)
+        """
+        self._before_call()
+        try:
+            result = fn()
+        except self.ignore:
+            self._release_trial()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, coro_fn: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """
+        Awaits coro_fn() through the breaker, optionally bounded by a deadline.
+
+        Args:
+            coro_fn: Coroutine function to run
+            deadline: Maximum seconds for the whole operation (None = no limit)
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            DeadlineExceededError: If the deadline passes (counts as a failure)
+        """
+        self._before_call()
+        try:
+            result = await asyncio.wait_for(coro_fn(), timeout=deadline)
+        except asyncio.TimeoutError as e:
+            self.record_failure()
+            DEADLINES_EXCEEDED.inc(breaker=self.name)
+            raise DeadlineExceededError(f"'{self.name}' operation exceeded its {deadline}s deadline") from e
+        except self.ignore:
+            self._release_trial()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Cancelled by the caller - says nothing about the backend's health
+            self._release_trial()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,235 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Tuple
+import logging
+
+from .backends.base import StorageError
+from .metrics import Counter, Histogram
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Request priorities - lower goes first
+READ = 0    # interactive lookups a user is waiting on
+WRITE = 1   # updates (and the reads they are built on)
+PRIORITY_NAMES = {READ: "read", WRITE: "write"}
+
+# How often a queued request that is not first in line looks again
+POLL_INTERVAL = 0.01
+
+QUEUE_SECONDS = Histogram("member_store_queue_seconds", "Time requests waited in the backend request scheduler")
+THROTTLED = Counter("member_store_throttled_total", "Backend answers asking us to slow down (HTTP 429)")
+QUEUE_TIMEOUTS = Counter("member_store_queue_timeouts_total", "Requests given up after waiting too long in the scheduler")
+
+
+class RateLimitedError(StorageError):
+    """Raised when a request could not be sent within its wait budget because of rate limits."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Reads a Retry-After header.
+
+    Returns:
+        Seconds to wait (from a number of seconds or an HTTP date), or None if missing or unreadable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    Paces the requests sent to a rate-limited backend.
+
+    How it works:
+    - A token bucket holds up to `burst` requests and refills at `rate`
+      requests per second, matching the backend's quota, so bursts are
+      spread out on our side instead of being rejected by the backend
+    - Requests that have to wait queue by priority: interactive reads go
+      before writes, and requests of the same priority go first come,
+      first served
+    - When the backend answers HTTP 429 anyway, every request pauses for
+      the time given in Retry-After; without that header the pause starts
+      at one second and doubles while 429s keep coming, and resets after a
+      successful request
+    - A request that cannot be sent within its wait budget fails with
+      RateLimitedError rather than making the user wait indefinitely
+
+    A rate of 0 turns the bucket off; 429 answers are still honoured.
+    Safe to share between threads and coroutines.
+    """
+
+    def __init__(self, name: str, rate: float = 0.0, burst: Optional[float] = None,
+                 max_wait: float = 2.0, max_backoff: float = 60.0):
+        """
+        Args:
+            name: Name used in metrics and log messages
+            rate: Requests per second allowed by the backend (0 = no limit)
+            burst: Requests that may be sent at once after a quiet period
+                (defaults to one second's worth, at least 1)
+            max_wait: Default seconds a request may wait for its turn
+            max_backoff: Longest pause after repeated 429 answers without Retry-After
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst else max(1.0, rate)
+        self.max_wait = max_wait
+        self.max_backoff = max_backoff
+
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+
+        # No request is sent before this time (set by 429 answers)
+        self._paused_until = 0.0
+        # Current pause length for 429 answers without Retry-After
+        self._backoff = 0.0
+
+        # Queued requests as (priority, sequence number)
+        self._queue: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _take(self, now: float) -> float:
+        """Takes a token if one is available (lock held); returns 0, or seconds until one is."""
+        pause = self._paused_until - now
+        if pause > 0:
+            return pause
+        if self.rate > 0:
+            self._refill(now)
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        return 0.0
+
+    def _enter(self, priority: int) -> Optional[Tuple[int, int]]:
+        """Lets the request through straight away if nobody is queued; otherwise queues it."""
+        with self._lock:
+            if not self._queue and self._take(time.monotonic()) == 0:
+                return None
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._queue, ticket)
+            return ticket
+
+    def _poll(self, ticket: Tuple[int, int]) -> float:
+        """Sends the queued request if it is its turn; returns 0, or seconds to wait before asking again."""
+        with self._lock:
+            if self._queue[0] != ticket:
+                return max(POLL_INTERVAL, self._paused_until - time.monotonic())
+            wait = self._take(time.monotonic())
+            if wait == 0:
+                heapq.heappop(self._queue)
+            return wait
+
+    def _leave(self, ticket: Tuple[int, int]) -> None:
+        """Removes a request that gave up from the queue."""
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _give_up(self, priority: int, waited: float) -> RateLimitedError:
+        QUEUE_TIMEOUTS.inc(scheduler=self.name, priority=PRIORITY_NAMES.get(priority, priority))
+        return RateLimitedError(f"'{self.name}' is rate limited - request not sent after waiting {waited:.2f}s")
+
+    def acquire(self, priority: int = READ, max_wait: Optional[float] = None) -> None:
+        """
+        Blocks until the request may be sent.
+
+        Args:
+            priority: READ or WRITE
+            max_wait: Seconds the request may wait (defaults to the scheduler's max_wait)
+
+        Raises:
+            RateLimitedError: If the request's turn would come after max_wait
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        ticket = self._enter(priority)
+        if ticket is None:
+            return
+        try:
+            while True:
+                wait = self._poll(ticket)
+                if wait == 0:
+                    ticket = None
+                    break
+                waited = time.monotonic() - started
+                if waited + wait > max_wait and wait > POLL_INTERVAL:
+                    raise self._give_up(priority, waited)
+                time.sleep(min(wait, max(max_wait - waited, POLL_INTERVAL)))
+        finally:
+            if ticket is not None:
+                self._leave(ticket)
+        QUEUE_SECONDS.observe(time.monotonic() - started, scheduler=self.name,
+                              priority=PRIORITY_NAMES.get(priority, priority))
+
+    async def aacquire(self, priority: int = READ, max_wait: Optional[float] = None) -> None:
+        """Non-blocking version of acquire()."""
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = time.monotonic()
+        ticket = self._enter(priority)
+        if ticket is None:
+            return
+        try:
+            while True:
+                wait = self._poll(ticket)
+                if wait == 0:
+                    ticket = None
+                    break
+                waited = time.monotonic() - started
+                if waited + wait > max_wait and wait > POLL_INTERVAL:
+                    raise self._give_up(priority, waited)
+                await asyncio.sleep(min(wait, max(max_wait - waited, POLL_INTERVAL)))
+        finally:
+            # Also runs when the caller is cancelled, so the queue never keeps dead entries
+            if ticket is not None:
+                self._leave(ticket)
+        QUEUE_SECONDS.observe(time.monotonic() - started, scheduler=self.name,
+                              priority=PRIORITY_NAMES.get(priority, priority))
+
+    def throttled(self, retry_after: Optional[str] = None) -> float:
+        """
+        Records an HTTP 429 answer and pauses all requests.
+
+        Args:
+            retry_after: The answer's Retry-After header, if any
+
+        Returns:
+            Seconds every request now waits
+        """
+        delay = parse_retry_after(retry_after)
+        with self._lock:
+            if delay is None:
+                self._backoff = min(self.max_backoff, self._backoff * 2 if self._backoff else 1.0)
+                delay = self._backoff
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + delay)
+            # The backend's count is ahead of ours - start the bucket over
+            self._tokens = 0.0
+            self._refilled_at = now
+        THROTTLED.inc(scheduler=self.name)
+        logger.warning(f"'{self.name}' answered HTTP 429 - pausing requests for {delay:.1f}s")
+        return delay
+
+    def record_success(self) -> None:
+        """Resets the adaptive pause after a request that was not throttled."""
+        if self._backoff:
+            with self._lock:
+                self._backoff = 0.0
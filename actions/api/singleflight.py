@@ -0,0 +1,119 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import logging
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one.
+
+    When many conversations ask for the same data at the same moment, only
+    the first caller (the "leader") does the work; everyone else arriving
+    while it is still running waits for the leader and receives the very
+    same result (or exception). Once the call finishes, the next caller
+    starts a new flight.
+
+    Works for both kinds of callers, even mixed together:
+    - do(): for threads (blocks until the result is ready)
+    - ado(): for asyncio coroutines (awaits without blocking the event loop)
+
+    An asyncio flight runs as a task of its own, so a caller that is
+    cancelled (e.g. a conversation whose client gave up) stops waiting
+    without cancelling the work the other callers are waiting for.
+    """
+
+    def __init__(self):
+        # key -> Future of the call currently in flight for that key
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        # Number of callers that were served by someone else's flight
+        self.coalesced_count = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        """Checks whether a call for this key is currently running."""
+        with self._lock:
+            return key in self._flights
+
+    def _join_or_lead(self, key: Hashable) -> Tuple[Future, bool]:
+        """Returns the flight for this key and whether the caller must run it."""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.coalesced_count += 1
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            return future, True
+
+    def _land(self, key: Hashable, future: Future) -> None:
+        """Removes a finished flight so the next caller starts a fresh one."""
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn() once for all threads calling with the same key at the same time.
+
+        Args:
+            key: Identifies identical calls (e.g. "records" for a full dataset fetch)
+            fn: The work to do; its result is shared by every waiter
+
+        Returns:
+            The result of the single fn() call
+        """
+        future, is_leader = self._join_or_lead(key)
+        if not is_leader:
+            logger.debug("Joined in-flight call for %s", key)
+            return future.result()
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            self._land(key, future)
+        return future.result()
+
+    def _settle(self, key: Hashable, future: Future, task: "asyncio.Task") -> None:
+        """Hands the outcome of a finished asyncio flight to everyone waiting for it."""
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+        self._land(key, future)
+
+    async def ado(self, key: Hashable, coro_fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits coro_fn() once for all callers using the same key at the same time.
+
+        How it works:
+        1. The first caller starts coro_fn() as a separate task
+        2. Every caller, the first one included, waits for that task through
+           a shield: cancelling one caller only stops that caller's wait
+        3. When the task finishes, its result (or exception) goes to all of them
+
+        Args:
+            key: Identifies identical calls (e.g. "records" for a full dataset fetch)
+            coro_fn: Coroutine function doing the work; its result is shared by every waiter
+
+        Returns:
+            The result of the single coro_fn() call
+        """
+        future, is_leader = self._join_or_lead(key)
+        if not is_leader:
+            logger.debug("Joined in-flight call for %s", key)
+            # wrap_future() would cancel the shared future along with this caller
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        task = asyncio.ensure_future(coro_fn())
+        task.add_done_callback(lambda done: self._settle(key, future, done))
+        return await asyncio.shield(task)
@@ -0,0 +1,172 @@
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+import logging
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# File layout of a member snapshot (all integers little-endian):
+#
+#   header   magic, format version, record count, ID width, metadata length,
+#            creation time
+#   metadata JSON object (source version markers, ...)
+#   ID table one entry per member, sorted by memberID:
+#            memberID (UTF-8, zero-padded to the ID width) + record offset
+#            and length
+#   records  one JSON record per member, back to back
+#
+# Table entries have a fixed width, so a lookup is a binary search over the
+# ID table and one slice of the records area - straight from the
+# memory-mapped file, without loading anything up front. Records take only
+# their own length: one member with a long household list does not widen
+# every other record.
+MAGIC = b"MBRSNAP1"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sIIIId")
+LOCATION = struct.Struct("<QI")
+
+
+def _align(position: int, boundary: int = 8) -> int:
+    return (position + boundary - 1) // boundary * boundary
+
+
+def write_snapshot(path: str, records: Iterable[Dict[str, Any]], meta: Optional[Dict[str, Any]] = None,
+                   created_at: Optional[float] = None) -> int:
+    """
+    Writes member records to a snapshot file, atomically replacing any previous one.
+
+    How it works:
+    1. Encodes every record as compact JSON and sorts the member IDs
+    2. Writes header, metadata, ID table and records to a temporary file
+       next to the target and flushes it to disk
+    3. Renames it over the target in one step, so readers only ever see a
+       complete old snapshot or a complete new one
+
+    Args:
+        path: Snapshot file to write
+        records: The member records (keyed by their memberID)
+        meta: Extra information stored with the data (e.g. the source's version markers)
+        created_at: Time the data was read from its source (defaults to now)
+
+    Returns:
+        Number of records written
+    """
+    created_at = time.time() if created_at is None else created_at
+    encoded = {}
+    for record in records:
+        encoded[record['memberID'].encode('utf-8')] = json.dumps(record, separators=(',', ':')).encode('utf-8')
+    member_ids = sorted(encoded)
+    id_width = max((len(member_id) for member_id in member_ids), default=1)
+    meta_bytes = json.dumps(meta or {}).encode('utf-8')
+
+    table_offset = _align(HEADER.size + len(meta_bytes))
+    entry_width = id_width + LOCATION.size
+    records_offset = _align(table_offset + entry_width * len(member_ids))
+
+    table = []
+    offset = records_offset
+    for member_id in member_ids:
+        length = len(encoded[member_id])
+        table.append(member_id.ljust(id_width, b'\0') + LOCATION.pack(offset, length))
+        offset += length
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(member_ids), id_width, len(meta_bytes), created_at))
+            f.write(meta_bytes)
+            f.write(b'\0' * (table_offset - f.tell()))
+            f.write(b''.join(table))
+            f.write(b'\0' * (records_offset - f.tell()))
+            f.write(b''.join(encoded[member_id] for member_id in member_ids))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(member_ids)
+
+
+class MemberSnapshot:
+    """
+    Read-only view of a snapshot file, memory-mapped.
+
+    The file is never read into Python objects as a whole: the operating
+    system pages in only the parts lookups touch, and every process mapping
+    the same file shares those pages. A hundred workers cost about as much
+    memory as one.
+
+    Raises ValueError if the file is not a member snapshot.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            # The mapping stays valid after the file is closed (or replaced on disk)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else None
+        # Identifies this exact file, so a swapped-in replacement can be detected
+        self.file_id: Tuple[int, int] = (stat.st_ino, stat.st_mtime_ns)
+        if self._mm is None or stat.st_size < HEADER.size:
+            raise ValueError(f"{path} is not a member snapshot (file too small)")
+
+        magic, version, self.count, self.id_width, meta_length, self.created_at = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a member snapshot (format {magic!r} v{version})")
+        self.meta: Dict[str, Any] = json.loads(self._mm[HEADER.size:HEADER.size + meta_length])
+        self._table_offset = _align(HEADER.size + meta_length)
+        self._entry_width = self.id_width + LOCATION.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def age(self) -> float:
+        """Seconds since the snapshot's data was read from its source."""
+        return time.time() - self.created_at
+
+    def _entry_id(self, index: int) -> bytes:
+        start = self._table_offset + index * self._entry_width
+        return self._mm[start:start + self.id_width]
+
+    def _record_at(self, index: int) -> Dict[str, Any]:
+        offset, length = LOCATION.unpack_from(self._mm, self._table_offset + index * self._entry_width + self.id_width)
+        return json.loads(self._mm[offset:offset + length])
+
+    def _find(self, member_id: str) -> int:
+        """Binary search of the ID table; returns the entry index or -1."""
+        key = member_id.encode('utf-8')
+        if len(key) > self.id_width:
+            return -1
+        key = key.ljust(self.id_width, b'\0')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry_id(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.count and self._entry_id(low) == key else -1
+
+    def get(self, member_id: str) -> Optional[Dict[str, Any]]:
+        """Looks up one member; returns a new record dictionary or None."""
+        index = self._find(member_id)
+        return self._record_at(index) if index >= 0 else None
+
+    def get_many(self, member_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Looks up several members; returns memberID -> record for those found."""
+        found = {}
+        for member_id in set(member_ids):
+            index = self._find(member_id)
+            if index >= 0:
+                found[member_id] = self._record_at(index)
+        return found
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Iterates over every record, in memberID order."""
+        for index in range(self.count):
+            yield self._record_at(index)
@@ -0,0 +1,269 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from .metrics import ActionUsage, add_action_observer
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# File the action server appends the per-turn log to; unset means no log
+TURN_LOG_PATH = os.environ.get("ACTION_TURN_LOG")
+
+# The e2e runner gives each test case's conversation a unique sender ID made
+# of the test case name and a run suffix (timestamp or random hex); the
+# report groups by the name
+SENDER_SUFFIX = re.compile(r"[_-](?:\d[\d_:.\-T]*|[0-9a-f]{8,})$")
+
+# Report columns, in CSV order
+REPORT_FIELDS = ("test_case", "flow_id", "step_id", "action", "runs", "errors",
+                 "mean_ms", "max_ms", "backend_requests", "bytes_in", "bytes_out")
+DIFF_FIELDS = ("baseline_mean_ms", "baseline_backend_requests", "baseline_bytes_in", "status")
+
+
+def flow_step(tracker: Any) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Finds the flow and step an action runs in.
+
+    Uses the top user flow on the tracker's dialogue stack; Rasa's own
+    pattern flows (e.g. collecting a slot) only count if no user flow is
+    active.
+
+    Returns:
+        (flow ID, step ID), or (None, None) outside flows
+    """
+    pattern = (None, None)
+    for frame in reversed(getattr(tracker, "stack", None) or []):
+        flow_id = frame.get("flow_id")
+        if not flow_id:
+            continue
+        if not flow_id.startswith("pattern_"):
+            return flow_id, frame.get("step_id")
+        if pattern[0] is None:
+            pattern = (flow_id, frame.get("step_id"))
+    return pattern
+
+
+class TurnLog:
+    """
+    Appends one JSON line per action run to a file.
+
+    Lines are written as soon as the run ends, so the log is complete even
+    if the action server is stopped abruptly at the end of a test run.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def __call__(self, action_name: str, tracker: Any, seconds: float, usage: ActionUsage, ok: bool) -> None:
+        flow_id, step_id = flow_step(tracker)
+        line = json.dumps({
+            "time": time.time(),
+            "sender_id": getattr(tracker, "sender_id", None),
+            "flow_id": flow_id,
+            "step_id": step_id,
+            "action": action_name,
+            "seconds": seconds,
+            "backend_requests": usage.backend_requests,
+            "bytes_in": usage.bytes_in,
+            "bytes_out": usage.bytes_out,
+            "ok": ok,
+        })
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_turn_log: Optional[TurnLog] = None
+
+
+def start_turn_log_from_env() -> Optional[TurnLog]:
+    """Starts logging every action run if ACTION_TURN_LOG is set; never raises."""
+    global _turn_log
+    if not TURN_LOG_PATH or _turn_log is not None:
+        return _turn_log
+    try:
+        _turn_log = TurnLog(TURN_LOG_PATH)
+        add_action_observer(_turn_log)
+        logger.info(f"Logging action timings and backend traffic to {TURN_LOG_PATH}")
+    except Exception as e:
+        logger.error(f"Could not open the turn log {TURN_LOG_PATH}: {e}")
+    return _turn_log
+
+
+def read_turn_log(path: str) -> List[Dict[str, Any]]:
+    """Reads a turn log, skipping lines that are not complete JSON records."""
+    turns = []
+    with open(path) as f:
+        for line in f:
+            try:
+                turns.append(json.loads(line))
+            except ValueError:
+                continue
+    return turns
+
+
+def test_case_name(sender_id: Optional[str]) -> str:
+    """The e2e test case a conversation belongs to (its sender ID without the run suffix)."""
+    return SENDER_SUFFIX.sub("", sender_id or "") or (sender_id or "")
+
+
+def summarize(turns: Iterable[Dict[str, Any]], keep_sender_ids: bool = False) -> List[Dict[str, Any]]:
+    """
+    Adds up the logged action runs per test case, flow step and action.
+
+    Args:
+        turns: Records from read_turn_log()
+        keep_sender_ids: Group by the raw sender ID instead of the test case name
+
+    Returns:
+        One report row per (test case, flow, step, action), sorted
+    """
+    groups: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+    for turn in turns:
+        test_case = (turn.get("sender_id") or "") if keep_sender_ids else test_case_name(turn.get("sender_id"))
+        key = (test_case, turn.get("flow_id") or "", turn.get("step_id") or "", turn.get("action") or "")
+        row = groups.get(key)
+        if row is None:
+            row = groups[key] = dict(zip(("test_case", "flow_id", "step_id", "action"), key),
+                                     runs=0, errors=0, total_ms=0.0, max_ms=0.0,
+                                     backend_requests=0, bytes_in=0, bytes_out=0)
+        milliseconds = turn.get("seconds", 0.0) * 1000
+        row["runs"] += 1
+        row["errors"] += 0 if turn.get("ok", True) else 1
+        row["total_ms"] += milliseconds
+        row["max_ms"] = max(row["max_ms"], milliseconds)
+        for field in ("backend_requests", "bytes_in", "bytes_out"):
+            row[field] += turn.get(field, 0)
+
+    rows = []
+    for key in sorted(groups):
+        row = groups[key]
+        row["mean_ms"] = row.pop("total_ms") / row["runs"]
+        rows.append({field: row[field] for field in REPORT_FIELDS})
+    return rows
+
+
+def _row_key(row: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    return row["test_case"], row["flow_id"], row["step_id"], row["action"]
+
+
+def compare(rows: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            threshold: float = 0.25, min_ms: float = 2.0) -> List[Dict[str, Any]]:
+    """
+    Compares a report with a baseline report.
+
+    A row regresses if its mean time grew by more than `threshold` (and by
+    at least `min_ms`, so sub-millisecond noise is ignored), or if it needed
+    more backend requests or more than `threshold` more bytes per run.
+
+    Returns:
+        The report rows with the baseline's values and a status added
+        ("ok", "slower", "more requests", "more bytes", "new"), followed by
+        rows only the baseline has ("missing")
+    """
+    baseline_by_key = {_row_key(row): row for row in baseline}
+    compared = []
+    for row in rows:
+        base = baseline_by_key.pop(_row_key(row), None)
+        row = dict(row)
+        if base is None:
+            row.update(baseline_mean_ms=None, baseline_backend_requests=None, baseline_bytes_in=None, status="new")
+            compared.append(row)
+            continue
+        problems = []
+        if row["mean_ms"] > base["mean_ms"] * (1 + threshold) and row["mean_ms"] - base["mean_ms"] >= min_ms:
+            problems.append("slower")
+        if row["backend_requests"] / row["runs"] > base["backend_requests"] / base["runs"]:
+            problems.append("more requests")
+        if row["bytes_in"] / row["runs"] > base["bytes_in"] / base["runs"] * (1 + threshold):
+            problems.append("more bytes")
+        row.update(baseline_mean_ms=base["mean_ms"], baseline_backend_requests=base["backend_requests"],
+                   baseline_bytes_in=base["bytes_in"], status=", ".join(problems) or "ok")
+        compared.append(row)
+    for base in baseline_by_key.values():
+        row = {field: base.get(field) for field in REPORT_FIELDS}
+        row.update(runs=0, baseline_mean_ms=base["mean_ms"], baseline_backend_requests=base["backend_requests"],
+                   baseline_bytes_in=base["bytes_in"], status="missing")
+        compared.append(row)
+    return compared
+
+
+def regressions(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The compared rows that got slower or heavier."""
+    return [row for row in rows if row.get("status") not in (None, "ok", "new", "missing")]
+
+
+def write_csv(path: str, rows: List[Dict[str, Any]]) -> None:
+    fields = REPORT_FIELDS + (DIFF_FIELDS if rows and "status" in rows[0] else ())
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_report(rows: List[Dict[str, Any]]) -> None:
+    diffing = bool(rows) and "status" in rows[0]
+    header = (f"{'test case':28} {'flow':16} {'step':28} {'action':30} {'runs':>5} {'mean ms':>8} "
+              f"{'reqs':>5} {'KB in':>8}" + (f" {'base ms':>8}  status" if diffing else ""))
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        line = (f"{row['test_case'][:28]:28} {row['flow_id'][:16]:16} {row['step_id'][:28]:28} "
+                f"{row['action'][:30]:30} {row['runs']:5d} {row['mean_ms'] or 0:8.2f} "
+                f"{row['backend_requests'] or 0:5d} {(row['bytes_in'] or 0) / 1024:8.1f}")
+        if diffing:
+            base_ms = row["baseline_mean_ms"]
+            line += f" {base_ms:8.2f}" if base_ms is not None else f" {'-':>8}"
+            line += f"  {row['status']}"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report action timings and backend traffic per e2e flow step")
+    parser.add_argument("log", help="turn log written by the action server (ACTION_TURN_LOG)")
+    parser.add_argument("--csv", help="write the report to this CSV file")
+    parser.add_argument("--json", help="write the report to this JSON file (usable as a later baseline)")
+    parser.add_argument("--baseline", help="compare with a report saved earlier with --json")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative growth in time or bytes counted as a regression (default 0.25)")
+    parser.add_argument("--min-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 if anything regressed")
+    parser.add_argument("--keep-sender-ids", action="store_true", help="group by raw sender ID, not test case name")
+    args = parser.parse_args()
+
+    rows = summarize(read_turn_log(args.log), args.keep_sender_ids)
+    if args.json:
+        # Saved before the comparison, so the file can serve as the next baseline as it is
+        with open(args.json, "w") as f:
+            json.dump({"generated_at": time.time(), "source": args.log, "rows": rows}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(rows, json.load(f)["rows"], args.threshold, args.min_ms)
+    if args.csv:
+        write_csv(args.csv, rows)
+    print_report(rows)
+
+    slower = regressions(rows)
+    if slower:
+        print(f"\n{len(slower)} of {len(rows)} steps regressed against {args.baseline}", file=sys.stderr)
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    main()
@@ -1,13 +1,26 @@
-from typing import Any, Text, Dict, List
+from typing import Any, Text, Dict, List, Optional
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 import logging
-from ..api.connection_manager import ConnectionManager
+from ..api.async_connection_manager import get_async_connection_manager
+from ..api.records import STALE_FLAG, SUMMARY_FIELDS, household_stamp
+from ..api.metrics import instrument_action
+from ..session_state import (
+    COMPACT_SESSION_STATE,
+    HOUSEHOLD_HANDLE_SLOT,
+    SELECTION_CHECK,
+    check_selection,
+    household_version_events,
+    make_household_handle,
+    resolve_household,
+    session_household_stamp,
+)
 
 # Set up logging for this module
 logger = logging.getLogger(__name__)
 
+@instrument_action
 class AuthenticateUserAction(Action):
     """
     Action to authenticate a user with their member ID.
@@ -17,25 +30,35 @@ class AuthenticateUserAction(Action):
     2. Checks if it exists in our database
     3. If found, stores all relevant member information in slots
     4. Sets up both primary account and initial selected account (same at first)
+
+    With COMPACT_SESSION_STATE enabled, only the slots the flows test are
+    filled in; the household is kept as a short handle instead of a list of
+    child account records.
     """
     
     def name(self) -> Text:
         # The name used to call this action from rules/stories
         return "authenticate_user_action"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Retrieve member ID from conversation slot
         member_id = tracker.get_slot("member_id")
-        logger.info(f"Authenticating user with member ID: {member_id}")
+        logger.debug("Authenticating user with member ID: %s", member_id)
         
-        # Initialize connection manager and get member data from the database
-        conn_manager = ConnectionManager()
-        member_record = conn_manager.get_member_data(member_id)
+        # Use the shared connection manager and get the member and all child
+        # accounts from the database in a single read
+        conn_manager = get_async_connection_manager()
+        household = await conn_manager.get_household(member_id)
         
-        if member_record:
+        if household:
+            member_record = household['primary']
+
+            if COMPACT_SESSION_STATE:
+                return self._compact_events(household)
+
             # Member found in database - store primary account details
             # These details are preserved throughout the entire session
             events = [
@@ -60,11 +83,15 @@ class AuthenticateUserAction(Action):
                 SlotSet("selected_policy_end_date", member_record['policyEndDate'])
             ])
 
-            # If this member has child accounts (like dependents), retrieve them
+            # If this member has child accounts (like dependents), store their details
+            # These were already resolved together with the primary record
             if member_record['has_child_accounts'] and member_record['child_accounts']:
-                # Get additional details for each child account
-                child_details = conn_manager.get_child_account_details(member_record['child_accounts'])
-                events.append(SlotSet("child_accounts", child_details))
+                events.append(SlotSet("child_accounts", household['child_accounts']))
+            
+            # Version stamp of the household, so account selections can be
+            # confirmed without reading the account again
+            if SELECTION_CHECK == "stamp":
+                events.append(SlotSet("household_version", household_stamp(household)))
             
             return events
         
@@ -72,7 +99,30 @@ class AuthenticateUserAction(Action):
         logger.warning(f"Member ID not found: {member_id}")
         return [SlotSet("member_found", False)]
 
+    @staticmethod
+    def _compact_events(household: Dict[str, Any]) -> List[Dict[Text, Any]]:
+        """
+        Slot events for compact session state.
+
+        Keeps member IDs, the household handle and the few values the flows
+        compare against (DOB check, policy end date, selected name). Names and
+        child account details are looked up again when an action needs them.
+        """
+        member_record = household['primary']
+        return [
+            SlotSet("member_found", True),
+            SlotSet("member_dob", member_record['dob']),
+            SlotSet("has_child_accounts", member_record['has_child_accounts']),
+            SlotSet("primary_account_memberID", member_record['memberID']),
+            SlotSet(HOUSEHOLD_HANDLE_SLOT, make_household_handle(household)),
+            SlotSet("selected_account_id", member_record['memberID']),
+            SlotSet("working_selected_account_id", member_record['memberID']),
+            SlotSet("selected_account_name", member_record['name']),
+            SlotSet("selected_policy_end_date", member_record['policyEndDate'])
+        ]
 
+
+@instrument_action
 class AuthSuccessful(Action):
     """
     Action to mark authentication as successful.
@@ -90,10 +140,11 @@ class AuthSuccessful(Action):
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Log successful authentication and update the status slot
-        logger.info("Authentication successful")
+        logger.debug("Authentication successful")
         return [SlotSet("auth_status", True)]
 
 
+@instrument_action
 class ActionAskSelectedAccountId(Action):
     """
     Action to display account selection options as buttons.
@@ -103,15 +154,22 @@ class ActionAskSelectedAccountId(Action):
     2. Creates interactive buttons for each account
     3. Displays them to the user for selection
     4. Uses the permanent primary_account_memberID for reliability
+
+    With COMPACT_SESSION_STATE enabled, the accounts are resolved from the
+    household handle and each button only sets the selected account ID -
+    action_track_selected_account fills in the rest.
     """
     
     def name(self) -> Text:
         return "action_ask_selected_account_id"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
+        if COMPACT_SESSION_STATE and tracker.get_slot(HOUSEHOLD_HANDLE_SLOT):
+            return await self._ask_compact(dispatcher, tracker)
+
         # Get the main account and child accounts from slots
         member_name = tracker.get_slot("member_name")
         member_id = tracker.get_slot("member_id")
@@ -125,30 +183,32 @@ class ActionAskSelectedAccountId(Action):
         primary_account_memberID = tracker.get_slot("primary_account_memberID")
         
         # Log account details and current selection state for debugging
-        logger.info(f"Primary account ID (permanent reference): {primary_account_memberID}")
-        logger.info(f"Current selected account: {selected_account_id}")
+        logger.debug("Primary account ID (permanent reference): %s", primary_account_memberID)
+        logger.debug("Current selected account: %s", selected_account_id)
         
         # RECOVERY MECHANISM:
         # If primary account details are missing, use the permanent reference to retrieve them
         if primary_account_memberID and (not member_id or not member_name):
-            logger.info(f"Using permanent reference to retrieve primary account: {primary_account_memberID}")
+            logger.debug("Using permanent reference to retrieve primary account: %s", primary_account_memberID)
             
-            # Make a targeted API call for just this specific member
-            conn_manager = ConnectionManager()
-            primary_account = conn_manager.get_member_data(primary_account_memberID)
+            # Retrieve this specific member together with its child accounts
+            conn_manager = get_async_connection_manager()
+            household = await conn_manager.get_household(primary_account_memberID)
             
-            if primary_account:
+            if household:
+                primary_account = household['primary']
+
                 # Use the retrieved data to restore primary account information
                 member_id = primary_account.get('memberID')
                 member_name = primary_account.get('name')
                 member_dob = primary_account.get('dob')
                 policy_end_date = primary_account.get('policyEndDate')
-                logger.info(f"Recovered primary account using permanent ID: {member_name} ({member_id})")
+                logger.debug("Recovered primary account using permanent ID: %s (%s)", member_name, member_id)
                 
                 # If child accounts are also missing, restore them too
-                if not child_accounts and primary_account.get('has_child_accounts') and primary_account.get('child_accounts'):
-                    child_accounts = conn_manager.get_child_account_details(primary_account['child_accounts'])
-                    logger.info(f"Restored {len(child_accounts)} child accounts")
+                if not child_accounts and household['child_accounts']:
+                    child_accounts = household['child_accounts']
+                    logger.debug("Restored %s child accounts", len(child_accounts))
             else:
                 logger.warning(f"Failed to recover primary account using permanent ID: {primary_account_memberID}")
         
@@ -162,7 +222,7 @@ class ActionAskSelectedAccountId(Action):
                 "title": f"{member_name} (Primary)",
                 "payload": f"/SetSlots(selected_account_id={member_id}, working_selected_account_id={member_id}, selected_account_name={member_name}, selected_account_dob={member_dob}, selected_policy_end_date={policy_end_date})"
             })
-            logger.info(f"Added primary account button with ID: {member_id}")
+            logger.debug("Added primary account button with ID: %s", member_id)
         else:
             # This is a serious issue as primary account should always be available
             logger.warning("Missing primary account details - may cause issues")
@@ -176,7 +236,7 @@ class ActionAskSelectedAccountId(Action):
                     "title": f"{account_name}",
                     "payload": f"/SetSlots(selected_account_id={account_id}, working_selected_account_id={account_id}, selected_account_name={account['name']}, selected_account_dob={account['dob']}, selected_policy_end_date={account['policyEndDate']})"
                 })
-                logger.info(f"Added child account button: {account_name} with ID: {account_id}")
+                logger.debug("Added child account button: %s with ID: %s", account_name, account_id)
         
         # Display the account selection buttons to the user
         dispatcher.utter_message(
@@ -187,7 +247,32 @@ class ActionAskSelectedAccountId(Action):
         # No slot changes needed from this action
         return []
 
+    async def _ask_compact(self, dispatcher: CollectingDispatcher, tracker: Tracker) -> List[Dict[Text, Any]]:
+        """Shows the account buttons in compact mode, with ID-only payloads."""
+        household = await resolve_household(tracker)
+        if household is None:
+            logger.warning(f"Could not resolve household {tracker.get_slot(HOUSEHOLD_HANDLE_SLOT)} for account selection")
+            dispatcher.utter_message(text="Please select which account you'd like to work with:", buttons=[])
+            return []
+
+        primary_account = household['primary']
+        accounts = [(primary_account['memberID'], f"{primary_account['name']} (Primary)")]
+        accounts.extend((child['memberID'], child['name']) for child in household['child_accounts'])
+
+        buttons = [
+            {"title": title, "payload": f"/SetSlots(selected_account_id={account_id})"}
+            for account_id, title in accounts
+        ]
+        logger.debug("Added %s account buttons for household %s", len(buttons), tracker.get_slot(HOUSEHOLD_HANDLE_SLOT))
+
+        dispatcher.utter_message(
+            text="Please select which account you'd like to work with:",
+            buttons=buttons
+        )
+        return []
+
 
+@instrument_action
 class ActionClearSelectedAccount(Action):
     """
     Action to clear the selected account for re-selection.
@@ -210,8 +295,8 @@ class ActionClearSelectedAccount(Action):
         member_name = tracker.get_slot("member_name")
         primary_account_memberID = tracker.get_slot("primary_account_memberID")
         
-        logger.info(f"Clearing selected account while preserving primary account: {member_name} ({member_id})")
-        logger.info(f"Permanent primary account reference preserved: {primary_account_memberID}")
+        logger.debug("Clearing selected account while preserving primary account: %s (%s)", member_name, member_id)
+        logger.debug("Permanent primary account reference preserved: %s", primary_account_memberID)
         
         # IMPORTANT: Only clear the selected account details
         # The primary authentication information (member_id, primary_account_memberID, etc.) stays intact
@@ -224,6 +309,7 @@ class ActionClearSelectedAccount(Action):
         ]
 
 
+@instrument_action
 class ActionTrackSelectedAccount(Action):
     """
     Action to track and confirm the selected account.
@@ -235,36 +321,51 @@ class ActionTrackSelectedAccount(Action):
     4. Provides a confirmation to the user
     
     This is a safety mechanism to ensure account data is accurate after selection.
+
+    With ACCOUNT_SELECTION_CHECK=stamp, step 2 is skipped whenever the backend
+    holds a current local copy of the session's household: the selection is
+    checked against it, and the household's version stamp tells whether the
+    session's copy of the accounts is still up to date.
     """
     
     def name(self) -> Text:
         return "action_track_selected_account"
 
-    def run(self, dispatcher: CollectingDispatcher,
-            tracker: Tracker,
-            domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
+    async def run(self, dispatcher: CollectingDispatcher,
+                  tracker: Tracker,
+                  domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Get the selected account ID from slots
         selected_account_id = tracker.get_slot("selected_account_id")
         primary_account_memberID = tracker.get_slot("primary_account_memberID")
         
-        logger.info(f"Processing account selection for ID: {selected_account_id}")
-        logger.info(f"Permanent primary account reference: {primary_account_memberID}")
+        logger.debug("Processing account selection for ID: %s", selected_account_id)
+        logger.debug("Permanent primary account reference: %s", primary_account_memberID)
         
         # Safety check - make sure we have an account ID
         if not selected_account_id:
             logger.warning("No account ID selected")
             return []
         
+        # LOCAL CHECK:
+        # Confirm the selection against the session's household without a network call
+        if SELECTION_CHECK == "stamp":
+            events = await self._confirm_locally(tracker, selected_account_id)
+            if events is not None:
+                return events
+        
         # VERIFICATION STEP:
         # Make a direct API call to get fresh account data
         # This ensures we're working with accurate information
-        conn_manager = ConnectionManager()
-        account_data = conn_manager.get_member_data(selected_account_id)
+        conn_manager = get_async_connection_manager()
+        account_data = await conn_manager.get_member_data(selected_account_id, SUMMARY_FIELDS)
         
         if account_data:
             # Account data successfully retrieved from API
-            logger.info(f"Account selection confirmed: {account_data['name']} ({selected_account_id})")
+            # (possibly from cache past its TTL while the backend is refreshing or degraded)
+            if account_data.get(STALE_FLAG):
+                logger.warning(f"Using cached account data for ID: {selected_account_id} (refresh pending)")
+            logger.debug("Account selection confirmed: %s (%s)", account_data['name'], selected_account_id)
             
             # Set all the slots explicitly to ensure they have the correct values
             # This handles any potential discrepancies between button payload and actual data
@@ -277,15 +378,46 @@ class ActionTrackSelectedAccount(Action):
             ]
         
         # FALLBACK MECHANISM:
-        # If API call fails, try using the values from the tracker
+        # The data layer already serves stale cached records when the backend is slow
+        # or down, so we only get here if it has nothing at all for this account
+        # In that case, try using the values from the tracker
         logger.warning(f"Could not get account data from API for ID: {selected_account_id}")
         selected_account_name = tracker.get_slot("selected_account_name")
         
+        # Compact buttons only carry the ID, so the name slot still describes
+        # the previously selected account unless the selection did not change
+        if COMPACT_SESSION_STATE and tracker.get_slot("working_selected_account_id") != selected_account_id:
+            selected_account_name = None
+        
         if selected_account_name:
-            logger.info(f"Using existing slot values for account: {selected_account_name}")
+            logger.debug("Using existing slot values for account: %s", selected_account_name)
             # We'll use the existing slot values, but ensure working_selected_account_id is set
             return [SlotSet("working_selected_account_id", selected_account_id)]
         
         # If all else fails, log the error
         logger.error(f"Failed to confirm account selection for ID: {selected_account_id}")
-        return [] 
\ No newline at end of file
+        return [] 
+
+    @staticmethod
+    async def _confirm_locally(tracker: Tracker, selected_account_id: Text) -> Optional[List[Dict[Text, Any]]]:
+        """Selected account slots from local data, or None if the backend must be asked."""
+        confirmed = await check_selection(tracker, selected_account_id)
+        if confirmed is None:
+            return None
+        account, household = confirmed
+        logger.debug("Account selection confirmed from local data: %s (%s)", account['name'], selected_account_id)
+
+        events = [
+            SlotSet("selected_account_id", selected_account_id),
+            SlotSet("working_selected_account_id", selected_account_id),
+            SlotSet("selected_account_name", account['name']),
+            SlotSet("selected_account_dob", account['dob']),
+            SlotSet("selected_policy_end_date", account['policyEndDate'])
+        ]
+
+        # The household changed since the session loaded it - bring the session's copy up to date
+        session_stamp = session_household_stamp(tracker)
+        if household_stamp(household) != session_stamp:
+            logger.debug("Household changed since version %s - updating the session", session_stamp)
+            events.extend(household_version_events(household))
+        return events
\ No newline at end of file
@@ -6,11 +6,14 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.events import SlotSet
 from rasa_sdk.executor import CollectingDispatcher
 
-from ..api.connection_manager import ConnectionManager
+from ..api.async_connection_manager import get_async_connection_manager
+from ..api.metrics import instrument_action
+from ..session_state import action_idempotency_key, session_child_accounts
 
 # Set up logging for this module
 logger = logging.getLogger(__name__)
 
+@instrument_action
 class CancelPolicy(Action):
     """Action to cancel a policy by updating policy_end_date in database."""
     
@@ -18,7 +21,7 @@ class CancelPolicy(Action):
         """Return the action name."""
         return "cancel_policy_action"
     
-    def run(
+    async def run(
         self,
         dispatcher: CollectingDispatcher,
         tracker: Tracker,
@@ -30,60 +33,57 @@ class CancelPolicy(Action):
         For primary accounts with child accounts, also cancels all active child accounts.
         Sets was_policy_cancelled slot based on success of operation.
         """
-        # Initialize connection manager for database operations
-        conn_manager = ConnectionManager()
+        # Use the shared connection manager for database operations
+        conn_manager = get_async_connection_manager()
         
         # Get relevant slots
         selected_account_id = tracker.get_slot("working_selected_account_id")
         is_primary_account = tracker.get_slot("is_primary_account")
         current_date = tracker.get_slot("current_date")
-        child_accounts = tracker.get_slot("child_accounts") or []
         
         # Default to failed cancellation
         was_cancelled = False
         
         try:
-            logger.info(f"Attempting to cancel policy for account: {selected_account_id}")
+            logger.debug("Attempting to cancel policy for account: %s", selected_account_id)
             
             # Update data structure for the selected account
             update_data = {"policyEndDate": current_date}
+            # Delivering this turn again must not cancel twice
+            idempotency_key = action_idempotency_key(tracker, self.name(), selected_account_id, current_date)
             
             # For primary accounts with children, we need to cancel all active child accounts too
             if is_primary_account:
-                logger.info(f"Primary account with children - will update all active child accounts")
+                logger.debug("Primary account with children - will update all active child accounts")
                 
-                # Track whether all updates succeeded
-                all_updates_succeeded = True
-                
-                # First update the primary account
-                primary_update_success = conn_manager.update_member_data(selected_account_id, update_data)
-                if not primary_update_success:
-                    logger.error(f"Failed to update primary account: {selected_account_id}")
-                    all_updates_succeeded = False
-                
-                # Then update each active child account
+                # Collect the primary account and every active child account,
+                # then cancel them all with a single read and a single write
+                updates = {selected_account_id: update_data}
+                # Stored in the child_accounts slot, or resolved from the household handle
+                child_accounts = await session_child_accounts(tracker, conn_manager)
                 for child in child_accounts:
                     child_id = child.get('memberID')
                     child_end_date = child.get('policyEndDate')
                     
                     # Only update active child accounts
                     if child_id and child_end_date and current_date < child_end_date:
-                        logger.info(f"Updating active child account: {child_id}")
-                        child_update_success = conn_manager.update_member_data(child_id, update_data)
-                        
-                        if not child_update_success:
-                            logger.error(f"Failed to update child account: {child_id}")
-                            all_updates_succeeded = False
+                        logger.debug("Updating active child account: %s", child_id)
+                        updates[child_id] = update_data
                     else:
-                        logger.info(f"Skipping inactive child account: {child_id}")
+                        logger.debug("Skipping inactive child account: %s", child_id)
+                
+                results = await conn_manager.bulk_update_members(updates, idempotency_key)
+                for member_id, success in results.items():
+                    if not success:
+                        logger.error(f"Failed to update account: {member_id}")
                 
                 # Set cancellation status based on all updates
-                was_cancelled = all_updates_succeeded
+                was_cancelled = all(results.values())
                 
             else:
                 # For individual accounts (including child accounts), just update the selected account
-                logger.info(f"Updating individual account: {selected_account_id}")
-                update_success = conn_manager.update_member_data(selected_account_id, update_data)
+                logger.debug("Updating individual account: %s", selected_account_id)
+                update_success = await conn_manager.update_member_data(selected_account_id, update_data, idempotency_key)
                 was_cancelled = update_success
         
         except Exception as e:
@@ -92,7 +92,7 @@ class CancelPolicy(Action):
             was_cancelled = False
         
         # Log the final result
-        logger.info(f"Policy cancellation for {selected_account_id} - Success: {was_cancelled}")
+        logger.info("Policy cancellation for %s - Success: %s", selected_account_id, was_cancelled)
         
         # Return SlotSet event with cancellation result
         return [SlotSet("was_policy_cancelled", was_cancelled)]
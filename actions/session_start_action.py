@@ -4,10 +4,12 @@ from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, SessionStarted, ActionExecuted
 from datetime import datetime
 import logging
+from .api.metrics import instrument_action
 
 # Add this near the top of the file
 logger = logging.getLogger(__name__)
 
+@instrument_action
 class ActionSessionStart(Action):
     def name(self) -> Text:
         return "action_session_start"
@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, Optional, Text, Tuple
+import hashlib
+import os
+import logging
+
+from rasa_sdk import Tracker
+from rasa_sdk.events import SlotSet
+
+from .api.async_connection_manager import AsyncConnectionManager, get_async_connection_manager
+from .api.records import child_account_summary, household_stamp
+
+# Set up logging for this module
+logger = logging.getLogger(__name__)
+
+# Compact session state (opt-in with COMPACT_SESSION_STATE=true):
+# the tracker only keeps member IDs and a household handle instead of
+# copies of every account's details, and account buttons only carry the
+# selected member ID. Details are looked up through the (cached) data
+# layer when an action needs them.
+COMPACT_SESSION_STATE = os.environ.get("COMPACT_SESSION_STATE", "false").lower() == "true"
+
+# Slot holding the household handle in compact mode
+HOUSEHOLD_HANDLE_SLOT = "household_handle"
+
+# How action_track_selected_account confirms a selected account
+# (ACCOUNT_SELECTION_CHECK):
+# - "fetch" (default): always reads the account from the backend again
+# - "stamp": checks the selection against the session's household and its
+#   version stamp, using only data the backend holds locally; the backend
+#   is only contacted when there is no current local copy
+SELECTION_CHECK = os.environ.get("ACCOUNT_SELECTION_CHECK", "fetch").lower()
+SELECTION_CHECKS = ("fetch", "stamp")
+if SELECTION_CHECK not in SELECTION_CHECKS:
+    logger.warning(f"Unknown ACCOUNT_SELECTION_CHECK '{SELECTION_CHECK}' - using 'fetch'")
+    SELECTION_CHECK = "fetch"
+
+# Slot holding the household's version stamp when the session is not compact
+HOUSEHOLD_VERSION_SLOT = "household_version"
+
+
+def make_household_handle(household: Dict[str, Any]) -> Text:
+    """
+    Builds the handle stored in the tracker for a household.
+
+    Args:
+        household: A household as returned by get_household()
+
+    Returns:
+        "<primary memberID>@<version stamp>", e.g. "M12345@1a2b3c4d"
+    """
+    return f"{household['primary']['memberID']}@{household_stamp(household)}"
+
+
+def parse_household_handle(handle: Optional[Text]) -> Tuple[Optional[Text], Optional[Text]]:
+    """
+    Splits a household handle into its primary member ID and version stamp.
+
+    Returns:
+        (primary memberID, stamp) - both None if there is no handle
+    """
+    if not handle:
+        return None, None
+    primary_id, _, stamp = handle.rpartition('@')
+    if not primary_id:
+        # No stamp - the handle is just the primary member ID
+        return handle, None
+    return primary_id, stamp or None
+
+
+async def resolve_household(tracker: Tracker,
+                            conn_manager: Optional[AsyncConnectionManager] = None) -> Optional[Dict[str, Any]]:
+    """
+    Looks up the household of the authenticated member.
+
+    Uses the household handle if there is one, otherwise the permanent
+    primary_account_memberID slot. The lookup goes through the shared data
+    layer, so it is usually answered from the member cache.
+
+    Returns:
+        The household (primary record plus child summaries), or None
+    """
+    primary_id, _ = parse_household_handle(tracker.get_slot(HOUSEHOLD_HANDLE_SLOT))
+    primary_id = primary_id or tracker.get_slot("primary_account_memberID")
+    if not primary_id:
+        return None
+    conn_manager = conn_manager or get_async_connection_manager()
+    return await conn_manager.get_household(primary_id)
+
+
+async def session_child_accounts(tracker: Tracker,
+                                 conn_manager: Optional[AsyncConnectionManager] = None) -> List[Dict[str, Any]]:
+    """
+    Returns the child account summaries of the authenticated member.
+
+    Read from the child_accounts slot when the session stores them there,
+    otherwise (compact mode) resolved through the data layer.
+    """
+    child_accounts = tracker.get_slot("child_accounts")
+    if child_accounts or not tracker.get_slot(HOUSEHOLD_HANDLE_SLOT):
+        return child_accounts or []
+    household = await resolve_household(tracker, conn_manager)
+    if household is None:
+        logger.warning(f"Could not resolve household {tracker.get_slot(HOUSEHOLD_HANDLE_SLOT)}")
+        return []
+    return household['child_accounts']
+
+
+def session_household_stamp(tracker: Tracker) -> Optional[Text]:
+    """Returns the version stamp of the household loaded for this session, if any."""
+    _, stamp = parse_household_handle(tracker.get_slot(HOUSEHOLD_HANDLE_SLOT))
+    return stamp or tracker.get_slot(HOUSEHOLD_VERSION_SLOT)
+
+
+def action_idempotency_key(tracker: Tracker, action_name: Text, *parts: Any) -> Text:
+    """
+    Builds a key identifying one run of a writing action in one user turn.
+
+    The key is the same when the same turn is delivered again (e.g. the
+    assistant retried the action call after a timeout), so the backend can
+    recognise the repeat and skip the write; a new turn gets a new key.
+
+    Args:
+        tracker: The conversation tracker
+        action_name: The action doing the write
+        parts: Anything else that tells this write apart (e.g. the account)
+
+    Returns:
+        16 hex characters
+    """
+    # The user message's ID marks the turn; without one, the number of events so far does
+    turn = (tracker.latest_message or {}).get("message_id") or len(tracker.events or [])
+    seed = "|".join(str(part) for part in (tracker.sender_id, turn, action_name) + parts)
+    return hashlib.sha1(seed.encode()).hexdigest()[:16]
+
+
+def household_version_events(household: Dict[str, Any]) -> List[Dict[Text, Any]]:
+    """
+    Slot events recording a household's current version in the session.
+
+    Compact sessions keep the stamp in the household handle; the others get
+    the household_version slot and a refreshed child_accounts list.
+    """
+    if COMPACT_SESSION_STATE:
+        return [SlotSet(HOUSEHOLD_HANDLE_SLOT, make_household_handle(household))]
+    return [
+        SlotSet(HOUSEHOLD_VERSION_SLOT, household_stamp(household)),
+        SlotSet("child_accounts", household['child_accounts'] or None)
+    ]
+
+
+async def check_selection(tracker: Tracker, selected_account_id: Text,
+                          conn_manager: Optional[AsyncConnectionManager] = None
+                          ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Confirms a selected account without a network call, if possible.
+
+    How it works:
+    1. Reads the session's household from data the backend holds locally
+       (fresh cache, snapshot, local database) - never from the network
+    2. Checks that the selected account belongs to that household
+    3. The caller compares the household's stamp with the session's to see
+       whether anything changed since the session loaded it
+
+    Returns:
+        (account summary, household) if the selection could be confirmed
+        locally, or None if the backend has to be asked
+    """
+    primary_id, _ = parse_household_handle(tracker.get_slot(HOUSEHOLD_HANDLE_SLOT))
+    primary_id = primary_id or tracker.get_slot("primary_account_memberID")
+    if not primary_id:
+        return None
+    conn_manager = conn_manager or get_async_connection_manager()
+    household = await conn_manager.peek_household(primary_id)
+    if household is None:
+        return None
+
+    if household['primary']['memberID'] == selected_account_id:
+        return child_account_summary(household['primary']), household
+    for child in household['child_accounts']:
+        if child['memberID'] == selected_account_id:
+            return child, household
+    logger.warning(f"Selected account {selected_account_id} is not part of household {primary_id}")
+    return None
@@ -0,0 +1,269 @@
+"""
+Action-layer benchmark suite.
+
+Drives AuthenticateUserAction, ActionAskSelectedAccountId,
+ActionTrackSelectedAccount and CancelPolicy directly with synthetic
+trackers against a local JSONbin stand-in (or a local SQLite store), and
+reports per action:
+- throughput (actions/sec)
+- p50 / p95 / p99 latency
+- backend requests and bytes transferred
+- peak memory
+
+Examples:
+    python -m benchmarks.bench_actions
+    python -m benchmarks.bench_actions --members 1000 100000 --latency-ms 20 --concurrency 50
+    python -m benchmarks.bench_actions --backend sqlite --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+from actions import (
+    AuthenticateUserAction,
+    ActionAskSelectedAccountId,
+    ActionTrackSelectedAccount,
+    CancelPolicy,
+)
+from actions.api.backends import (JournaledBackend, JSONBinBackend, ShardedBackend, SQLiteBackend, StorageBackend,
+                                  set_backend)
+from actions.api.backends.sharded import partition_records
+from actions.api.records import child_account_summary, household_member_ids
+
+from .jsonbin_stub import JSONBinStub, generate_members
+
+# Date used as "today" by the synthetic cancellation scenario
+CURRENT_DATE = "2025-06-01"
+
+
+def make_tracker(slots: Dict[str, Any], sender_id: str = "bench") -> Tracker:
+    """Builds a minimal tracker holding the given slots."""
+    return Tracker(sender_id, slots, {}, [], False, None, {}, "action_listen")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Scenarios:
+    """Builds the synthetic tracker for each benchmarked action."""
+
+    def __init__(self, records: List[Dict[str, Any]], seed: int = 7):
+        self.rng = random.Random(seed)
+        self.by_id = {record['memberID']: record for record in records}
+        self.primaries = [record for record in records if record['memberID'].startswith('M')]
+        self.households = [record for record in self.primaries if record['has_child_accounts']] or self.primaries
+
+    def _household_slots(self, primary: Dict[str, Any]) -> Dict[str, Any]:
+        children = [child_account_summary(self.by_id[child_id])
+                    for child_id in household_member_ids(primary)[1:] if child_id in self.by_id]
+        return {
+            "member_id": primary['memberID'],
+            "member_name": primary['name'],
+            "member_dob": primary['dob'],
+            "policy_end_date": primary['policyEndDate'],
+            "primary_account_memberID": primary['memberID'],
+            "has_child_accounts": primary['has_child_accounts'],
+            "child_accounts": children,
+            "current_date": CURRENT_DATE,
+        }
+
+    def authenticate(self) -> Dict[str, Any]:
+        return {"member_id": self.rng.choice(self.primaries)['memberID']}
+
+    def ask_selected_account(self) -> Dict[str, Any]:
+        return self._household_slots(self.rng.choice(self.households))
+
+    def track_selected_account(self) -> Dict[str, Any]:
+        primary = self.rng.choice(self.households)
+        slots = self._household_slots(primary)
+        slots["selected_account_id"] = self.rng.choice(household_member_ids(primary))
+        return slots
+
+    def cancel_policy(self) -> Dict[str, Any]:
+        primary = self.rng.choice(self.households)
+        slots = self._household_slots(primary)
+        slots.update({
+            "working_selected_account_id": primary['memberID'],
+            "is_primary_account": primary['has_child_accounts'],
+        })
+        return slots
+
+
+# Benchmarked actions, in the order a conversation would run them
+ACTIONS = [
+    ("authenticate_user_action", AuthenticateUserAction, "authenticate"),
+    ("action_ask_selected_account_id", ActionAskSelectedAccountId, "ask_selected_account"),
+    ("action_track_selected_account", ActionTrackSelectedAccount, "track_selected_account"),
+    ("cancel_policy_action", CancelPolicy, "cancel_policy"),
+]
+
+
+async def run_action(action_cls: type, make_slots: Callable[[], Dict[str, Any]],
+                     iterations: int, concurrency: int) -> Dict[str, Any]:
+    """Runs one action `iterations` times with up to `concurrency` in flight."""
+    action = action_cls()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        tracker = make_tracker(make_slots(), sender_id=f"bench-{i}")
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = action.run(CollectingDispatcher(), tracker, {})
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    elapsed = time.perf_counter() - start
+    return {
+        "iterations": iterations,
+        "failures": failures,
+        "throughput_per_sec": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+def add_backend_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the options choosing and tuning the local member store."""
+    parser.add_argument("--fanout", type=int, default=2, help="child accounts per household")
+    parser.add_argument("--backend", choices=["jsonbin", "sqlite"], default="jsonbin")
+    parser.add_argument("--cache-ttl", type=float, default=0.0,
+                        help="member cache TTL in seconds (0 = every read hits the stand-in)")
+    parser.add_argument("--shards", type=int, default=1, help="split the JSONbin data over this many bins")
+    parser.add_argument("--lookup-mode", choices=["index", "stream"], default="index",
+                        help="JSONbin lookups from the whole-bin index or by streaming the bin")
+    parser.add_argument("--serve-stale", action="store_true", help="enable stale-while-revalidate reads")
+    parser.add_argument("--journal", action="store_true",
+                        help="put a write-behind journal in front of the store (updates flushed in the background)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency injected by the stand-in")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stand-in requests failing with 503")
+
+
+def create_backend(records: List[Dict[str, Any]], args: argparse.Namespace,
+                   pool_size: int = 10) -> Tuple[StorageBackend, Optional[JSONBinStub]]:
+    """
+    Loads the records into a local member store and makes it the actions' backend.
+
+    Returns:
+        (backend, stand-in) - the stand-in is None for the SQLite store
+    """
+    stub: Optional[JSONBinStub] = None
+    if args.backend == "sqlite":
+        db_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "members.db")
+        backend = SQLiteBackend(db_path)
+        backend.import_records(records)
+    else:
+        stub = JSONBinStub(latency_ms=args.latency_ms, error_rate=args.error_rate).start()
+        options = dict(cache_ttl_seconds=args.cache_ttl, serve_stale=args.serve_stale,
+                       pool_size=max(10, pool_size), lookup_mode=args.lookup_mode)
+        if args.shards > 1:
+            urls = []
+            for number, partition in enumerate(partition_records(records, args.shards)):
+                stub.load(partition, f"shard-{number}")
+                urls.append(stub.url(f"shard-{number}"))
+            backend = ShardedBackend(urls, **options)
+        else:
+            stub.load(records)
+            backend = JSONBinBackend(base_url=stub.url(), **options)
+    if args.journal:
+        journal_path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "member_updates.journal")
+        backend = JournaledBackend(journal_path, backend)
+    set_backend(backend)
+    return backend, stub
+
+
+async def run_suite(members: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmarks every action against one dataset size."""
+    records = generate_members(members, args.fanout)
+    scenarios = Scenarios(records)
+    backend, stub = create_backend(records, args, args.concurrency)
+
+    results: Dict[str, Any] = {"members": members, "backend": args.backend, "shards": args.shards, "actions": {}}
+    try:
+        for action_name, action_cls, scenario in ACTIONS:
+            if stub is not None:
+                stub.reset_stats()
+            if args.trace_memory:
+                tracemalloc.start()
+            result = await run_action(action_cls, getattr(scenarios, scenario), args.iterations, args.concurrency)
+            if args.trace_memory:
+                result["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            if stub is not None:
+                result.update({
+                    "backend_requests": stub.stats["requests"],
+                    "bytes_out": stub.stats["bytes_out"],
+                    "bytes_in": stub.stats["bytes_in"],
+                })
+            results["actions"][action_name] = result
+    finally:
+        await backend.aclose()
+        if stub is not None:
+            stub.stop()
+
+    # ru_maxrss is reported in kilobytes on Linux (the stand-in runs in-process and is included)
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    print(f"\n{results['members']} members, backend={results['backend']}, shards={results['shards']}, "
+          f"peak RSS {results['peak_rss_mb']:.1f} MB")
+    header = f"{'action':34} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fail':>5} {'reqs':>6} {'MB out':>8} {'MB in':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results["actions"].items():
+        print(f"{name:34} {r['throughput_per_sec']:9.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+              f"{r['failures']:5d} {r.get('backend_requests', 0):6d} "
+              f"{r.get('bytes_out', 0) / 2 ** 20:8.2f} {r.get('bytes_in', 0) / 2 ** 20:7.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the custom actions against a local member store")
+    parser.add_argument("--members", type=int, nargs="+", default=[1000], help="dataset sizes to run (1k to 1M)")
+    parser.add_argument("--iterations", type=int, default=200, help="runs per action")
+    parser.add_argument("--concurrency", type=int, default=10, help="action runs in flight at once")
+    add_backend_arguments(parser)
+    parser.add_argument("--trace-memory", action="store_true", help="also report traced Python peak memory (slower)")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    all_results = []
+    for members in args.members:
+        results = asyncio.run(run_suite(members, args))
+        print_report(results)
+        all_results.append(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(all_results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Local stand-in for the JSONbin.io v3 API, used for benchmarks and load tests.
+
+Supports the calls our backend makes:
+- GET  /v3/b/<bin_id>                   -> {"record": [...], "metadata": {...}} (with ETag)
+  (with an X-JSON-Path header of the form $[?(@.memberID == 'M1' || ...)]
+  only the matching records are returned)
+- GET  /v3/b/<bin_id>/versions/count    -> {"metadata": {"versionCount": N}}
+- PUT  /v3/b/<bin_id>                   -> replaces the record array
+  (with an If-Match header only if the bin is still at that ETag, else HTTP 412)
+- POST /v3/b                            -> creates a new bin
+
+and can inject latency and errors, and enforce a request quota (HTTP 429
+with Retry-After, like JSONbin's plans). With etags=False it behaves like a
+store that does not version its bins: no ETag is sent and If-Match is
+ignored. Every request and the bytes moved are
+counted, so benchmarks can report backend traffic.
+
+Run standalone:
+    python -m benchmarks.jsonbin_stub --members 10000 --port 8765
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Any
+
+# Bin used when the stand-in is started with a generated dataset
+DEFAULT_BIN_ID = "members"
+
+# The one X-JSON-Path shape the stand-in understands: a memberID filter
+_JSON_PATH = re.compile(r"^\$\[\?\((.*)\)\]$")
+_JSON_PATH_ID = re.compile(r"@\.memberID == '((?:[^'\\]|\\.)*)'")
+
+
+def generate_members(count: int, fanout: int = 2, household_ratio: float = 0.3,
+                     seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Builds a synthetic member dataset shaped like the production bin.
+
+    Args:
+        count: Total number of member records
+        fanout: Number of child accounts per household
+        household_ratio: Share of primary members that have child accounts
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        List of member records (primaries first in each household, then their children)
+    """
+    rng = random.Random(seed)
+    records: List[Dict[str, Any]] = []
+    number = 0
+    while len(records) < count:
+        number += 1
+        primary_id = f"M{number:07d}"
+        children = []
+        if fanout and rng.random() < household_ratio:
+            children = [f"C{number:07d}{i}" for i in range(min(fanout, count - len(records) - 1))]
+        records.append(_member(rng, primary_id, children))
+        for child_id in children:
+            records.append(_member(rng, child_id, []))
+    return records
+
+
+def _member(rng: random.Random, member_id: str, children: List[str]) -> Dict[str, Any]:
+    return {
+        "memberID": member_id,
+        "name": f"Member {member_id}",
+        "dob": f"{rng.randint(1940, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "policyEndDate": f"{rng.randint(2020, 2035)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "has_child_accounts": bool(children),
+        "child_accounts": ", ".join(children),
+    }
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping pooled keep-alive connections is expected noise here
+        pass
+
+
+class JSONBinStub:
+    """
+    In-process JSONbin stand-in running on a background thread.
+
+    Attributes:
+        bins: bin_id -> list of member records
+        stats: request and byte counters (reset with reset_stats())
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 latency_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+                 quota_per_second: int = 0, etags: bool = True):
+        self.bins: Dict[str, List[Dict[str, Any]]] = {}
+        self.versions: Dict[str, int] = {}
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        # Requests allowed per one-second window (0 = unlimited)
+        self.quota_per_second = quota_per_second
+        self.etags = etags
+        self._window = (0, 0)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._encoded: Dict[str, bytes] = {}
+        self.reset_stats()
+        self._server = _QuietServer((host, port), self._make_handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def url(self, bin_id: str = DEFAULT_BIN_ID) -> str:
+        """Returns the base URL of a bin, as JSONBinBackend expects it."""
+        return f"http://{self._server.server_address[0]}:{self.port}/v3/b/{bin_id}"
+
+    def load(self, records: List[Dict[str, Any]], bin_id: str = DEFAULT_BIN_ID,
+             if_match: Optional[str] = None) -> bool:
+        """
+        Replaces the content of a bin.
+
+        With if_match set, only if the bin is still at that ETag (checked and
+        replaced atomically); returns False and counts a conflict otherwise.
+        """
+        with self._lock:
+            if if_match is not None and if_match != self.etag(bin_id):
+                self.stats["conflicts"] += 1
+                return False
+            self.bins[bin_id] = records
+            self.versions[bin_id] = self.versions.get(bin_id, 0) + 1
+            self._encoded.pop(bin_id, None)
+            return True
+
+    def etag(self, bin_id: str = DEFAULT_BIN_ID) -> str:
+        """The ETag of a bin's current version."""
+        return f'"{bin_id}-{self.versions.get(bin_id, 0)}"'
+
+    def reset_stats(self) -> None:
+        self.stats = {"requests": 0, "reads": 0, "writes": 0, "not_modified": 0,
+                      "errors": 0, "throttled": 0, "conflicts": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def start(self) -> "JSONBinStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _over_quota(self) -> bool:
+        """Counts a request against the current one-second window (lock held)."""
+        if not self.quota_per_second:
+            return False
+        second = int(time.monotonic())
+        window, used = self._window
+        if window != second:
+            window, used = second, 0
+        self._window = (window, used + 1)
+        return used >= self.quota_per_second
+
+    def _body(self, bin_id: str) -> bytes:
+        """Returns the encoded GET response for a bin, cached until the bin changes."""
+        with self._lock:
+            if bin_id not in self._encoded:
+                self._encoded[bin_id] = json.dumps({
+                    "record": self.bins[bin_id],
+                    "metadata": {"id": bin_id, "private": True},
+                }).encode()
+            return self._encoded[bin_id]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.stats["bytes_out"] += len(body)
+
+            def _begin(self) -> bool:
+                """Counts the request and applies injected latency/errors; False = error sent."""
+                length = int(self.headers.get("Content-Length") or 0)
+                self._payload = self.rfile.read(length) if length else b""
+                with stub._lock:
+                    stub.stats["requests"] += 1
+                    stub.stats["bytes_in"] += length
+                    fail = stub.error_rate and stub._rng.random() < stub.error_rate
+                    throttle = stub._over_quota()
+                if throttle:
+                    with stub._lock:
+                        stub.stats["throttled"] += 1
+                    self._send(429, b'{"message": "Requests exceeded the plan quota"}', {"Retry-After": "1"})
+                    return False
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000.0)
+                if fail:
+                    with stub._lock:
+                        stub.stats["errors"] += 1
+                    self._send(503, b'{"message": "injected error"}')
+                    return False
+                return True
+
+            def _bin_id(self) -> str:
+                # /v3/b/<bin_id>[/versions/count]
+                parts = self.path.split("?")[0].strip("/").split("/")
+                return parts[2] if len(parts) > 2 else ""
+
+            def do_GET(self):
+                if not self._begin():
+                    return
+                bin_id = self._bin_id()
+                if bin_id not in stub.bins:
+                    return self._send(404, b'{"message": "Bin not found"}')
+                if self.path.endswith("/versions/count"):
+                    body = {"metadata": {"id": bin_id, "versionCount": stub.versions[bin_id]}}
+                    return self._send(200, json.dumps(body).encode())
+                json_path = self.headers.get("X-JSON-Path")
+                if json_path:
+                    return self._send_filtered(bin_id, json_path)
+                if not stub.etags:
+                    with stub._lock:
+                        stub.stats["reads"] += 1
+                    return self._send(200, stub._body(bin_id))
+                etag = stub.etag(bin_id)
+                if self.headers.get("If-None-Match") == etag:
+                    with stub._lock:
+                        stub.stats["not_modified"] += 1
+                    return self._send(304, headers={"ETag": etag})
+                with stub._lock:
+                    stub.stats["reads"] += 1
+                self._send(200, stub._body(bin_id), {"ETag": etag})
+
+            def _send_filtered(self, bin_id: str, json_path: str):
+                match = _JSON_PATH.match(json_path)
+                if not match:
+                    return self._send(400, b'{"message": "Unsupported JSON path"}')
+                wanted = {re.sub(r"\\(.)", r"\1", member_id) for member_id in _JSON_PATH_ID.findall(match.group(1))}
+                records = [record for record in stub.bins[bin_id] if record.get("memberID") in wanted]
+                with stub._lock:
+                    stub.stats["reads"] += 1
+                self._send(200, json.dumps({"record": records, "metadata": {"id": bin_id}}).encode())
+
+            def do_PUT(self):
+                if not self._begin():
+                    return
+                bin_id = self._bin_id()
+                if bin_id not in stub.bins:
+                    return self._send(404, b'{"message": "Bin not found"}')
+                if_match = self.headers.get("If-Match") if stub.etags else None
+                if not stub.load(json.loads(self._payload), bin_id, if_match):
+                    return self._send(412, b'{"message": "Bin changed since it was read"}')
+                with stub._lock:
+                    stub.stats["writes"] += 1
+                self._send(200, json.dumps({"metadata": {"parentId": bin_id}}).encode())
+
+            def do_POST(self):
+                if not self._begin():
+                    return
+                bin_id = self.headers.get("X-Bin-Name") or uuid.uuid4().hex[:24]
+                stub.load(json.loads(self._payload or b"[]"), bin_id)
+                self._send(200, json.dumps({"record": [], "metadata": {"id": bin_id}}).encode())
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local JSONbin stand-in with synthetic members")
+    parser.add_argument("--members", type=int, default=1000, help="dataset size")
+    parser.add_argument("--fanout", type=int, default=2, help="child accounts per household")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--quota", type=int, default=0, help="requests per second before HTTP 429 (0 = unlimited)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub = JSONBinStub(port=args.port, latency_ms=args.latency_ms, error_rate=args.error_rate,
+                       quota_per_second=args.quota)
+    stub.load(generate_members(args.members, args.fanout))
+    print(f"Serving {args.members} members at {stub.url()} (Ctrl+C to stop)")
+    stub.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+"""
+Conversation replay load test for the action endpoint.
+
+Replays whole conversations of the authentication, policy_status and
+policy_cancel flows as concurrent action-webhook requests, with no
+assistant model in the loop: the script plays both the user and the flow,
+filling slots the way the flow's collect and set_slots steps would and
+calling the custom actions in the order the flow does. Every request is a
+webhook payload handed to the same ActionExecutor the action server uses
+(or, with --endpoint, posted to a running action server), and the events
+it returns are applied to the conversation's slots before the next step.
+
+Concurrency ramps through the given stages; each stage keeps that many
+conversations running for --duration seconds and reports:
+- sustained actions/sec and conversations/sec
+- p50 / p95 / p99 latency per action name
+- error rate per action: requests that failed, or whose events did not
+  have the outcome the flow expects (e.g. a known member not found)
+- backend requests and bytes (local stand-in only)
+
+Conversations are synthetic (drawn from the stand-in's member data, mixed
+with --mix) or replayed from a file written by an earlier --record run.
+Against --endpoint, synthetic conversations use the same generated members
+as `python -m benchmarks.jsonbin_stub --members N`, so point the server's
+member_store at such a stand-in (or replay conversations recorded against
+the server's own data).
+
+Examples:
+    python -m benchmarks.load_replay
+    python -m benchmarks.load_replay --concurrency 1 10 50 100 --duration 20 --latency-ms 20
+    python -m benchmarks.load_replay --mix authentication=1 policy_status=3 policy_cancel=1 --json load.json
+    python -m benchmarks.load_replay --record conversations.json
+    python -m benchmarks.load_replay --replay conversations.json --endpoint http://localhost:5055/webhook
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import rasa_sdk
+from rasa_sdk.executor import ActionExecutor
+
+from actions.api.records import household_member_ids
+
+from .bench_actions import add_backend_arguments, create_backend, percentile
+from .jsonbin_stub import generate_members
+
+# Flows a synthetic conversation can follow, and their default share of the mix
+FLOWS = ("authentication", "policy_status", "policy_cancel")
+DEFAULT_MIX = {"authentication": 1.0, "policy_status": 2.0, "policy_cancel": 1.0}
+
+# Outcome each action must have for the flow to carry on as the user expects:
+# slot name -> expected value, checked against the slots after the action ran
+EXPECTED_OUTCOMES = {
+    "authenticate_user_action": {"member_found": True},
+    "auth_successful": {"auth_status": True},
+    "cancel_policy_action": {"was_policy_cancelled": True},
+}
+
+
+class StepFailed(Exception):
+    """Raised when an action's events do not have the expected outcome."""
+
+
+class InProcessEndpoint:
+    """Runs webhook payloads through an ActionExecutor holding the actions package."""
+
+    def __init__(self):
+        self.executor = ActionExecutor()
+        self.executor.register_package("actions")
+
+    async def call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        # Round-tripped through JSON like a real webhook request and response
+        result = await self.executor.run(json.loads(json.dumps(payload)))
+        return json.loads(json.dumps({"events": result.events, "responses": result.responses}))
+
+    async def close(self) -> None:
+        pass
+
+
+class WebhookEndpoint:
+    """Posts webhook payloads to a running action server."""
+
+    def __init__(self, url: str, pool_size: int):
+        self.url = url
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size))
+
+    async def call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        async with self.session.post(self.url, json=payload) as response:
+            body = await response.read()
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}: {body[:200].decode(errors='replace')}")
+            return json.loads(body)
+
+    async def close(self) -> None:
+        await self.session.close()
+
+
+class Conversation:
+    """
+    One replayed conversation: its slots, and the steps it ran.
+
+    Each step either fills slots (a user answer or a flow's set_slots) or
+    calls an action; the steps are kept so the conversation can be recorded
+    and replayed later exactly as it ran.
+    """
+
+    def __init__(self, sender_id: str, flow: str, endpoint: Any,
+                 on_action: Callable[[str, float, bool], None]):
+        self.sender_id = sender_id
+        self.flow = flow
+        self.endpoint = endpoint
+        self.on_action = on_action
+        self.slots: Dict[str, Any] = {}
+        self.steps: List[Dict[str, Any]] = []
+
+    def set_slots(self, **slots: Any) -> None:
+        self.slots.update(slots)
+        self.steps.append({"slots": slots})
+
+    def _payload(self, action_name: str) -> Dict[str, Any]:
+        return {
+            "next_action": action_name,
+            "sender_id": self.sender_id,
+            "version": rasa_sdk.__version__,
+            "domain": {},
+            "tracker": {
+                "sender_id": self.sender_id,
+                "slots": dict(self.slots),
+                "latest_message": {},
+                "events": [],
+                "paused": False,
+                "followup_action": None,
+                "active_loop": {},
+                "latest_action_name": "action_listen",
+            },
+        }
+
+    async def run(self, action_name: str, expect: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Calls an action and applies the slot events it returns.
+
+        Raises:
+            StepFailed: If the request failed or the expected outcome is missing
+        """
+        expect = EXPECTED_OUTCOMES.get(action_name, {}) if expect is None else expect
+        self.steps.append({"action": action_name, "expect": expect})
+        start = time.perf_counter()
+        try:
+            response = await self.endpoint.call(self._payload(action_name))
+        except Exception as e:
+            self.on_action(action_name, time.perf_counter() - start, False)
+            raise StepFailed(f"{action_name} failed: {e}") from e
+        elapsed = time.perf_counter() - start
+        for event in response.get("events", []):
+            if event.get("event") == "slot":
+                self.slots[event["name"]] = event.get("value")
+        missed = {name: self.slots.get(name) for name, value in expect.items() if self.slots.get(name) != value}
+        self.on_action(action_name, elapsed, not missed)
+        if missed:
+            raise StepFailed(f"{action_name} did not have the expected outcome: {missed}")
+        return response
+
+
+class SyntheticUser:
+    """Plays the user and the flows for conversations about generated members."""
+
+    def __init__(self, records: List[Dict[str, Any]], seed: int = 7):
+        self.rng = random.Random(seed)
+        self.primaries = [record for record in records if record['memberID'].startswith('M')]
+
+    async def authentication(self, conversation: Conversation) -> None:
+        """The authentication flow: member ID, DOB, then account selection for households."""
+        primary = self.rng.choice(self.primaries)
+        await conversation.run("action_session_start")
+        conversation.set_slots(auth_status=False, member_id=primary['memberID'])
+        await conversation.run("authenticate_user_action")
+        # The user answers with the right date of birth
+        conversation.set_slots(dob_input=conversation.slots.get("member_dob"))
+        await conversation.run("auth_successful")
+        if conversation.slots.get("has_child_accounts"):
+            await conversation.run("action_ask_selected_account_id")
+            selected_id = self.rng.choice(household_member_ids(primary))
+            conversation.set_slots(selected_account_id=selected_id)
+            await conversation.run("action_track_selected_account",
+                                   expect={"working_selected_account_id": selected_id})
+
+    async def policy_status(self, conversation: Conversation) -> None:
+        """The policy_status flow: authentication, then an active/inactive check on the slots."""
+        conversation.set_slots(flow_name="policy status")
+        await self.authentication(conversation)
+        conversation.set_slots(is_policy_active=self._is_policy_active(conversation))
+
+    async def policy_cancel(self, conversation: Conversation) -> None:
+        """The policy_cancel flow: authentication, then a confirmed cancellation if the policy is active."""
+        conversation.set_slots(flow_name="policy cancel")
+        await self.authentication(conversation)
+        slots = conversation.slots
+        conversation.set_slots(is_primary_account=bool(
+            slots.get("working_selected_account_id") == slots.get("primary_account_memberID")
+            and slots.get("has_child_accounts")
+        ))
+        is_policy_active = self._is_policy_active(conversation)
+        conversation.set_slots(is_policy_active=is_policy_active)
+        if is_policy_active:
+            conversation.set_slots(confirm_cancellation=True)
+            await conversation.run("cancel_policy_action")
+        conversation.set_slots(is_primary_account=False)
+
+    @staticmethod
+    def _is_policy_active(conversation: Conversation) -> bool:
+        end_date = conversation.slots.get("selected_policy_end_date")
+        return bool(end_date) and conversation.slots.get("current_date", "") < end_date
+
+
+async def replay_steps(conversation: Conversation, steps: List[Dict[str, Any]]) -> None:
+    """Replays recorded steps as they were, without branching."""
+    for step in steps:
+        if "action" in step:
+            await conversation.run(step["action"], step.get("expect", {}))
+        else:
+            conversation.set_slots(**step.get("slots", {}))
+
+
+def parse_mix(values: List[str]) -> Dict[str, float]:
+    """Reads flow=weight pairs into the flow mix."""
+    mix = {}
+    for value in values:
+        flow, _, weight = value.partition("=")
+        if flow not in FLOWS:
+            raise argparse.ArgumentTypeError(f"unknown flow '{flow}' (choose from {', '.join(FLOWS)})")
+        mix[flow] = float(weight or 1)
+    return mix
+
+
+class Stage:
+    """Collects the results of one concurrency stage."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.latencies: Dict[str, List[float]] = {}
+        self.failures: Dict[str, int] = {}
+        self.conversations = 0
+        self.failed_conversations = 0
+        self.errors: Dict[str, int] = {}
+
+    def on_action(self, action_name: str, elapsed: float, ok: bool) -> None:
+        self.latencies.setdefault(action_name, []).append(elapsed)
+        if not ok:
+            self.failures[action_name] = self.failures.get(action_name, 0) + 1
+
+    def on_conversation(self, error: Optional[Exception]) -> None:
+        self.conversations += 1
+        if error is not None:
+            self.failed_conversations += 1
+            message = str(error).split(":")[0]
+            self.errors[message] = self.errors.get(message, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        total_actions = sum(len(samples) for samples in self.latencies.values())
+        total_failures = sum(self.failures.values())
+        actions = {}
+        for name, samples in sorted(self.latencies.items()):
+            actions[name] = {
+                "count": len(samples),
+                "error_rate": self.failures.get(name, 0) / len(samples),
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+            }
+        return {
+            "concurrency": self.concurrency,
+            "seconds": elapsed,
+            "conversations": self.conversations,
+            "conversations_per_sec": self.conversations / elapsed if elapsed else 0.0,
+            "conversation_error_rate": self.failed_conversations / self.conversations if self.conversations else 0.0,
+            "actions_total": total_actions,
+            "actions_per_sec": total_actions / elapsed if elapsed else 0.0,
+            "action_error_rate": total_failures / total_actions if total_actions else 0.0,
+            "errors": self.errors,
+            "actions": actions,
+        }
+
+
+# Picks the next conversation: (flow, recorded steps or None for a synthetic one)
+Picker = Callable[[], Tuple[str, Optional[List[Dict[str, Any]]]]]
+Player = Callable[[Conversation, Optional[List[Dict[str, Any]]]], Awaitable[None]]
+
+
+async def run_stage(concurrency: int, duration: float, endpoint: Any, pick: Picker, play: Player,
+                    recorded: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Keeps `concurrency` conversations running for `duration` seconds."""
+    stage = Stage(concurrency)
+    deadline = time.perf_counter() + duration
+    counter = itertools.count()
+
+    async def user(number: int) -> None:
+        # Each virtual user starts a new conversation as soon as its last one ends
+        while time.perf_counter() < deadline:
+            flow, steps = pick()
+            conversation = Conversation(f"load-{concurrency}-{number}-{next(counter)}", flow,
+                                        endpoint, stage.on_action)
+            error = None
+            try:
+                await play(conversation, steps)
+            except StepFailed as e:
+                error = e
+            stage.on_conversation(error)
+            if recorded is not None:
+                recorded.append({"flow": conversation.flow, "steps": conversation.steps})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(number) for number in range(concurrency)))
+    return stage.report(time.perf_counter() - start)
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    """Runs every concurrency stage against one endpoint."""
+    rng = random.Random(args.seed)
+    records = generate_members(args.members, args.fanout)
+    user = SyntheticUser(records, args.seed)
+
+    backend = stub = None
+    if args.endpoint:
+        endpoint = WebhookEndpoint(args.endpoint, max(args.concurrency))
+    else:
+        backend, stub = create_backend(records, args, max(args.concurrency))
+        endpoint = InProcessEndpoint()
+
+    replayed = None
+    if args.replay:
+        with open(args.replay) as f:
+            replayed = json.load(f)
+    cursor = itertools.count()
+
+    mix = args.mix or DEFAULT_MIX
+    flows = list(mix)
+    weights = [mix[flow] for flow in flows]
+
+    def pick() -> Tuple[str, Optional[List[Dict[str, Any]]]]:
+        if replayed is not None:
+            conversation = replayed[next(cursor) % len(replayed)]
+            return conversation["flow"], conversation["steps"]
+        return rng.choices(flows, weights)[0], None
+
+    async def play(conversation: Conversation, steps: Optional[List[Dict[str, Any]]]) -> None:
+        if steps is not None:
+            await replay_steps(conversation, steps)
+        else:
+            await getattr(user, conversation.flow)(conversation)
+
+    recorded: Optional[List[Dict[str, Any]]] = [] if args.record else None
+    results: Dict[str, Any] = {
+        "members": args.members,
+        "endpoint": args.endpoint or "in-process",
+        "backend": None if args.endpoint else args.backend,
+        "mix": None if replayed is not None else mix,
+        "replay": args.replay,
+        "stages": [],
+    }
+    try:
+        for concurrency in args.concurrency:
+            if stub is not None:
+                stub.reset_stats()
+            result = await run_stage(concurrency, args.duration, endpoint, pick, play, recorded)
+            if stub is not None:
+                result.update({
+                    "backend_requests": stub.stats["requests"],
+                    "bytes_out": stub.stats["bytes_out"],
+                    "bytes_in": stub.stats["bytes_in"],
+                    "write_conflicts": stub.stats["conflicts"],
+                })
+            print_stage(result)
+            results["stages"].append(result)
+    finally:
+        await endpoint.close()
+        if backend is not None:
+            await backend.aclose()
+        if stub is not None:
+            stub.stop()
+
+    if recorded is not None:
+        with open(args.record, "w") as f:
+            json.dump(recorded, f, indent=1)
+        print(f"\nRecorded {len(recorded)} conversations to {args.record}")
+    return results
+
+
+def print_stage(result: Dict[str, Any]) -> None:
+    print(f"\nconcurrency {result['concurrency']}: {result['conversations_per_sec']:.1f} conversations/s, "
+          f"{result['actions_per_sec']:.1f} actions/s, action errors {result['action_error_rate']:.2%}, "
+          f"conversation errors {result['conversation_error_rate']:.2%}"
+          + (f", {result['backend_requests']} backend requests, {result['write_conflicts']} write conflicts"
+             if "backend_requests" in result else ""))
+    header = f"{'action':34} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, r in result["actions"].items():
+        print(f"{name:34} {r['count']:7d} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+              f"{r['error_rate']:7.2%}")
+    for message, count in result["errors"].items():
+        print(f"  {count} x {message}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay concurrent conversations against the custom actions")
+    parser.add_argument("--members", type=int, default=1000, help="dataset size")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50],
+                        help="conversations in flight at once, one stage per value")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per stage")
+    parser.add_argument("--mix", nargs="+", type=str, metavar="FLOW=WEIGHT",
+                        help=f"share of each flow (default: {' '.join(f'{k}={v:g}' for k, v in DEFAULT_MIX.items())})")
+    parser.add_argument("--seed", type=int, default=7, help="random seed for the synthetic conversations")
+    parser.add_argument("--endpoint", help="action server webhook URL (default: run the actions in-process)")
+    parser.add_argument("--record", help="write the conversations that ran to this file")
+    parser.add_argument("--replay", help="replay conversations recorded with --record instead of synthetic ones")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    if args.mix:
+        try:
+            args.mix = parse_mix(args.mix)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+
+    results = asyncio.run(run_load(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+from actions.api.async_connection_manager import AsyncConnectionManager
+from actions.api.backends import SQLiteBackend
+from actions.api.backends.sharded import ShardedBackend
+from benchmarks.jsonbin_stub import generate_members
+
+
+def _household_primary(records):
+    return next(record for record in records if record["has_child_accounts"])
+
+
+def _peek_threads(backend):
+    """Records the thread every peek_household_records() call runs in."""
+    threads = []
+    peek = backend.peek_household_records
+
+    def recorded(member_id):
+        threads.append(threading.get_ident())
+        return peek(member_id)
+
+    backend.peek_household_records = recorded
+    return threads
+
+
+def test_file_backed_peek_runs_off_the_event_loop(tmp_path):
+    records = generate_members(50)
+    backend = SQLiteBackend(str(tmp_path / "members.db"))
+    backend.import_records(records)
+    threads = _peek_threads(backend)
+    primary = _household_primary(records)
+
+    async def peek():
+        household = await AsyncConnectionManager(backend).peek_household(primary["memberID"])
+        return household, threading.get_ident()
+
+    household, loop_thread = asyncio.run(peek())
+    assert household["primary"]["memberID"] == primary["memberID"]
+    assert len(household["child_accounts"]) == 2
+    assert threads and loop_thread not in threads
+
+
+def test_sharded_peek_goes_through_each_shards_async_peek(tmp_path):
+    records = generate_members(50)
+    shards = [SQLiteBackend(str(tmp_path / f"shard-{number}.db")) for number in range(2)]
+    backend = ShardedBackend(shards)
+    backend.import_records(records)
+    threads = [_peek_threads(shard) for shard in shards]
+    primary = _household_primary(records)
+
+    async def peek():
+        household = await AsyncConnectionManager(backend).peek_household(primary["memberID"])
+        return household, threading.get_ident()
+
+    household, loop_thread = asyncio.run(peek())
+    assert household["primary"]["memberID"] == primary["memberID"]
+    shard_threads = [thread for shard_threads in threads for thread in shard_threads]
+    assert shard_threads and loop_thread not in shard_threads
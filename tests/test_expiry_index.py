@@ -0,0 +1,62 @@
+from actions.api.expiry_index import PolicyExpiryIndex
+
+RECORDS = [
+    {"memberID": "M3", "policyEndDate": "2025-03-01"},
+    {"memberID": "M1", "policyEndDate": "2025-01-15"},
+    {"memberID": "M4", "policyEndDate": "2025-03-01"},
+    {"memberID": "M2", "policyEndDate": "2025-01-15"},
+    {"memberID": "M5", "policyEndDate": "2025-12-31"},
+    {"memberID": "M6"},
+    {"memberID": "M7", "policyEndDate": None},
+    {"memberID": "M8", "policyEndDate": ""},
+]
+
+
+def test_range_includes_both_bounds():
+    index = PolicyExpiryIndex(RECORDS)
+    assert index.expiring_between("2025-01-15", "2025-03-01") == [
+        ("M1", "2025-01-15"), ("M2", "2025-01-15"), ("M3", "2025-03-01"), ("M4", "2025-03-01")]
+    # A single day
+    assert index.expiring_between("2025-03-01", "2025-03-01") == [("M3", "2025-03-01"), ("M4", "2025-03-01")]
+
+
+def test_range_just_outside_the_dates_excludes_them():
+    index = PolicyExpiryIndex(RECORDS)
+    assert index.expiring_between("2025-01-16", "2025-02-28") == []
+    assert index.expiring_between("2025-01-16", "2025-03-01") == [("M3", "2025-03-01"), ("M4", "2025-03-01")]
+    assert index.expiring_between("2025-01-01", "2025-01-14") == []
+    assert index.expiring_between("2026-01-01", "2026-12-31") == []
+    # An empty (reversed) range
+    assert index.expiring_between("2025-12-31", "2025-01-01") == []
+
+
+def test_duplicate_dates_are_ordered_by_member_id():
+    index = PolicyExpiryIndex(RECORDS)
+    answer = index.expiring_between("2000-01-01", "2099-12-31")
+    assert answer == sorted(answer, key=lambda pair: (pair[1], pair[0]))
+    assert [member_id for member_id, _ in answer] == ["M1", "M2", "M3", "M4", "M5"]
+
+
+def test_members_without_end_date_are_left_out():
+    index = PolicyExpiryIndex(RECORDS)
+    assert len(index) == 5
+    assert index.end_date("M6") is None and index.end_date("M7") is None and index.end_date("M8") is None
+    assert index.is_active("M6", "2025-01-01") is None
+    assert all(member_id not in ("M6", "M7", "M8")
+               for member_id, _ in index.expiring_between("0000-01-01", "9999-12-31"))
+
+
+def test_active_until_the_end_date():
+    index = PolicyExpiryIndex(RECORDS)
+    assert index.is_active("M1", "2025-01-14") is True
+    assert index.is_active("M1", "2025-01-15") is False
+    assert index.count_active("2025-01-14") == 5
+    assert index.count_active("2025-01-15") == 3
+    assert index.count_active("2025-12-31") == 0
+
+
+def test_empty_index():
+    index = PolicyExpiryIndex()
+    assert len(index) == 0
+    assert index.expiring_between("2000-01-01", "2099-12-31") == []
+    assert index.count_active("2025-01-01") == 0
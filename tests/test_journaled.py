@@ -0,0 +1,161 @@
+import threading
+
+import pytest
+
+from actions.api.backends import SQLiteBackend
+from actions.api.backends import journaled
+from actions.api.backends.journaled import JournaledBackend
+from actions.api.records import UPDATE_KEYS_FIELD
+from benchmarks.jsonbin_stub import generate_members
+
+
+@pytest.fixture
+def records():
+    return generate_members(50)
+
+
+@pytest.fixture
+def store(tmp_path, records):
+    backend = SQLiteBackend(str(tmp_path / "members.db"))
+    backend.import_records(records)
+    return backend
+
+
+def _open(path, store) -> JournaledBackend:
+    # No background flushes - the tests flush explicitly
+    return JournaledBackend(str(path), store, flush_interval=threading.TIMEOUT_MAX)
+
+
+def _crash(backend: JournaledBackend) -> None:
+    """Stops a journal the way a killed process would: nothing flushed, file lock released."""
+    backend._stop_flusher()
+    backend._file.close()
+
+
+def test_updates_survive_a_crash(tmp_path, store, records):
+    path = tmp_path / "updates.journal"
+    member_id = records[0]["memberID"]
+    backend = _open(path, store)
+    assert backend.update_members({member_id: {"policyEndDate": "2000-01-01"}}, "turn-1") == {member_id: True}
+    assert backend.update_members({"unknown": {"note": "x"}}) == {"unknown": False}
+    # Readers see the pending update before it reaches the store
+    assert backend.get_members([member_id])[member_id]["policyEndDate"] == "2000-01-01"
+    assert store.get_members([member_id])[member_id]["policyEndDate"] != "2000-01-01"
+    _crash(backend)
+
+    restarted = _open(path, store)
+    # Left-over updates go out as soon as the journal is reopened
+    restarted.flush()
+    assert restarted.pending_count() == 0
+    assert store.get_members([member_id])[member_id]["policyEndDate"] == "2000-01-01"
+    restarted.close()
+
+
+def test_interrupted_batch_is_sent_again_with_the_same_key(tmp_path, store, records, monkeypatch):
+    path = tmp_path / "updates.journal"
+    member_id = records[0]["memberID"]
+    backend = _open(path, store)
+    # No key of its own - only the batch key keeps the store from applying it twice
+    backend.update_members({member_id: {"note": "cancelled"}})
+    update_members = store.update_members
+    sent_keys = []
+
+    def applied_then_lost(updates, idempotency_key=None):
+        sent_keys.append(idempotency_key)
+        update_members(updates, idempotency_key)
+        raise ConnectionError("answer lost")
+
+    monkeypatch.setattr(store, "update_members", applied_then_lost)
+    with pytest.raises(ConnectionError):
+        backend.flush()
+    _crash(backend)
+
+    def recorded(updates, idempotency_key=None):
+        sent_keys.append(idempotency_key)
+        return update_members(updates, idempotency_key)
+
+    monkeypatch.setattr(store, "update_members", recorded)
+    restarted = _open(path, store)
+    restarted.flush()
+    assert restarted.pending_count() == 0
+    assert len(sent_keys) == 2 and sent_keys[0] == sent_keys[1]
+    keys = store.get_members([member_id])[member_id][UPDATE_KEYS_FIELD]
+    assert keys == [sent_keys[0]]
+    assert store.get_members([member_id])[member_id]["note"] == "cancelled"
+    restarted.close()
+
+
+def test_repeated_update_is_recognised_after_compaction_and_restart(tmp_path, store, records, monkeypatch):
+    path = tmp_path / "updates.journal"
+    member_id = records[0]["memberID"]
+    monkeypatch.setattr(journaled, "COMPACT_BYTES", 0)
+    backend = _open(path, store)
+    backend.update_members({member_id: {"note": "cancelled"}}, "turn-1")
+    backend.flush()
+    backend.close()
+
+    # The journal no longer holds the update - only the store's record knows the key
+    restarted = _open(path, store)
+    assert "turn-1" not in restarted._recent_keys
+    assert restarted.update_members({member_id: {"note": "cancelled twice"}}, "turn-1") == {member_id: True}
+    assert restarted.pending_count() == 0
+    restarted.flush()
+    assert store.get_members([member_id])[member_id]["note"] == "cancelled"
+    restarted.close()
+
+
+def test_batch_combines_updates_and_keeps_every_key(tmp_path, store, records):
+    backend = _open(tmp_path / "updates.journal", store)
+    first, second = records[0]["memberID"], records[1]["memberID"]
+    backend.update_members({first: {"note": "a"}}, "turn-1")
+    backend.update_members({first: {"extra": "b"}, second: {"note": "c"}}, "turn-2")
+    assert backend.flush() == 2
+    stored = store.get_members([first, second])
+    assert stored[first]["note"] == "a" and stored[first]["extra"] == "b"
+    assert {"turn-1", "turn-2"} <= set(stored[first][UPDATE_KEYS_FIELD])
+    assert "turn-1" not in stored[second][UPDATE_KEYS_FIELD]
+    backend.close()
+
+
+def test_journaling_does_not_wait_for_the_store(tmp_path, store, records, monkeypatch):
+    path = tmp_path / "updates.journal"
+    member_id = records[0]["memberID"]
+    monkeypatch.setattr(journaled, "COMPACT_BYTES", 0)
+    backend = _open(path, store)
+    backend.update_members({member_id: {"note": "cancelled"}}, "turn-1")
+    backend.flush()
+    backend.close()
+
+    # A store without local data (e.g. JSONbin right after a write): nothing to check against
+    def not_local(member_ids):
+        return None
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError("the store was read during a turn")
+
+    monkeypatch.setattr(store, "peek_members", not_local)
+    monkeypatch.setattr(store, "select_members", no_reads)
+    monkeypatch.setattr(store, "get_members", no_reads)
+    restarted = _open(path, store)
+    assert restarted.update_members({member_id: {"note": "cancelled twice"}}, "turn-1") == {member_id: True}
+    assert restarted.update_members({"unknown": {"note": "x"}}, "turn-2") == {"unknown": True}
+    assert restarted.pending_count() == 2
+
+    # The flusher finds the key on the stored record and drops the repeat
+    monkeypatch.undo()
+    restarted.flush()
+    assert restarted.pending_count() == 0
+    assert store.get_members([member_id])[member_id]["note"] == "cancelled"
+    restarted.close()
+
+
+def test_pending_end_dates_are_merged_in_date_order(tmp_path, store, records):
+    backend = _open(tmp_path / "updates.journal", store)
+    moved, added = records[0]["memberID"], records[1]["memberID"]
+    backend.update_members({moved: {"policyEndDate": "2099-01-01"}, added: {"policyEndDate": "2000-06-15"}})
+    expected = sorted([(member_id, end) for member_id, end in store.expiring_between("2000-01-01", "2000-12-31")
+                       if member_id != moved] + [(added, "2000-06-15")], key=lambda pair: (pair[1], pair[0]))
+    assert backend.expiring_between("2000-01-01", "2000-12-31") == expected
+    assert moved not in dict(backend.expiring_between("2000-01-01", "2050-12-31"))
+    assert backend.expiring_between("2099-01-01", "2099-01-01") == [(moved, "2099-01-01")]
+    backend.close()
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+
+from actions.api.backends import JSONBinBackend, WriteConflictError
+from actions.api.resilience import CircuitBreaker
+from benchmarks.jsonbin_stub import DEFAULT_BIN_ID, JSONBinStub, generate_members
+
+
+@pytest.fixture
+def records():
+    return generate_members(200)
+
+
+def _stub(records, **options) -> JSONBinStub:
+    stub = JSONBinStub(latency_ms=5, **options).start()
+    stub.load(records)
+    return stub
+
+
+def _update_concurrently(backend: JSONBinBackend, member_ids):
+    results = {}
+
+    def update(member_id):
+        results[member_id] = backend.update_members({member_id: {"note": member_id}}, f"key-{member_id}")
+
+    threads = [threading.Thread(target=update, args=(member_id,)) for member_id in member_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _notes(stub: JSONBinStub):
+    return {record["memberID"]: record.get("note") for record in stub.bins[DEFAULT_BIN_ID]}
+
+
+def test_concurrent_cas_updates_rebase_on_conflict(records):
+    stub = _stub(records)
+    try:
+        backend = JSONBinBackend(base_url=stub.url(), write_cas=True, cas_retries=50)
+        member_ids = [record["memberID"] for record in records[:20]]
+        results = _update_concurrently(backend, member_ids)
+        notes = _notes(stub)
+        assert all(results[member_id] == {member_id: True} for member_id in member_ids)
+        assert all(notes[member_id] == member_id for member_id in member_ids)
+        assert stub.stats["conflicts"] > 0
+        # Losing a write race is not a JSONbin failure
+        assert backend.breaker.state == CircuitBreaker.CLOSED
+    finally:
+        stub.stop()
+
+
+def test_cas_without_etag_falls_back_to_the_write_lock(records):
+    stub = _stub(records, etags=False)
+    try:
+        backend = JSONBinBackend(base_url=stub.url(), write_cas=True)
+        member_ids = [record["memberID"] for record in records[:20]]
+        _update_concurrently(backend, member_ids)
+        notes = _notes(stub)
+        assert all(notes[member_id] == member_id for member_id in member_ids)
+        assert not backend._conditional_writes()
+    finally:
+        stub.stop()
+
+
+def test_async_cas_without_etag_keeps_every_update(records):
+    stub = _stub(records, etags=False)
+    member_ids = [record["memberID"] for record in records[:10]]
+
+    async def update_all():
+        backend = JSONBinBackend(base_url=stub.url(), write_cas=True)
+        try:
+            return await asyncio.gather(*[backend.aupdate_members({member_id: {"note": member_id}})
+                                          for member_id in member_ids])
+        finally:
+            await backend.aclose()
+
+    try:
+        asyncio.run(update_all())
+        notes = _notes(stub)
+        assert all(notes[member_id] == member_id for member_id in member_ids)
+    finally:
+        stub.stop()
+
+
+def test_cas_gives_up_after_retries(records, monkeypatch):
+    stub = _stub(records)
+    try:
+        backend = JSONBinBackend(base_url=stub.url(), write_cas=True, cas_retries=2)
+        monkeypatch.setattr(backend, "_conflict_pause", lambda attempt: 0)
+        # Someone else always writes between our read and our write
+        write_records = backend.write_records
+
+        def write_after_someone_else(data, if_match=None):
+            stub.load(list(stub.bins[DEFAULT_BIN_ID]))
+            return write_records(data, if_match)
+
+        monkeypatch.setattr(backend, "write_records", write_after_someone_else)
+        with pytest.raises(WriteConflictError):
+            backend.update_members({records[0]["memberID"]: {"note": "lost"}})
+        assert stub.stats["conflicts"] == 3
+        assert backend.breaker.state == CircuitBreaker.CLOSED
+    finally:
+        stub.stop()
+
+
+def test_update_sent_again_is_not_reapplied(records):
+    stub = _stub(records)
+    try:
+        backend = JSONBinBackend(base_url=stub.url())
+        member_id = records[0]["memberID"]
+        assert backend.update_members({member_id: {"note": "first"}}, "turn-1") == {member_id: True}
+        writes = stub.stats["writes"]
+        assert backend.update_members({member_id: {"note": "second"}}, "turn-1") == {member_id: True}
+        assert stub.stats["writes"] == writes
+        assert _notes(stub)[member_id] == "first"
+    finally:
+        stub.stop()
+
+
+def test_sync_and_async_writers_share_the_write_lock(records):
+    stub = _stub(records)
+    backend = JSONBinBackend(base_url=stub.url())
+    sync_ids = [record["memberID"] for record in records[:10]]
+    async_ids = [record["memberID"] for record in records[10:20]]
+
+    async def update_all():
+        try:
+            return await asyncio.gather(*[backend.aupdate_members({member_id: {"note": member_id}})
+                                          for member_id in async_ids])
+        finally:
+            await backend.aclose()
+
+    try:
+        # A bulk tool or the journal flusher writing from threads while actions write from the event loop
+        writers = threading.Thread(target=_update_concurrently, args=(backend, sync_ids))
+        writers.start()
+        asyncio.run(update_all())
+        writers.join()
+        notes = _notes(stub)
+        assert all(notes[member_id] == member_id for member_id in sync_ids + async_ids)
+    finally:
+        stub.stop()
@@ -0,0 +1,22 @@
+import threading
+
+from actions.api import metrics
+from actions.api.metrics import BACKEND_REQUESTS, ActionUsage, start_in_context
+
+
+def _request():
+    BACKEND_REQUESTS.inc(backend="test", operation="read")
+
+
+def test_thread_started_in_context_counts_towards_the_action_run():
+    usage = ActionUsage()
+    token = metrics._action_usage.set(usage)
+    try:
+        start_in_context(_request).join()
+        # A plain thread starts with an empty context
+        plain = threading.Thread(target=_request)
+        plain.start()
+        plain.join()
+    finally:
+        metrics._action_usage.reset(token)
+    assert usage.backend_requests == 1
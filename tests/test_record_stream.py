@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+
+from actions.api.record_stream import RecordPicker, RecordStream, aiter_records, iter_records
+
+RECORDS = [
+    {"memberID": "M1", "name": "Zoë \"Z\" O'Neil \\ é中\U0001F600", "dob": "1980-01-31",
+     "has_child_accounts": True, "child_accounts": "C1, C2", "score": -12.5e3, "visits": 1234567},
+    {"memberID": "C1", "name": "Tab\tand\nnewline \u0000", "has_child_accounts": False,
+     "child_accounts": None, "tags": [1, 2.25, [], {}], "nested": {"a": {"b": [True, False, None]}}},
+    {"memberID": "C2", "name": "", "has_child_accounts": False, "child_accounts": "", "zero": 0},
+]
+METADATA = {"id": "bin", "private": True, "versionCount": 17, "createdAt": None}
+
+
+def _body(shape: str) -> bytes:
+    if shape == "object":
+        document = {"record": RECORDS, "metadata": METADATA}
+    elif shape == "metadata-first":
+        document = {"metadata": METADATA, "record": RECORDS}
+    else:
+        document = RECORDS
+    # ensure_ascii=False keeps multi-byte UTF-8 characters that chunks can split
+    return json.dumps(document, ensure_ascii=False, indent=1).encode("utf-8")
+
+
+def _parse(chunks):
+    stream = RecordStream()
+    records = []
+    for chunk in chunks:
+        records.extend(stream.feed(chunk))
+    records.extend(stream.close())
+    return records, stream
+
+
+@pytest.mark.parametrize("shape", ["object", "metadata-first", "array"])
+def test_records_split_at_every_byte_offset(shape):
+    body = _body(shape)
+    for offset in range(len(body) + 1):
+        records, stream = _parse([body[:offset], body[offset:]])
+        assert records == RECORDS, f"split at byte {offset}"
+        assert stream.done and stream.records_seen == len(RECORDS) and stream.bytes_seen == len(body)
+
+
+@pytest.mark.parametrize("shape", ["object", "array"])
+def test_records_fed_byte_by_byte(shape):
+    body = _body(shape)
+    records, _ = _parse([body[i:i + 1] for i in range(len(body))])
+    assert records == RECORDS
+
+
+def test_records_are_handed_back_as_soon_as_complete():
+    body = _body("object")
+    first_end = body.index(b"}", body.index(b'"visits"')) + 1
+    stream = RecordStream()
+    assert stream.feed(body[:first_end - 1]) == []
+    assert stream.feed(body[first_end - 1:first_end]) == [RECORDS[0]]
+
+
+def test_early_exit_once_every_wanted_member_is_found():
+    body = _body("array")
+    chunks_read = []
+
+    def chunks():
+        for offset in range(0, len(body), 16):
+            chunks_read.append(offset)
+            yield body[offset:offset + 16]
+
+    picker = RecordPicker(["M1"], expand=lambda record: ["C1"] if record["memberID"] == "M1" else [])
+    for record in iter_records(chunks()):
+        if picker.offer(record):
+            break
+    assert set(picker.found) == {"M1", "C1"}
+    assert picker.wanted == {"M1", "C1"}
+    assert len(chunks_read) < len(range(0, len(body), 16))
+
+
+def test_async_records():
+    body = _body("object")
+
+    async def chunks():
+        for offset in range(0, len(body), 7):
+            yield body[offset:offset + 7]
+
+    async def collect():
+        return [record async for record in aiter_records(chunks())]
+
+    assert asyncio.run(collect()) == RECORDS
+
+
+def test_picker_not_complete_while_members_are_missing():
+    picker = RecordPicker(["M1", "M9"])
+    assert not any(picker.offer(record) for record in RECORDS)
+    assert set(picker.found) == {"M1"}
+
+
+@pytest.mark.parametrize("shape", ["object", "array"])
+def test_truncated_body_raises(shape):
+    body = _body(shape).rstrip()
+    for offset in range(len(body)):
+        with pytest.raises(ValueError):
+            _parse([body[:offset]])
+
+
+@pytest.mark.parametrize("body", [
+    b'{"record": [{"memberID": "M1"} {"memberID": "M2"}]}',
+    b'{"record": [{"memberID": }]}',
+    b'{"record" [{"memberID": "M1"}]}',
+    b'{"record": [{"memberID": "M1"},]}',
+    b'{"record": [{"memberID": "M1"}], "metadata": {},}',
+    b'"record"',
+    b'{"record": [{"memberID": "M1", "active": tru}]}',
+])
+def test_malformed_body_raises(body):
+    with pytest.raises(ValueError):
+        list(iter_records([body[:5], body[5:]]))
@@ -0,0 +1,32 @@
+from actions.api.records import UPDATE_KEYS_FIELD, UPDATE_KEYS_KEPT, apply_member_updates, update_record
+
+
+def test_update_record_applies_a_key_once():
+    record = {"memberID": "M1", "note": None}
+    assert update_record(record, {"note": "first"}, "turn-1")
+    assert not update_record(record, {"note": "second"}, "turn-1")
+    assert record == {"memberID": "M1", "note": "first", UPDATE_KEYS_FIELD: ["turn-1"]}
+    # Without a key an update is always applied
+    assert update_record(record, {"note": "third"})
+    assert record["note"] == "third"
+
+
+def test_update_record_keeps_only_recent_keys():
+    record = {"memberID": "M1"}
+    for number in range(UPDATE_KEYS_KEPT + 2):
+        update_record(record, {"count": number}, f"turn-{number}")
+    assert record[UPDATE_KEYS_FIELD] == [f"turn-{number}" for number in range(2, UPDATE_KEYS_KEPT + 2)]
+
+
+def test_keys_carried_in_the_data_are_added():
+    record = {"memberID": "M1", UPDATE_KEYS_FIELD: ["turn-1"]}
+    assert update_record(record, {"note": "x", UPDATE_KEYS_FIELD: ["turn-1", "turn-2"]}, "batch-1")
+    assert record[UPDATE_KEYS_FIELD] == ["turn-1", "turn-2", "batch-1"]
+
+
+def test_apply_member_updates_counts_changed_records():
+    records = [{"memberID": "M1"}, {"memberID": "M2", UPDATE_KEYS_FIELD: ["turn-1"]}]
+    applied, changed = apply_member_updates(records, {"M1": {"a": 1}, "M2": {"a": 2}, "M3": {"a": 3}}, "turn-1")
+    assert applied == {"M1": True, "M2": True, "M3": False}
+    assert changed == 1
+    assert "a" not in records[1]
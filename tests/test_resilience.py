@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from actions.api.backends import StorageError
+from actions.api.resilience import CircuitBreaker, CircuitOpenError
+from actions.api.scheduler import RateLimitedError
+
+
+def _raise(error: Exception):
+    def fn():
+        raise error
+    return fn
+
+
+def test_breaker_opens_after_consecutive_backend_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+    for _ in range(3):
+        with pytest.raises(StorageError):
+            breaker.call(_raise(StorageError("HTTP 503")))
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never called")
+
+
+def test_breaker_ignores_local_back_pressure():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60, ignore=(RateLimitedError,))
+    for _ in range(10):
+        with pytest.raises(RateLimitedError):
+            breaker.call(_raise(RateLimitedError("queued too long")))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.call(lambda: "ok") == "ok"
+
+
+def test_async_breaker_ignores_local_back_pressure():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60, ignore=(RateLimitedError,))
+
+    async def throttled():
+        raise RateLimitedError("queued too long")
+
+    async def answered():
+        return "ok"
+
+    async def run():
+        with pytest.raises(RateLimitedError):
+            await breaker.acall(throttled)
+        return await breaker.acall(answered, 1.0)
+
+    assert asyncio.run(run()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_ignored_error_releases_half_open_trial():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0, ignore=(RateLimitedError,))
+    with pytest.raises(StorageError):
+        breaker.call(_raise(StorageError("HTTP 503")))
+    # The trial call hits our own rate limiter; the next call may try again
+    with pytest.raises(RateLimitedError):
+        breaker.call(_raise(RateLimitedError("queued too long")))
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
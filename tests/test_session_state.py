@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from rasa_sdk import Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+from actions import session_state
+from actions.api.async_connection_manager import AsyncConnectionManager
+from actions.api.backends import SQLiteBackend
+from actions.api.records import household_stamp
+from actions.authentication import auth_actions
+from actions.session_state import (
+    HOUSEHOLD_HANDLE_SLOT,
+    HOUSEHOLD_VERSION_SLOT,
+    action_idempotency_key,
+    check_selection,
+    make_household_handle,
+    parse_household_handle,
+    resolve_household,
+    session_household_stamp,
+)
+
+RECORDS = [
+    {"memberID": "M1", "name": "Ann", "dob": "1980-01-01", "policyEndDate": "2030-01-01",
+     "has_child_accounts": True, "child_accounts": "C1, C2"},
+    {"memberID": "C1", "name": "Cid", "dob": "2010-01-01", "policyEndDate": "2030-01-01",
+     "has_child_accounts": False, "child_accounts": ""},
+    {"memberID": "C2", "name": "Cat", "dob": "2012-01-01", "policyEndDate": "2030-01-01",
+     "has_child_accounts": False, "child_accounts": ""},
+    {"memberID": "M2", "name": "Bob", "dob": "1970-01-01", "policyEndDate": "2030-01-01",
+     "has_child_accounts": False, "child_accounts": ""},
+]
+
+
+def _tracker(slots=None, message_id="msg-1", sender_id="user-1", events=None) -> Tracker:
+    latest_message = {"text": "cancel", "message_id": message_id} if message_id else {}
+    return Tracker(sender_id, slots or {}, latest_message, events or [], False, None, {}, None)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "members.db"))
+    backend.import_records(RECORDS)
+    manager = AsyncConnectionManager(backend)
+    monkeypatch.setattr(session_state, "get_async_connection_manager", lambda: manager)
+    monkeypatch.setattr(auth_actions, "get_async_connection_manager", lambda: manager)
+    return manager
+
+
+def _household(manager):
+    return asyncio.run(manager.get_household("M1"))
+
+
+def test_household_handle_round_trip(manager):
+    household = _household(manager)
+    handle = make_household_handle(household)
+    assert handle == f"M1@{household_stamp(household)}"
+    assert parse_household_handle(handle) == ("M1", household_stamp(household))
+    # A plain member ID, or no handle at all
+    assert parse_household_handle("M1") == ("M1", None)
+    assert parse_household_handle("M1@") == ("M1", None)
+    assert parse_household_handle(None) == (None, None)
+    # Only the last "@" separates the stamp
+    assert parse_household_handle("a@b@1234abcd") == ("a@b", "1234abcd")
+
+
+def test_stamp_changes_with_the_household(manager):
+    household = _household(manager)
+    changed = dict(household, child_accounts=[dict(household["child_accounts"][0], name="Cyd")]
+                   + household["child_accounts"][1:])
+    assert household_stamp(household) == household_stamp(_household(manager))
+    assert household_stamp(changed) != household_stamp(household)
+
+
+def test_resolve_household_from_handle_or_primary_slot(manager):
+    assert asyncio.run(resolve_household(_tracker({HOUSEHOLD_HANDLE_SLOT: "M1@00000000"}), manager))[
+        "primary"]["memberID"] == "M1"
+    assert asyncio.run(resolve_household(_tracker({"primary_account_memberID": "M1"}), manager))[
+        "primary"]["memberID"] == "M1"
+    assert asyncio.run(resolve_household(_tracker(), manager)) is None
+
+
+def test_session_stamp_from_handle_or_version_slot():
+    assert session_household_stamp(_tracker({HOUSEHOLD_HANDLE_SLOT: "M1@1234abcd"})) == "1234abcd"
+    assert session_household_stamp(_tracker({HOUSEHOLD_VERSION_SLOT: "5678ef90"})) == "5678ef90"
+    assert session_household_stamp(_tracker()) is None
+
+
+def test_check_selection_only_confirms_household_members(manager):
+    tracker = _tracker({"primary_account_memberID": "M1"})
+    account, household = asyncio.run(check_selection(tracker, "C2", manager))
+    assert account["name"] == "Cat" and household["primary"]["memberID"] == "M1"
+    assert asyncio.run(check_selection(tracker, "M1", manager))[0]["memberID"] == "M1"
+    assert asyncio.run(check_selection(tracker, "M2", manager)) is None
+    assert asyncio.run(check_selection(_tracker(), "C2", manager)) is None
+
+
+def _run_selection(tracker):
+    return asyncio.run(auth_actions.ActionTrackSelectedAccount().run(CollectingDispatcher(), tracker, {}))
+
+
+def _slots(events):
+    return {event["name"]: event["value"] for event in events}
+
+
+def test_stamp_check_with_current_session_uses_local_data_only(manager, monkeypatch):
+    monkeypatch.setattr(auth_actions, "SELECTION_CHECK", "stamp")
+
+    async def no_fetch(*args, **kwargs):
+        raise AssertionError("the backend was asked")
+
+    monkeypatch.setattr(manager, "get_member_data", no_fetch)
+    stamp = household_stamp(_household(manager))
+    slots = _slots(_run_selection(_tracker({"selected_account_id": "C1", "primary_account_memberID": "M1",
+                                            HOUSEHOLD_VERSION_SLOT: stamp})))
+    assert slots["selected_account_name"] == "Cid"
+    assert HOUSEHOLD_VERSION_SLOT not in slots
+
+
+def test_stale_stamp_refreshes_the_session_household(manager, monkeypatch):
+    monkeypatch.setattr(auth_actions, "SELECTION_CHECK", "stamp")
+    monkeypatch.setattr(auth_actions, "COMPACT_SESSION_STATE", False)
+    monkeypatch.setattr(session_state, "COMPACT_SESSION_STATE", False)
+    household = _household(manager)
+    slots = _slots(_run_selection(_tracker({"selected_account_id": "C1", "primary_account_memberID": "M1",
+                                            HOUSEHOLD_VERSION_SLOT: "00000000"})))
+    assert slots["selected_account_name"] == "Cid"
+    assert slots[HOUSEHOLD_VERSION_SLOT] == household_stamp(household)
+    assert slots["child_accounts"] == household["child_accounts"]
+
+
+def test_stamp_check_without_local_data_reads_the_backend(manager, monkeypatch):
+    monkeypatch.setattr(auth_actions, "SELECTION_CHECK", "stamp")
+
+    async def nothing_local(member_id):
+        return None
+
+    monkeypatch.setattr(manager.backend, "apeek_household_records", nothing_local)
+    slots = _slots(_run_selection(_tracker({"selected_account_id": "C2", "primary_account_memberID": "M1"})))
+    assert slots["selected_account_name"] == "Cat"
+    assert HOUSEHOLD_VERSION_SLOT not in slots
+
+
+def test_idempotency_key_is_stable_across_retries_of_a_turn():
+    key = action_idempotency_key(_tracker(), "action_cancel_policy", "M1")
+    assert key == action_idempotency_key(_tracker(events=[{"event": "action"}]), "action_cancel_policy", "M1")
+    assert len(key) == 16
+    assert key != action_idempotency_key(_tracker(message_id="msg-2"), "action_cancel_policy", "M1")
+    assert key != action_idempotency_key(_tracker(sender_id="user-2"), "action_cancel_policy", "M1")
+    assert key != action_idempotency_key(_tracker(), "action_cancel_policy", "C1")
+    assert key != action_idempotency_key(_tracker(), "action_other", "M1")
+    # Without a message ID the turn is told apart by the number of events
+    no_id = action_idempotency_key(_tracker(message_id=None, events=[{}, {}]), "action_cancel_policy", "M1")
+    assert no_id == action_idempotency_key(_tracker(message_id=None, events=[{}, {}]), "action_cancel_policy", "M1")
+    assert no_id != action_idempotency_key(_tracker(message_id=None, events=[{}, {}, {}]),
+                                           "action_cancel_policy", "M1")
@@ -0,0 +1,80 @@
+import pytest
+
+from actions.api.backends import SQLiteBackend
+from actions.api.backends.sharded import ShardedBackend, partition_records, reshard, shard_index
+from actions.api.records import household_member_ids
+from benchmarks.jsonbin_stub import generate_members
+
+
+@pytest.fixture
+def records():
+    return generate_members(300, household_ratio=0.5)
+
+
+def _shards(tmp_path, count, prefix="shard"):
+    return [SQLiteBackend(str(tmp_path / f"{prefix}-{number}.db")) for number in range(count)]
+
+
+def _households(records):
+    """memberID -> primary memberID of its household."""
+    households = {record["memberID"]: record["memberID"] for record in records}
+    for record in records:
+        for child_id in household_member_ids(record)[1:]:
+            households[child_id] = record["memberID"]
+    return households
+
+
+def _placement(shards):
+    return {record["memberID"]: number for number, shard in enumerate(shards) for record in shard.export_records()}
+
+
+def test_shard_index_is_stable():
+    # CRC-32 - the same in every process and release, unlike hash(); existing shards depend on it
+    assert [shard_index(f"M{number:07d}", 4) for number in range(1, 9)] == [0, 2, 0, 3, 1, 3, 1, 0]
+    assert all(0 <= shard_index(f"M{number:07d}", 3) < 3 for number in range(100))
+
+
+def test_partition_keeps_households_together(records):
+    households = _households(records)
+    partitions = partition_records(records, 3)
+    assert sum(len(partition) for partition in partitions) == len(records)
+    for number, partition in enumerate(partitions):
+        for record in partition:
+            assert shard_index(households[record["memberID"]], 3) == number
+
+
+def test_reshard_onto_more_shards_including_the_sources(tmp_path, records):
+    sources = _shards(tmp_path, 2)
+    ShardedBackend(sources).import_records(records)
+    targets = sources + _shards(tmp_path, 2, prefix="new")
+    assert sum(reshard(sources, targets)) == len(records)
+
+    households = _households(records)
+    placement = _placement(targets)
+    assert len(placement) == len(records)
+    assert sum(len(target.export_records()) for target in targets) == len(records)
+    assert all(placement[member_id] == shard_index(households[member_id], 4) for member_id in placement)
+
+
+def test_reads_and_writes_are_routed_to_the_household_shard(tmp_path, records):
+    shards = _shards(tmp_path, 3)
+    backend = ShardedBackend(shards)
+    backend.import_records(records)
+    primary = next(record for record in records if record["has_child_accounts"])
+    child_id = household_member_ids(primary)[1]
+    expected = shard_index(primary["memberID"], 3)
+
+    # A child read before its household is found on another shard, and its route is learned
+    assert backend.get_members([child_id])[child_id]["memberID"] == child_id
+    backend.get_household_records(primary["memberID"])
+    assert backend.shard_number(child_id) == expected
+
+    household = {member_id: {"note": "cancelled"} for member_id in household_member_ids(primary)}
+    assert backend.update_members(household, "turn-1") == {member_id: True for member_id in household}
+    on_shard = shards[expected].get_members(household)
+    assert all(on_shard[member_id]["note"] == "cancelled" for member_id in household)
+
+    # The same update sent again is not applied twice
+    assert backend.update_members({child_id: {"note": "again"}}, "turn-1") == {child_id: True}
+    assert backend.get_members([child_id])[child_id]["note"] == "cancelled"
+    assert backend.update_members({"unknown": {"note": "x"}}) == {"unknown": False}
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from actions.api.singleflight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return "records"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("records", fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == ["records"] * 5
+    assert flight.coalesced_count == 4
+    assert not flight.in_flight("records")
+
+
+def test_concurrent_coroutines_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "records"
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("records", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["records"] * 5
+    assert len(calls) == 1
+    assert flight.coalesced_count == 4
+
+
+def test_error_is_shared_and_next_call_starts_a_new_flight():
+    flight = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("backend down")
+
+    async def main():
+        return await asyncio.gather(*(flight.ado("records", failing) for _ in range(3)), return_exceptions=True)
+
+    answers = asyncio.run(main())
+    assert all(isinstance(answer, ValueError) for answer in answers)
+    assert len(calls) == 1
+    assert not flight.in_flight("records")
+    with pytest.raises(ValueError):
+        asyncio.run(flight.ado("records", failing))
+    assert len(calls) == 2
+
+
+def test_cancelled_leader_does_not_fail_the_followers():
+    flight = SingleFlight()
+    release = None
+
+    async def fetch():
+        await release.wait()
+        return "records"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.ensure_future(flight.ado("records", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(flight.ado("records", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        answers = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return answers
+
+    assert asyncio.run(main()) == ["records", "records"]
+    assert not flight.in_flight("records")
+
+
+def test_cancelled_follower_does_not_fail_the_others():
+    flight = SingleFlight()
+    release = None
+
+    async def fetch():
+        await release.wait()
+        return "records"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.ensure_future(flight.ado("records", fetch))
+        await asyncio.sleep(0)
+        quitter, stayer = (asyncio.ensure_future(flight.ado("records", fetch)) for _ in range(2))
+        await asyncio.sleep(0)
+        quitter.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(leader, stayer)
+
+    assert asyncio.run(main()) == ["records", "records"]
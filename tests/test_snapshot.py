@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from actions.api.snapshot import MemberSnapshot, write_snapshot
+from benchmarks.jsonbin_stub import generate_members
+
+
+def test_snapshot_round_trip(tmp_path):
+    records = generate_members(300)
+    # One very wide record must not widen the others
+    records[0] = dict(records[0], note="x" * 10000)
+    path = str(tmp_path / "members.snap")
+    assert write_snapshot(path, records, {"validators": {"etag": '"v1"'}}, created_at=1000.0) == len(records)
+
+    snapshot = MemberSnapshot(path)
+    assert len(snapshot) == len(records)
+    assert snapshot.meta == {"validators": {"etag": '"v1"'}}
+    assert snapshot.created_at == 1000.0
+    by_id = {record["memberID"]: record for record in records}
+    assert list(snapshot.records()) == [by_id[member_id] for member_id in sorted(by_id)]
+    assert snapshot.get(records[0]["memberID"]) == records[0]
+    assert snapshot.get(records[-1]["memberID"]) == records[-1]
+    assert snapshot.get("missing") is None
+    assert snapshot.get_many([records[1]["memberID"], "missing"]) == {records[1]["memberID"]: records[1]}
+    assert os.path.getsize(path) < sum(len(str(record)) for record in records) * 2
+
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "members.snap")
+    write_snapshot(path, [])
+    snapshot = MemberSnapshot(path)
+    assert len(snapshot) == 0
+    assert snapshot.get("M1") is None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "members.snap"
+    path.write_bytes(b"not a snapshot" * 10)
+    with pytest.raises(ValueError):
+        MemberSnapshot(str(path))
@@ -0,0 +1,37 @@
+from actions.api.backends import SQLiteBackend
+from actions.api.records import UPDATE_KEYS_FIELD, project_record
+
+RECORDS = [
+    {"memberID": "M1", "name": "Ann", "dob": "1980-01-01", "policyEndDate": "2030-01-01",
+     "has_child_accounts": True, "child_accounts": "M2"},
+    {"memberID": "M2", "name": "Bob", "dob": "2010-01-01", "has_child_accounts": False, "child_accounts": None},
+]
+
+
+def test_projection_matches_project_record(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "members.db"))
+    backend.import_records(RECORDS)
+    fields = ("name", "policyEndDate", "child_accounts", "has_child_accounts")
+    selected = backend.select_members(["M1", "M2", "M3"], fields)
+    expected = {record["memberID"]: project_record(record, fields) for record in RECORDS}
+    assert selected == expected
+    # Same types as the stored JSON, not just equal values (1 == True)
+    assert {member_id: {field: type(value) for field, value in record.items()}
+            for member_id, record in selected.items()} == \
+        {member_id: {field: type(value) for field, value in record.items()} for member_id, record in expected.items()}
+    assert selected["M1"]["has_child_accounts"] is True and selected["M2"]["has_child_accounts"] is False
+    # Absent fields stay absent; a stored null is still returned
+    assert "policyEndDate" not in selected["M2"]
+    assert selected["M2"]["child_accounts"] is None
+    backend.close()
+
+
+def test_update_sent_again_is_not_reapplied(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "members.db"))
+    backend.import_records(RECORDS)
+    assert backend.update_members({"M1": {"note": "first"}, "M9": {"note": "x"}}, "turn-1") == \
+        {"M1": True, "M9": False}
+    assert backend.update_members({"M1": {"note": "second"}}, "turn-1") == {"M1": True}
+    assert backend.get_members(["M1"])["M1"]["note"] == "first"
+    assert backend.get_members(["M1"])["M1"][UPDATE_KEYS_FIELD] == ["turn-1"]
+    backend.close()